@@ -1,5 +1,7 @@
 from flask import Flask
+from flask.json.provider import JSONProvider
 import logging
+import orjson
 
 # Flask Extensions
 from flask_jwt_extended import JWTManager
@@ -16,7 +18,23 @@ logging.basicConfig(level=logging.INFO)
 # ============================================================
 # App Initialization
 # ============================================================
+
+class OrjsonProvider(JSONProvider):
+    """
+    orjson-backed JSON for request/response bodies — several times
+    faster than stdlib json and serializes numpy scalars and datetimes
+    natively, which matters for the /api/ask payloads.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Load Database & JWT configuration from config.py
 app.config["SQLALCHEMY_DATABASE_URI"]        = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
@@ -31,6 +49,27 @@ jwt = JWTManager(app)
 # Register the routes blueprint
 app.register_blueprint(api_bp)
 
+
+def preload_models() -> None:
+    """
+    Load the embedding and NER models in the current process.
+
+    Run under a preloading server (gunicorn preload_app=True) this
+    happens in the master before workers fork, so the weight tensors
+    are shared copy-on-write instead of loaded once per worker. For
+    GPU deployments, pair multiple workers with nvidia-cuda-mps-control
+    so they share one CUDA context.
+    """
+    from app.processing import embedding, entity_extractor
+
+    embedding._get_model()
+    entity_extractor._get_model()
+    logger.info("Models preloaded for worker fork sharing")
+
+
+if settings.PRELOAD_MODELS:
+    preload_models()
+
 # ============================================================
 # RUN SERVER
 # ============================================================
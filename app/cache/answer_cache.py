@@ -0,0 +1,118 @@
+"""
+Semantic Answer Cache
+
+Purpose:
+- Cache full RAG answers at the /api/ask boundary
+- Serve semantic near-duplicate questions without re-running retrieval
+  or the LLM
+
+Design:
+- Lookup keys on BOTH question-embedding similarity (cosine >= 0.95)
+  and exact equality of the patient's normalized entity context —
+  similar wording with a different medication list must never hit.
+- Bounded ring buffer, thread-safe, in-process only.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ContextKey = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def context_key(patient_profile: Optional[Dict[str, Any]]) -> ContextKey:
+    """
+    Normalized (sorted_conditions, sorted_drugs) tuple for a profile.
+    """
+    profile = patient_profile or {}
+
+    conditions = tuple(sorted(
+        str(c.get("name", "")).lower().strip()
+        for c in profile.get("conditions", []) or []
+        if c.get("name")
+    ))
+    drugs = tuple(sorted(
+        str(m.get("name", "")).lower().strip()
+        for m in profile.get("medications", []) or []
+        if m.get("name")
+    ))
+
+    return (conditions, drugs)
+
+
+class SemanticAnswerCache:
+    """
+    Ring buffer of (question embedding, context key, cached answer parts).
+    """
+
+    def __init__(self, max_entries: int = 4096, threshold: float = 0.95):
+        self._max_entries = max_entries
+        self._threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None  # normalized question vectors
+        self._entries: List[tuple] = []            # (vec_bytes, context_key, payload)
+        self._exact: Dict[bytes, int] = {}
+        self._next_slot = 0
+
+    def get(
+        self,
+        vector: np.ndarray,
+        key: ContextKey,
+    ) -> Optional[Dict[str, Any]]:
+        vec_bytes = vector.tobytes()
+
+        with self._lock:
+            slot = self._exact.get(vec_bytes)
+            if slot is not None and self._entries[slot][1] == key:
+                return dict(self._entries[slot][2])
+
+            if self._entries:
+                count = len(self._entries)
+                sims = self._matrix[:count] @ _normalize(vector)
+                best = int(np.argmax(sims))
+                if sims[best] >= self._threshold and self._entries[best][1] == key:
+                    return dict(self._entries[best][2])
+
+        return None
+
+    def put(
+        self,
+        vector: np.ndarray,
+        key: ContextKey,
+        payload: Dict[str, Any],
+    ) -> None:
+        vec_bytes = vector.tobytes()
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty(
+                    (self._max_entries, vector.shape[0]), dtype=np.float32
+                )
+
+            slot = self._next_slot
+            if len(self._entries) < self._max_entries:
+                self._entries.append((vec_bytes, key, dict(payload)))
+            else:
+                self._exact.pop(self._entries[slot][0], None)
+                self._entries[slot] = (vec_bytes, key, dict(payload))
+
+            self._matrix[slot] = _normalize(vector)
+            self._exact[vec_bytes] = slot
+            self._next_slot = (slot + 1) % self._max_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self._entries = []
+            self._exact = {}
+            self._next_slot = 0
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+# Shared process-wide instance used by the Flask routes
+answer_cache = SemanticAnswerCache()
@@ -8,6 +8,7 @@ class Settings(BaseSettings):
     QDRANT_TIMEOUT: int = 30
 
     QDRANT_COLLECTION: str = "medical_documents"
+    QDRANT_HNSW_EF: int = 64
     EMBEDDING_DIM: int = 1024
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 100
@@ -15,11 +16,31 @@ class Settings(BaseSettings):
     EMBEDDING_MODEL_NAME: str = "BAAI/bge-m3"
     EMBEDDING_DEVICE: str = "cpu"
     EMBEDDING_BATCH_SIZE: int = 32
+    # "int8" (dynamic, CPU), "fp16" (CUDA) or None for full precision
+    EMBEDDING_QUANTIZATION: str | None = None
+    # "torch" (default) or "onnx" (requires optimum[onnxruntime])
+    EMBEDDING_BACKEND: str = "torch"
+    # CPU threads for embedding inference; None = all cores
+    EMBEDDING_CPU_THREADS: int | None = None
+    # Load embedding/NER weights at import so forked workers share them
+    PRELOAD_MODELS: bool = False
+    # Target devices for the multi-process encode pool; None = all GPUs
+    EMBEDDING_DEVICES: list[str] | None = None
+    # Coalesce concurrent single-query embeds through BatchedEmbedder
+    EMBEDDING_MICROBATCH: bool = False
+
+    # Semantic (embedding-based) paper evidence in the fact checker
+    FACT_CHECK_SEMANTIC: bool = False
+    FACT_CHECK_SEMANTIC_THRESHOLD: float = 0.6
 
     # NER / GLiNER
     NER_MODEL_NAME: str = "urchade/gliner_small-v2.1"
     NER_CONFIDENCE_THRESHOLD: float = 0.3
     NER_DEVICE: str | None = None
+    # "fp16" or "bf16" halves NER weight bandwidth on CUDA; None = fp32
+    NER_PRECISION: str | None = None
+    # torch.compile the NER transformer (PyTorch >= 2.0)
+    NER_COMPILE: bool = False
 
     NER_LABELS: list[str] = [
         "drug",
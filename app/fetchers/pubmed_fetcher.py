@@ -75,8 +75,10 @@ def fetch_pmc_details(pmc_id: str) -> Optional[Dict]:
 
         soup = BeautifulSoup(xml_data, "lxml-xml")
 
+        # Types are pinned here once so downstream consumers
+        # (build_payload) can trust them without per-chunk coercion.
         article = {
-            "pmid": pmc_id,
+            "pmid": str(pmc_id),
             "title": "No Title",
             "journal": "Unknown Journal",
             "year": 0,
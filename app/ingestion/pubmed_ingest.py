@@ -1,4 +1,3 @@
-import uuid
 from typing import Iterable
 
 from qdrant_client.models import PointStruct
@@ -7,8 +6,8 @@ from qdrant_client.http.exceptions import UnexpectedResponse
 from app.fetchers.pubmed_fetcher import fetch_all_pmc_articles
 from app.processing.chunker import simple_chunk
 from app.processing.embedding import embed_texts
-from app.processing.entity_extractor import extract_medical_entities
-from app.schema.schema_builder import build_payload
+from app.processing.entity_extractor import extract_medical_entities_batch
+from app.schema.schema_builder import build_payload, content_point_id
 from app.vector_store.qdrant_store import (
     get_client,
     create_collection_if_not_exists,
@@ -98,11 +97,15 @@ def ingest_from_pubmed(query: str, max_results: int = 5) -> None:
             logger.error("Chunk/vector mismatch", extra={"pmid": pmid})
             continue
 
-        for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
-            try:
-                # ---- Entity extraction (metadata only) ----
-                entities = extract_medical_entities(chunk)
+        # ---- Entity extraction (metadata only) ----
+        # One batched NER call over all chunks of the paper instead of
+        # one model invocation per chunk.
+        chunk_entities = extract_medical_entities_batch(chunks)
 
+        for i, (chunk, vector, entities) in enumerate(
+            zip(chunks, vectors, chunk_entities)
+        ):
+            try:
                 payload = build_payload(
                     text=chunk,
                     pmid=pmid,
@@ -116,11 +119,13 @@ def ingest_from_pubmed(query: str, max_results: int = 5) -> None:
                     entities=entities,
                 )
 
+                # Content-hash ID: re-running the same query upserts in
+                # place instead of piling up duplicate points.
                 points_buffer.append(
                     PointStruct(
-                        id=str(uuid.uuid4()),
+                        id=content_point_id(pmid, i, chunk),
                         vector=vector,
-                        payload=payload,
+                        payload=payload.to_dict(),
                     )
                 )
 
@@ -148,6 +153,11 @@ def ingest_from_pubmed(query: str, max_results: int = 5) -> None:
 
         points_buffer.clear()
 
+    # New papers are live — cached search result lists are now stale.
+    from app.vector_store.paper_search import clear_search_cache
+
+    clear_search_cache()
+
     logger.info("PubMed ingestion completed", extra={"query": query})
 
 
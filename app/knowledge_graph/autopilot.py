@@ -1,15 +1,40 @@
-import json
+import re
+from functools import lru_cache
+
+import orjson
+
 from app.llm.ollama_client import call_ollama
-from app.knowledge_graph.patient_graph_reader import _get_driver as get_driver
+from app.knowledge_graph.patient_graph_reader import (
+    _get_driver as get_driver,
+    invalidate_profile,
+)
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Strips a leading ```json / ``` fence and a trailing ``` in one pass.
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
 def analyze_health_intent(user_text: str):
     """
     Analyzes user text to find NEW medical facts (Diagnosis, Medication, Allergy).
     Returns a LIST of facts found.
+
+    Results are memoized per normalized utterance (trimmed, lowercased,
+    whitespace-collapsed) — repeated questions in a chat session skip
+    the LLM call and the JSON cleanup entirely. Failures are not cached.
     """
+    normalized = " ".join(user_text.lower().split())
+
+    try:
+        return list(_analyze_impl(normalized))
+    except Exception as e:
+        logger.error(f"Autopilot analysis failed: {e}")
+        return []
+
+
+@lru_cache(maxsize=256)
+def _analyze_impl(user_text: str):
     prompt = f"""
     Analyze the user text. Identify ALL NEW medical facts about the user.
     
@@ -29,60 +54,62 @@ def analyze_health_intent(user_text: str):
     If no facts found, return: []
     """
     
-    try:
-        response = call_ollama(prompt)
-        # Clean potential markdown
-        clean_json = response.replace("```json", "").replace("```", "").strip()
-        data = json.loads(clean_json)
-        
-        # Ensure it's a list
-        if isinstance(data, dict):
-            data = [data]
-            
-        # Filter for valid entries
-        valid_facts = [item for item in data if item.get("category") and item.get("normalized_term")]
-        return valid_facts
-        
-    except Exception as e:
-        logger.error(f"Autopilot analysis failed: {e}")
-        return []
+    response = call_ollama(prompt)
+    # Clean potential markdown fences
+    clean_json = _FENCE_RE.sub("", response).strip()
+    data = orjson.loads(clean_json)
 
-def apply_graph_update(user_id: str, category: str, entity_name: str):
-    """
-    Writes to Neo4j ONLY when confirmed by user.
-    """
-    driver = get_driver()
-    query = ""
-    
-    if category == "Condition":
-        query = """
+    # Ensure it's a list
+    if isinstance(data, dict):
+        data = [data]
+
+    # Filter for valid entries; tuple so the cached value is immutable
+    return tuple(
+        item for item in data if item.get("category") and item.get("normalized_term")
+    )
+
+# Prebuilt Cypher per category — one dict probe replaces the string
+# compare chain, and the query text is never rebuilt per call.
+_CATEGORY_TO_QUERY = {
+    "Condition": """
         MATCH (u:Patient {id: $uid})
         MERGE (c:Condition {name: $name})
         MERGE (u)-[:HAS_CONDITION]->(c)
         RETURN u.id
-        """
-    elif category == "Medication":
-        query = """
+        """,
+    "Medication": """
         MATCH (u:Patient {id: $uid})
         MERGE (d:Drug {name: $name})
         MERGE (u)-[:TAKES_DRUG]->(d)
         RETURN u.id
-        """
-    elif category == "Allergy":
-        query = """
+        """,
+    "Allergy": """
         MATCH (u:Patient {id: $uid})
         MERGE (a:Allergy {name: $name})
         MERGE (u)-[:HAS_ALLERGY]->(a)
         RETURN u.id
-        """
-        
-    if not query:
+        """,
+}
+
+
+def apply_graph_update(user_id: str, category: str, entity_name: str):
+    """
+    Writes to Neo4j ONLY when confirmed by user.
+    """
+    query = _CATEGORY_TO_QUERY.get(category)
+    if query is None:
         return False, "Invalid category"
 
+    driver = get_driver()
+
     try:
         with driver.session() as session:
             result = session.run(query, uid=user_id, name=entity_name)
             if result.single():
+                # The profile just changed — evict the cached copy so
+                # the next fetch (and everything keyed on it) sees the
+                # new fact.
+                invalidate_profile(user_id)
                 return True, f"Successfully added {category}: {entity_name}"
             else:
                 return False, f"Patient {user_id} not found in Neo4j."
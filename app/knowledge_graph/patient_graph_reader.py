@@ -21,6 +21,53 @@ Patient → WearableMetric → Reading
 from typing import Dict, Any, List
 from neo4j import GraphDatabase
 import os
+import re
+import threading
+
+import numpy as np
+
+
+# ------------------------------------------------------------------
+# Profile cache
+# ------------------------------------------------------------------
+# Users ask several questions in a row against an unchanged profile;
+# each fetch is a DB+KG join. Entries are keyed on patient_id and
+# tagged with the per-patient version current at fetch time — any
+# write path bumps the version, which logically evicts stale entries.
+
+_profile_lock = threading.Lock()
+_profile_cache: Dict[str, tuple] = {}   # patient_id -> (version, profile)
+_profile_version: Dict[str, int] = {}   # patient_id -> int
+
+
+def _bump_profile_version(user_id: str) -> None:
+    with _profile_lock:
+        _profile_version[user_id] = _profile_version.get(user_id, 0) + 1
+        _profile_cache.pop(user_id, None)
+
+
+def invalidate_profile(user_id: str) -> None:
+    """
+    Evict a patient's cached profile after an external write.
+
+    Write paths living outside this module (e.g. autopilot's confirmed
+    graph updates) call this so the next get_patient_profile goes back
+    to Neo4j instead of serving the pre-write entry.
+    """
+    _bump_profile_version(user_id)
+
+
+def clear_profile_cache() -> None:
+    """Drop all cached profiles (tests / manual invalidation)."""
+    with _profile_lock:
+        _profile_cache.clear()
+        _profile_version.clear()
+
+
+def get_profile_version(user_id: str) -> int:
+    """Current profile version for a patient (0 if never bumped)."""
+    with _profile_lock:
+        return _profile_version.get(user_id, 0)
 
 
 # ------------------------------------------------------------------
@@ -38,25 +85,36 @@ def _get_driver():
 # WRITE: Ensure patient exists (facts only)
 # ------------------------------------------------------------------
 
-def upsert_user_from_question(user_id: str, question: str) -> None:
+def upsert_user_from_question(user_id: str, question: str) -> bool:
     """
     Minimal deterministic update:
     - Ensure Patient node exists
     - Does NOT extract diseases or symptoms
+
+    Returns True when the node was newly created (profile content
+    changed), so callers and the profile cache can react.
     """
     driver = _get_driver()
 
+    # updated_at is only set ON MATCH, so its absence after the MERGE
+    # identifies a freshly created node.
     cypher = """
     MERGE (p:Patient {id: $user_id})
       ON CREATE SET p.created_at = datetime()
       ON MATCH  SET p.updated_at = datetime()
+    RETURN p.updated_at IS NULL AS created
     """
 
     with driver.session() as session:
-        session.run(cypher, user_id=user_id)
+        record = session.run(cypher, user_id=user_id).single()
 
     driver.close()
 
+    created = bool(record and record.get("created"))
+    if created:
+        _bump_profile_version(user_id)
+    return created
+
 
 # ------------------------------------------------------------------
 # READ: Fetch patient FACTS profile
@@ -74,8 +132,18 @@ def get_patient_profile(user_id: str) -> Dict[str, Any]:
     - Medications + purpose + what they treat
     - Lab results linked to each disease
     - Wearable metrics + all dated readings
+
+    Served from the in-process cache while the patient's profile
+    version is unchanged; callers get a shallow copy so top-level
+    mutation (the pipeline pops "wearables") can't corrupt the entry.
     """
 
+    with _profile_lock:
+        version = _profile_version.get(user_id, 0)
+        cached = _profile_cache.get(user_id)
+        if cached is not None and cached[0] == version:
+            return dict(cached[1])
+
     driver = _get_driver()
 
     # ── Core patient + conditions + medications + labs ──────────────
@@ -167,7 +235,11 @@ def get_patient_profile(user_id: str) -> Dict[str, Any]:
         "wearables": wearables_block,
     }
 
-    return profile
+    with _profile_lock:
+        if _profile_version.get(user_id, 0) == version:
+            _profile_cache[user_id] = (version, profile)
+
+    return dict(profile)
 
 
 # ------------------------------------------------------------------
@@ -250,6 +322,7 @@ def create_patient(
         )
 
     driver.close()
+    _bump_profile_version(user_id)
     return True
 
 
@@ -380,6 +453,22 @@ def _format_wearables(wearable_rows: List[Dict]) -> Dict[str, Any]:
             if r.get("value") and r.get("value") not in ("None", "", "null")
         ]
 
+        # Nothing usable — emit the default metric without running the
+        # sort/format/extract/trend pipeline at all.
+        if not valid_readings:
+            metrics.append({
+                "metric":         row.get("name", "Unknown Metric"),
+                "type":           row.get("type"),
+                "unit":           row.get("unit"),
+                "normal_range":   row.get("normal_range", "N/A"),
+                "latest_value":   "not recorded yet",
+                "previous_value": "not recorded yet",
+                "average_value":  "not recorded yet",
+                "trend":          "monitoring ongoing — more readings needed",
+                "readings":       [],
+            })
+            continue
+
         # Sort readings by timestamp ascending
         valid_readings.sort(key=lambda r: r.get("timestamp", ""))
 
@@ -398,7 +487,9 @@ def _format_wearables(wearable_rows: List[Dict]) -> Dict[str, Any]:
         average_value  = "not recorded yet"
         trend          = "monitoring ongoing — more readings needed"
 
-        numeric_vals = _extract_numeric_values(valid_readings)
+        # One list->array conversion; mean and trend both run on the
+        # same buffer in C for long reading histories.
+        numeric_vals = np.asarray(_extract_numeric_values(valid_readings), dtype=np.float64)
 
         if dated_readings:
             latest_value = dated_readings[-1]["value"]
@@ -406,13 +497,12 @@ def _format_wearables(wearable_rows: List[Dict]) -> Dict[str, Any]:
         if len(dated_readings) >= 2:
             previous_value = dated_readings[-2]["value"]
 
-        if len(numeric_vals) >= 2:
-            avg = sum(numeric_vals) / len(numeric_vals)
-            average_value = f"{avg:.1f} {row.get('unit', '')}".strip()
+        if numeric_vals.size >= 2:
+            average_value = f"{numeric_vals.mean():.1f} {row.get('unit', '')}".strip()
             trend = _compute_trend(numeric_vals)
 
-        elif len(numeric_vals) == 1:
-            average_value = f"{numeric_vals[0]} {row.get('unit', '')}".strip()
+        elif numeric_vals.size == 1:
+            average_value = f"{numeric_vals[0]:g} {row.get('unit', '')}".strip()
             trend = "monitoring ongoing — more readings needed"
 
         metrics.append({
@@ -433,27 +523,26 @@ def _format_wearables(wearable_rows: List[Dict]) -> Dict[str, Any]:
     }
 
 
+# Compiled once at import — avoids the per-call lookup in re's
+# bounded internal cache when walking long reading histories.
+_BP_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)\s*$")
+_NUM_RE = re.compile(r"^\s*-?\d+(?:\.\d+)?\s*$")
+
+
 def _extract_numeric_values(readings: List[Dict]) -> List[float]:
     """
     Extract numeric values from readings.
-    Skips non-numeric values like "NSR", "138/88" etc.
-    For blood pressure takes systolic only.
+    Skips non-numeric values like "NSR" etc.
+    For blood pressure ("138/88") takes systolic only.
     """
     values = []
     for r in readings:
-        raw = str(r.get("value", "")).strip()
-        # Handle blood pressure format "138/88"
-        if "/" in raw:
-            try:
-                systolic = float(raw.split("/")[0])
-                values.append(systolic)
-            except ValueError:
-                pass
-        else:
-            try:
-                values.append(float(raw))
-            except ValueError:
-                pass  # Non-numeric like "NSR" — skip cleanly
+        raw = str(r.get("value", ""))
+        bp = _BP_RE.match(raw)
+        if bp:
+            values.append(float(bp.group(1)))
+        elif _NUM_RE.match(raw):
+            values.append(float(raw))
     return values
 
 
@@ -483,10 +572,12 @@ def _clean_timestamp(ts: str) -> str:
     """
     Convert Neo4j timestamp string to readable date.
     e.g. "2026-02-08T08:00:00Z" → "2026-02-08"
+
+    Shape check + slice only — no datetime object is ever allocated.
     """
-    if not ts:
-        return "unknown date"
-    return ts[:10]  # Take YYYY-MM-DD portion only
+    if ts and len(ts) >= 10 and ts[4] == "-" and ts[7] == "-":
+        return ts[:10]  # Take YYYY-MM-DD portion only
+    return "unknown date"
 
 
 def _safe_date(value) -> str:
@@ -19,7 +19,9 @@ Patient → WearableMetric → Reading
 from typing import Dict, Any, List, Optional
 from neo4j import GraphDatabase
 import os
-from statistics import mean
+import re
+
+import numpy as np
 
 
 # ------------------------------------------------------------------
@@ -139,7 +141,10 @@ def _summarize_metric(
 
     # ── Numeric metric ───────────────────────────────────────────
     if numeric_vals:
-        avg = round(mean(numeric_vals), 1)
+        # Single C-level pass per aggregate — long wearable histories
+        # make Python-level mean/min/max loops noticeable.
+        arr = np.asarray(numeric_vals, dtype=np.float64)
+        avg = round(float(arr.mean()), 1)
 
         latest_value   = dated_readings[-1]["value"]  if dated_readings       else "not recorded"
         previous_value = dated_readings[-2]["value"]  if len(dated_readings) >= 2 else "not recorded"
@@ -154,8 +159,8 @@ def _summarize_metric(
             "latest_value":   latest_value,
             "previous_value": previous_value,
             "average_value":  average_value,
-            "min_value":      f"{min(numeric_vals)} {unit or ''}".strip(),
-            "max_value":      f"{max(numeric_vals)} {unit or ''}".strip(),
+            "min_value":      f"{float(arr.min())} {unit or ''}".strip(),
+            "max_value":      f"{float(arr.max())} {unit or ''}".strip(),
             "trend":          trend,
             "readings_count": len(valid_readings),
             "readings":       dated_readings,
@@ -168,10 +173,12 @@ def _summarize_metric(
     # ── Blood pressure metric — parse systolic for stats ────────
     bp_systolic = _extract_bp_systolic(raw_values)
     if bp_systolic:
-        avg            = round(mean(bp_systolic), 1)
+        sys_arr        = np.asarray(bp_systolic, dtype=np.float64)
+        dia_arr        = np.asarray(_extract_bp_diastolic(raw_values), dtype=np.float64)
+        avg            = round(float(sys_arr.mean()), 1)
         latest_value   = dated_readings[-1]["value"]  if dated_readings       else "not recorded"
         previous_value = dated_readings[-2]["value"]  if len(dated_readings) >= 2 else "not recorded"
-        average_value  = f"{avg}/{round(mean(_extract_bp_diastolic(raw_values)), 1)} {unit or ''}".strip()
+        average_value  = f"{avg}/{round(float(dia_arr.mean()), 1)} {unit or ''}".strip()
         trend          = _compute_numeric_trend(bp_systolic)
 
         return {
@@ -182,8 +189,8 @@ def _summarize_metric(
             "latest_value":   latest_value,
             "previous_value": previous_value,
             "average_value":  average_value,
-            "min_value":      f"{min(bp_systolic)} systolic",
-            "max_value":      f"{max(bp_systolic)} systolic",
+            "min_value":      f"{float(sys_arr.min())} systolic",
+            "max_value":      f"{float(sys_arr.max())} systolic",
             "trend":          trend,
             "readings_count": len(valid_readings),
             "readings":       dated_readings,
@@ -222,6 +229,12 @@ def _summarize_metric(
 # Numeric helpers
 # ------------------------------------------------------------------
 
+# Compiled once — re's internal cache is bounded and still pays a
+# string-keyed lookup per call, which adds up over long reading lists.
+_BP_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)\s*$")
+_NUM_RE = re.compile(r"^\s*-?\d+(?:\.\d+)?\s*$")
+
+
 def _extract_numeric_values(raw_values: List[str]) -> List[float]:
     """
     Extract plain numeric values (non-BP, non-string).
@@ -229,13 +242,9 @@ def _extract_numeric_values(raw_values: List[str]) -> List[float]:
     """
     values = []
     for v in raw_values:
-        v = str(v).strip()
-        if "/" in v:
-            continue  # BP format — handled separately
-        try:
+        v = str(v)
+        if _NUM_RE.match(v):
             values.append(float(v))
-        except ValueError:
-            pass  # String like "NSR" — skip cleanly
     return values
 
 
@@ -243,12 +252,9 @@ def _extract_bp_systolic(raw_values: List[str]) -> List[float]:
     """Extract systolic (first number) from BP readings like '138/88'."""
     values = []
     for v in raw_values:
-        v = str(v).strip()
-        if "/" in v:
-            try:
-                values.append(float(v.split("/")[0]))
-            except ValueError:
-                pass
+        m = _BP_RE.match(str(v))
+        if m:
+            values.append(float(m.group(1)))
     return values
 
 
@@ -256,12 +262,9 @@ def _extract_bp_diastolic(raw_values: List[str]) -> List[float]:
     """Extract diastolic (second number) from BP readings like '138/88'."""
     values = []
     for v in raw_values:
-        v = str(v).strip()
-        if "/" in v:
-            try:
-                values.append(float(v.split("/")[1]))
-            except ValueError:
-                pass
+        m = _BP_RE.match(str(v))
+        if m:
+            values.append(float(m.group(2)))
     return values
 
 
@@ -308,7 +311,11 @@ def _clean_timestamp(ts: str) -> str:
     """
     Convert Neo4j timestamp to readable date.
     "2026-02-08T08:00:00Z" → "2026-02-08"
+
+    Cheap shape check + slice — no datetime parsing, and malformed
+    values ("None", "null", free text) all fall through to the default.
     """
-    if not ts or ts in ("None", "null", ""):
-        return "unknown date"
-    return str(ts)[:10]
\ No newline at end of file
+    ts = str(ts) if ts else ""
+    if len(ts) >= 10 and ts[4] == "-" and ts[7] == "-":
+        return ts[:10]
+    return "unknown date"
\ No newline at end of file
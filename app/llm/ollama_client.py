@@ -1,7 +1,29 @@
+import hashlib
+
+import orjson
 import requests
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
 
 MAX_PROMPT_CHARS = 8000  # increase limit, phi3:mini can handle this
 
+# Keep-alive connection pool to the local Ollama daemon — a bare
+# requests.post pays a fresh TCP handshake per call, which is a large
+# fraction of total time on loopback.
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
+# Identical prompts (retries, repeated questions, eval runs) skip the
+# full LLM round-trip for 10 minutes. Only successful responses are
+# cached — error strings must stay retryable.
+_OLLAMA_CACHE: TTLCache = TTLCache(maxsize=256, ttl=600)
+
+
+def clear_ollama_cache() -> None:
+    """Drop all cached LLM responses (tests / manual invalidation)."""
+    _OLLAMA_CACHE.clear()
+
+
 def call_ollama(
     prompt: str,
     model: str = "phi3:mini",
@@ -13,6 +35,11 @@ def call_ollama(
     if len(prompt) > MAX_PROMPT_CHARS:
         prompt = _smart_truncate(prompt, MAX_PROMPT_CHARS)
 
+    cache_key = (model, temperature, hashlib.sha1(prompt.encode()).digest())
+    cached = _OLLAMA_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     payload = {
         "model": model,
         "messages": [
@@ -36,13 +63,15 @@ def call_ollama(
     }
 
     try:
-        response = requests.post(url, json=payload, timeout=560)
+        response = _SESSION.post(url, json=payload, timeout=560)
 
         if response.status_code != 200:
             return f"Ollama error {response.status_code}: {response.text}"
 
         data = response.json()
-        return data["message"]["content"].strip()
+        content = data["message"]["content"].strip()
+        _OLLAMA_CACHE[cache_key] = content
+        return content
 
     except requests.exceptions.ConnectionError:
         return "Error: Ollama is not running."
@@ -51,19 +80,108 @@ def call_ollama(
         return f"Error calling Ollama: {e}"
 
 
+def call_ollama_stream(
+    prompt: str,
+    model: str = "phi3:mini",
+    temperature: float = 0.7,
+):
+    """
+    Yield response text chunks as Ollama produces them.
+
+    Streaming counterpart to call_ollama for the SSE route: callers can
+    forward tokens to the client while generation is still running, so
+    perceived latency is time-to-first-token instead of the full
+    generation time. Shares the prompt cache — a cached answer is
+    yielded as one chunk, and a completed stream populates the cache
+    for subsequent non-streaming calls.
+    """
+    url = "http://localhost:11434/api/chat"
+
+    if len(prompt) > MAX_PROMPT_CHARS:
+        prompt = _smart_truncate(prompt, MAX_PROMPT_CHARS)
+
+    cache_key = (model, temperature, hashlib.sha1(prompt.encode()).digest())
+    cached = _OLLAMA_CACHE.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    payload = {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": (
+                    "You are a medical AI assistant. "
+                    "Answer clearly, concisely, and safely. "
+                    "If evidence is insufficient, say so."
+                ),
+            },
+            {
+                "role": "user",
+                "content": prompt,
+            },
+        ],
+        "options": {
+            "temperature": temperature,
+        },
+        "stream": True,
+    }
+
+    try:
+        response = _SESSION.post(url, json=payload, stream=True, timeout=560)
+
+        if response.status_code != 200:
+            yield f"Ollama error {response.status_code}: {response.text}"
+            return
+
+        pieces = []
+        for line in response.iter_lines():
+            if not line:
+                continue
+            data = orjson.loads(line)
+            chunk = data.get("message", {}).get("content", "")
+            if chunk:
+                pieces.append(chunk)
+                yield chunk
+            if data.get("done"):
+                break
+
+        # Only a completed stream is cacheable; partial output from a
+        # dropped connection never lands in the cache.
+        _OLLAMA_CACHE[cache_key] = "".join(pieces).strip()
+
+    except requests.exceptions.ConnectionError:
+        yield "Error: Ollama is not running."
+
+    except Exception as e:
+        yield f"Error calling Ollama: {e}"
+
+
+_LITERATURE_MARKER = "RELEVANT MEDICAL LITERATURE"
+_QUESTION_MARKER = "USER QUESTION"
+_TRUNCATION_BANNER = (
+    "========================\n"
+    f"{_LITERATURE_MARKER}\n"
+    "========================\n"
+    "[Truncated to fit context window]\n\n"
+)
+
+
 def _smart_truncate(prompt: str, max_chars: int) -> str:
     """
     Truncate only the LITERATURE section to preserve
     patient, wearables, and medication data.
+
+    One find per marker and a single join — long prompts are not
+    rescanned or rebuilt through intermediate concatenations.
     """
-    literature_marker = "RELEVANT MEDICAL LITERATURE"
-    guidelines_marker = "USER QUESTION"
+    lit = prompt.find(_LITERATURE_MARKER)
+    question = prompt.find(_QUESTION_MARKER)
 
-    if literature_marker in prompt and guidelines_marker in prompt:
-        before_lit = prompt[:prompt.index(literature_marker)]
-        from_question = prompt[prompt.index(guidelines_marker):]
+    if lit != -1 and question != -1:
         # Trim literature, keep everything else intact
-        return before_lit + f"========================\n{literature_marker}\n========================\n[Truncated to fit context window]\n\n" + from_question
+        return "".join((prompt[:lit], _TRUNCATION_BANNER, prompt[question:]))
 
     # Fallback: dumb truncation only if structure not found
     return prompt[:max_chars]
\ No newline at end of file
@@ -1,9 +1,17 @@
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 
 # Initialize db here so both app.py and routes can use it
 db = SQLAlchemy()
 
+# Argon2id at OWASP-recommended parameters — the C backend buys far
+# more security per millisecond than Werkzeug's pure-Python PBKDF2
+# iteration count, so signup/login (and auth-heavy tests) spend less CPU.
+_ph = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+
 class User(db.Model):
     __tablename__ = "users"
     id            = db.Column(db.Integer, primary_key=True)
@@ -12,7 +20,14 @@ class User(db.Model):
     role          = db.Column(db.String(50), default="patient")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = _ph.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
\ No newline at end of file
+        try:
+            return _ph.verify(self.password_hash, password)
+        except VerificationError:
+            return False
+        except InvalidHashError:
+            # Hashes written before the Argon2 switch (Werkzeug
+            # pbkdf2/scrypt format) still verify through the old path.
+            return check_password_hash(self.password_hash, password)
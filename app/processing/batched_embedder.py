@@ -0,0 +1,110 @@
+"""
+Micro-batching wrapper around embed_texts.
+
+Purpose:
+- Coalesce concurrent single-text embedding calls (one per request in
+  the search path) into one model forward pass.
+- Per-call tokenizer + kernel-launch overhead dominates single-item
+  encodes; a handful of queries batched together encode at close to
+  the cost of one.
+
+Design:
+- Callers submit text and block on a Future.
+- A lazy daemon thread drains the queue, flushing when MAX_BATCH items
+  are collected or MAX_WAIT_MS has passed since the first item.
+- The batch goes through embed_texts, so the vector cache and
+  duplicate folding still apply.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import numpy as np
+
+from app.processing.embedding import embed_texts
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_BATCH = 32
+MAX_WAIT_MS = 8.0
+
+
+class BatchedEmbedder:
+    """
+    Queue + background thread that batches concurrent embed calls.
+    """
+
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self._max_batch = max_batch
+        self._max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.SimpleQueue[tuple]" = queue.SimpleQueue()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def submit(self, text: str) -> "Future[np.ndarray]":
+        """Queue one text; the Future resolves to its embedding row."""
+        self._ensure_worker()
+        future: "Future[np.ndarray]" = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        """Blocking convenience wrapper over submit()."""
+        return self.submit(text).result()
+
+    def _ensure_worker(self) -> None:
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                thread = threading.Thread(
+                    target=self._worker, name="batched-embedder", daemon=True
+                )
+                thread.start()
+                self._started = True
+
+    def _worker(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._max_wait
+
+            # Collect whatever else arrives inside the window.
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                rows = embed_texts(texts)
+            except Exception as exc:  # propagate to every waiter
+                logger.exception("Batched embedding failed")
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            for (_, future), row in zip(batch, rows):
+                future.set_result(row)
+
+
+_shared: Optional[BatchedEmbedder] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_embedder() -> BatchedEmbedder:
+    """Process-wide embedder shared by all query paths."""
+    global _shared
+
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = BatchedEmbedder()
+    return _shared
@@ -1,5 +1,7 @@
-from typing import List
+from functools import lru_cache
+from typing import List, Tuple
 
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from app.config import settings
@@ -8,6 +10,20 @@ from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+@lru_cache(maxsize=8)
+def _get_splitter(size: int, overlap: int) -> RecursiveCharacterTextSplitter:
+    """
+    One splitter per (size, overlap) — constructing a
+    RecursiveCharacterTextSplitter per call is the dominant fixed cost
+    of chunking short documents.
+    """
+    return RecursiveCharacterTextSplitter(
+        chunk_size=size,
+        chunk_overlap=overlap,
+        separators=["\n\n", "\n", ".", " ", ""],
+    )
+
+
 def simple_chunk(
     text: str,
     chunk_size: int | None = None,
@@ -25,13 +41,7 @@ def simple_chunk(
     size = chunk_size or settings.CHUNK_SIZE
     ovlp = overlap or settings.CHUNK_OVERLAP
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=size,
-        chunk_overlap=ovlp,
-        separators=["\n\n", "\n", ".", " ", ""],
-    )
-
-    chunks = splitter.split_text(text)
+    chunks = _get_splitter(size, ovlp).split_text(text)
 
     logger.debug(
         "Text chunked",
@@ -42,4 +52,34 @@ def simple_chunk(
         },
     )
 
-    return chunks
\ No newline at end of file
+    return chunks
+
+
+def simple_chunk_offsets(
+    text: str,
+    chunk_size: int | None = None,
+    overlap: int | None = None,
+) -> Tuple[str, np.ndarray]:
+    """
+    Chunk text and return (text, offsets) instead of chunk strings.
+
+    offsets is an (N, 2) int64 array of (start, end) pairs into text.
+    Holding one string plus an offset table instead of N chunk objects
+    keeps peak memory flat on large documents; slices are materialized
+    only when a consumer (e.g. embed_offsets) needs them.
+    """
+    chunks = simple_chunk(text, chunk_size=chunk_size, overlap=overlap)
+    if not chunks:
+        return "", np.empty((0, 2), dtype=np.int64)
+
+    offsets = np.empty((len(chunks), 2), dtype=np.int64)
+    cursor = 0
+    for i, chunk in enumerate(chunks):
+        start = text.find(chunk, cursor)
+        if start == -1:
+            start = text.find(chunk)
+        offsets[i, 0] = start
+        offsets[i, 1] = start + len(chunk)
+        cursor = start + 1
+
+    return text, offsets
\ No newline at end of file
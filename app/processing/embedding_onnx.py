@@ -0,0 +1,118 @@
+"""
+ONNX Runtime backend for the embedding model.
+
+Optional alternative to the PyTorch SentenceTransformer: the exported
+graph fuses ops and removes per-op Python dispatch, which is the bulk
+of per-batch overhead on CPU. Requires the `optimum[onnxruntime]`
+extra; nothing here is imported unless EMBEDDING_BACKEND="onnx".
+"""
+
+from typing import List
+
+import numpy as np
+
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_encoder = None
+
+
+class OnnxEncoder:
+    """
+    Minimal encode() façade over an ORT feature-extraction model so
+    embed_texts can use it interchangeably with SentenceTransformer.
+    """
+
+    def __init__(self, model, tokenizer):
+        self._model = model
+        self._tokenizer = tokenizer
+
+    def encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        outputs = []
+
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            tokens = self._tokenizer(
+                batch, padding=True, truncation=True, return_tensors="np"
+            )
+            hidden = self._model(**tokens).last_hidden_state
+
+            # CLS-token pooling: the configured model (BAAI/bge-m3)
+            # pools the first token in its sentence-transformers config,
+            # so the ONNX backend must do the same or its vectors land
+            # in a different space than the torch-written Qdrant points.
+            pooled = hidden[:, 0]
+            outputs.append(pooled)
+
+        embeddings = np.concatenate(outputs, axis=0).astype(np.float32)
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+
+        return embeddings
+
+
+def get_onnx_encoder() -> OnnxEncoder:
+    """
+    Lazy-load, export and graph-optimize the embedding model under ORT.
+    """
+    global _encoder
+
+    if _encoder is None:
+        import os
+
+        import onnxruntime
+        from optimum.onnxruntime import (
+            ORTModelForFeatureExtraction,
+            ORTOptimizer,
+        )
+        from optimum.onnxruntime.configuration import OptimizationConfig
+        from transformers import AutoTokenizer
+
+        cuda = settings.EMBEDDING_DEVICE == "cuda"
+        provider = "CUDAExecutionProvider" if cuda else "CPUExecutionProvider"
+
+        session_options = onnxruntime.SessionOptions()
+        if not cuda and not os.getenv("OMP_NUM_THREADS"):
+            session_options.intra_op_num_threads = (
+                settings.EMBEDDING_CPU_THREADS or os.cpu_count() or 1
+            )
+
+        logger.info(
+            "Exporting embedding model to ONNX",
+            extra={
+                "model_name": settings.EMBEDDING_MODEL_NAME,
+                "provider": provider,
+            },
+        )
+
+        model = ORTModelForFeatureExtraction.from_pretrained(
+            settings.EMBEDDING_MODEL_NAME,
+            export=True,
+            provider=provider,
+            session_options=session_options,
+        )
+
+        optimizer = ORTOptimizer.from_pretrained(model)
+        optimization = OptimizationConfig(
+            optimization_level=99, optimize_for_gpu=cuda
+        )
+        optimized_dir = optimizer.optimize(save_dir="onnx_embedding", optimization_config=optimization)
+
+        model = ORTModelForFeatureExtraction.from_pretrained(
+            optimized_dir, provider=provider, session_options=session_options
+        )
+        tokenizer = AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL_NAME)
+
+        _encoder = OnnxEncoder(model, tokenizer)
+
+    return _encoder
@@ -1,3 +1,6 @@
+import os
+import threading
+from functools import lru_cache
 from typing import Dict, List
 
 import torch
@@ -9,9 +12,28 @@ from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
 _model: GLiNER | None = None
+_model_lock = threading.Lock()
 
 
+def _reset_after_fork() -> None:
+    """
+    Drop a CUDA-resident model in forked children (gunicorn --preload):
+    CUDA contexts don't survive fork. CPU weights stay shared
+    copy-on-write, which is what PRELOAD_MODELS is for.
+    """
+    global _model
+
+    if _model is not None and _get_device() != "cpu":
+        _model = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@lru_cache(maxsize=1)
 def _get_device() -> str:
+    # Memoized: torch.cuda.is_available() round-trips to the CUDA
+    # driver and the answer never changes within a process.
     if settings.NER_DEVICE:
         return settings.NER_DEVICE
     return "cuda" if torch.cuda.is_available() else "cpu"
@@ -23,27 +45,92 @@ def _get_model() -> GLiNER:
     """
     global _model
 
-    if _model is None:
-        device = _get_device()
-        logger.info(
-            "Loading NER model",
-            extra={
-                "model_name": settings.NER_MODEL_NAME,
-                "device": device,
-            },
-        )
-        _model = GLiNER.from_pretrained(settings.NER_MODEL_NAME).to(device)
+    # Lock-free fast path; double-checked lock so concurrent first
+    # requests can't both load the model and double peak memory.
+    if _model is not None:
+        return _model
+
+    with _model_lock:
+        if _model is None:
+            device = _get_device()
+            logger.info(
+                "Loading NER model",
+                extra={
+                    "model_name": settings.NER_MODEL_NAME,
+                    "device": device,
+                },
+            )
+            model = GLiNER.from_pretrained(settings.NER_MODEL_NAME).to(device)
+
+            # Half precision on CUDA: NER inference is weight-bandwidth
+            # bound, so fp16/bf16 roughly doubles throughput.
+            if device == "cuda" and settings.NER_PRECISION in {"fp16", "bf16"}:
+                if settings.NER_PRECISION == "bf16":
+                    model = model.to(torch.bfloat16)
+                else:
+                    model = model.half()
+
+            # torch.compile removes per-op Python dispatch from the
+            # forward pass; "reduce-overhead" also CUDA-graphs small
+            # batches.
+            if settings.NER_COMPILE and hasattr(torch, "compile"):
+                try:
+                    model.model = torch.compile(
+                        model.model, mode="reduce-overhead", fullgraph=False
+                    )
+                except Exception:
+                    logger.exception(
+                        "torch.compile failed; using eager NER model"
+                    )
+
+            _model = model
 
     return _model
 
 
+_KEYS = ("drugs", "conditions", "biomarkers", "symptoms")
+
+
 def _empty_result() -> Dict[str, List[str]]:
-    return {
-        "drugs": [],
-        "conditions": [],
-        "biomarkers": [],
-        "symptoms": [],
-    }
+    return {k: [] for k in _KEYS}
+
+
+# GLiNER label → result bucket, resolved with one dict probe per entity
+# instead of a compare-branch chain.
+_LABEL_TO_BUCKET = {
+    "drug": "drugs",
+    "medical condition": "conditions",
+    "biomarker": "biomarkers",
+    "symptom": "symptoms",
+}
+
+# ASCII case fold as a translate table — one C-level pass instead of
+# str.lower()'s full Unicode handling; medical entity text is ASCII.
+_ASCII_FOLD = str.maketrans({c: c + 32 for c in range(ord("A"), ord("Z") + 1)})
+
+
+def _collect_entities(entities) -> Dict[str, List[str]]:
+    """Dedup raw GLiNER spans into the per-bucket result dict."""
+    # Pre-sized buckets with cursors: no bucket can outgrow the span
+    # list, so filling slots avoids append's realloc churn entirely.
+    size = len(entities)
+    buckets = {k: [None] * size for k in _KEYS}
+    cursors = {k: 0 for k in _KEYS}
+
+    for ent in entities:
+        bucket = _LABEL_TO_BUCKET.get(ent.get("label"))
+        if bucket is None:
+            continue
+
+        value = ent.get("text", "").translate(_ASCII_FOLD).strip()
+        if value:
+            buckets[bucket][cursors[bucket]] = value
+            cursors[bucket] += 1
+
+    # Truncate to the filled prefix, then ordered dedup in one C-level
+    # pass per bucket; dict.fromkeys keeps first-seen order, which
+    # callers rely on.
+    return {k: list(dict.fromkeys(v[:cursors[k]])) for k, v in buckets.items()}
 
 
 def extract_medical_entities(text: str) -> Dict[str, List[str]]:
@@ -60,32 +147,18 @@ def extract_medical_entities(text: str) -> Dict[str, List[str]]:
     labels = settings.NER_LABELS
 
     try:
-        entities = model.predict_entities(
-            text,
-            labels,
-            threshold=settings.NER_CONFIDENCE_THRESHOLD,
-        )
+        # inference_mode drops autograd bookkeeping from the forward pass
+        with torch.inference_mode():
+            entities = model.predict_entities(
+                text,
+                labels,
+                threshold=settings.NER_CONFIDENCE_THRESHOLD,
+            )
     except Exception:
         logger.exception("NER inference failed")
         return _empty_result()
 
-    results = _empty_result()
-
-    for ent in entities:
-        value = ent.get("text", "").lower().strip()
-        label = ent.get("label")
-
-        if not value:
-            continue
-
-        if label == "drug" and value not in results["drugs"]:
-            results["drugs"].append(value)
-        elif label == "medical condition" and value not in results["conditions"]:
-            results["conditions"].append(value)
-        elif label == "biomarker" and value not in results["biomarkers"]:
-            results["biomarkers"].append(value)
-        elif label == "symptom" and value not in results["symptoms"]:
-            results["symptoms"].append(value)
+    results = _collect_entities(entities)
 
     logger.debug(
         "NER extraction complete",
@@ -97,4 +170,48 @@ def extract_medical_entities(text: str) -> Dict[str, List[str]]:
         },
     )
 
+    return results
+
+
+def extract_medical_entities_batch(texts: List[str]) -> List[Dict[str, List[str]]]:
+    """
+    Extract medical entities from several texts in one GLiNER call.
+
+    Batched inference keeps the model busy across all chunks of a
+    document instead of paying the per-call overhead once per chunk.
+    Returns one result dict per input text, in order.
+    """
+    if not texts:
+        return []
+
+    # Invalid entries keep their slot but never reach the model.
+    valid_indexes = [
+        i for i, t in enumerate(texts) if isinstance(t, str) and t
+    ]
+    results = [_empty_result() for _ in texts]
+    if not valid_indexes:
+        logger.debug("NER batch skipped: no valid texts")
+        return results
+
+    model = _get_model()
+
+    try:
+        with torch.inference_mode():
+            batches = model.batch_predict_entities(
+                [texts[i] for i in valid_indexes],
+                settings.NER_LABELS,
+                threshold=settings.NER_CONFIDENCE_THRESHOLD,
+            )
+    except Exception:
+        logger.exception("Batched NER inference failed")
+        return results
+
+    for i, entities in zip(valid_indexes, batches):
+        results[i] = _collect_entities(entities)
+
+    logger.debug(
+        "Batched NER extraction complete",
+        extra={"texts": len(valid_indexes)},
+    )
+
     return results
\ No newline at end of file
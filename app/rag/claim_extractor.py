@@ -5,6 +5,69 @@ Handles multiple formats and has reliable fallbacks.
 
 from typing import List, Dict
 import re
+import sys
+
+import ahocorasick
+
+# ------------------------------------------------------------------
+# Precompiled patterns — these fire several times per extraction, and
+# compiling once at import skips the re-cache lookup on every call.
+# ------------------------------------------------------------------
+
+_RE_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_RE_ITALIC = re.compile(r'\*(.+?)\*')
+_RE_CODE = re.compile(r'`(.+?)`')
+_RE_SENT = re.compile(r'(?<=[.!?])\s+')
+_RE_DASH_CLAIM = re.compile(r'^-\s+([A-Z]+):\s+(.+)$')
+# Fused variant for extract_claims: scans the raw text in one
+# finditer pass, tolerating bold markers around the type tag that
+# the full-text markdown strip used to remove first.
+_RE_DASH_CLAIM_ITER = re.compile(
+    r'^\s*-\s+\*{0,2}([A-Z_]+)\*{0,2}:\s+(.+?)\s*$', re.MULTILINE
+)
+_DASH_CLAIM_TYPES = frozenset(['risk', 'monitoring', 'warning', 'recommendation'])
+_RE_HEADER_LINE = re.compile(r'^\s*#+\s+(.+?)\s*$', re.MULTILINE)
+_RE_NUM_BULLET = re.compile(r'^\d+\.\s+')
+
+# Known section headers from prompt_builder.py response format
+_SECTION_PATTERNS = [
+    (re.compile(r'key\s+considerations?\s*:', re.IGNORECASE), 'general'),
+    (re.compile(r'what\s+to\s+monitor\s*:', re.IGNORECASE), 'monitoring'),
+    (re.compile(r'when\s+to\s+seek\s+medical\s+help\s*:', re.IGNORECASE), 'warning'),
+    (re.compile(r'safety\s+notes?\s*:', re.IGNORECASE), 'recommendation'),
+]
+
+_RE_SECTION_SPLIT = re.compile(
+    r'(' + '|'.join(p.pattern for p, _ in _SECTION_PATTERNS) + r')',
+    re.IGNORECASE,
+)
+
+# Claim-type keywords, in priority order (first matching type wins).
+_TYPE_PRIORITY = ('risk', 'monitoring', 'warning', 'recommendation')
+
+_CLAIM_KEYWORDS = {
+    'risk': ['risk', 'danger', 'avoid', 'contraindicated', 'caution', 'can cause', 'may cause'],
+    'monitoring': ['monitor', 'track', 'watch', 'check', 'measure', 'test', 'observe'],
+    'warning': ['urgent', 'immediately', 'emergency', 'seek', 'call', 'hospital'],
+    'recommendation': ['recommend', 'suggest', 'consider', 'should', 'important', 'maintain'],
+}
+
+
+def _build_keyword_automaton() -> "ahocorasick.Automaton":
+    """
+    All classification keywords in one Aho-Corasick automaton, so a
+    sentence is classified in a single scan instead of one substring
+    search per keyword.
+    """
+    automaton = ahocorasick.Automaton()
+    for rank, ctype in enumerate(_TYPE_PRIORITY):
+        for word in _CLAIM_KEYWORDS[ctype]:
+            automaton.add_word(word, rank)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
 
 
 def extract_claims(text: str) -> List[Dict[str, str]]:
@@ -16,14 +79,27 @@ def extract_claims(text: str) -> List[Dict[str, str]]:
     if not text:
         return []
 
-    # ✅ Always strip markdown bold/italic before processing
-    clean_text = _strip_markdown(text)
-
-    # Strategy 1: Dash-based claims (- RISK: ..., - MONITORING: ...)
-    claims = _extract_dash_based_claims(clean_text)
+    # Strategy 1: Dash-based claims (- RISK: ..., - MONITORING: ...).
+    # Fused pass over the raw text: extraction, per-statement markdown
+    # stripping and type mapping in one finditer, skipping the
+    # whole-text strip when this common format hits.
+    claims = [
+        {
+            # sys.intern collapses the fresh .lower() result onto the
+            # interned literal, so downstream tag compares are by
+            # pointer.
+            "type": sys.intern(ctype) if ctype in _DASH_CLAIM_TYPES else "general",
+            "statement": _strip_markdown(match.group(2)).strip(),
+        }
+        for match in _RE_DASH_CLAIM_ITER.finditer(text)
+        for ctype in (match.group(1).lower(),)
+    ]
     if claims:
         return claims
 
+    # ✅ Always strip markdown bold/italic before processing
+    clean_text = _strip_markdown(text)
+
     # Strategy 2: Inline bold section headers (**Key Considerations:** ...)
     # This is what phi3:mini / ollama models typically output
     claims = _extract_bold_section_claims(clean_text)
@@ -67,12 +143,17 @@ def _strip_markdown(text: str) -> str:
     Remove markdown bold (**text**), italic (*text*), and header markers.
     Preserves the actual content text.
     """
-    # Remove bold: **text** → text
-    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
-    # Remove italic: *text* → text
-    text = re.sub(r'\*(.+?)\*', r'\1', text)
-    # Remove inline code: `text` → text
-    text = re.sub(r'`(.+?)`', r'\1', text)
+    # Cheap substring gates: plain prose (the common case) skips the
+    # regex VM entirely.
+    if '**' in text:
+        # Remove bold: **text** → text
+        text = _RE_BOLD.sub(r'\1', text)
+    if '*' in text:
+        # Remove italic: *text* → text
+        text = _RE_ITALIC.sub(r'\1', text)
+    if '`' in text:
+        # Remove inline code: `text` → text
+        text = _RE_CODE.sub(r'\1', text)
     return text
 
 
@@ -90,22 +171,7 @@ def _extract_bold_section_claims(text: str) -> List[Dict[str, str]]:
     After markdown stripping, the bold headers become plain text like:
     "Key Considerations: ..."
     """
-    # Known section headers from prompt_builder.py response format
-    section_patterns = [
-        (r'key\s+considerations?\s*:', 'general'),
-        (r'what\s+to\s+monitor\s*:',   'monitoring'),
-        (r'when\s+to\s+seek\s+medical\s+help\s*:', 'warning'),
-        (r'safety\s+notes?\s*:',        'recommendation'),
-    ]
-
-    # Build a splitter that splits on any known section header
-    splitter = '|'.join(p for p, _ in section_patterns)
-    full_pattern = re.compile(
-        r'(' + splitter + r')',
-        re.IGNORECASE
-    )
-
-    parts = full_pattern.split(text)
+    parts = _RE_SECTION_SPLIT.split(text)
 
     if len(parts) <= 1:
         return []  # No section headers found
@@ -120,13 +186,13 @@ def _extract_bold_section_claims(text: str) -> List[Dict[str, str]]:
 
         # Determine type from header
         claim_type = "general"
-        for pattern, ctype in section_patterns:
-            if re.search(pattern, header, re.IGNORECASE):
+        for pattern, ctype in _SECTION_PATTERNS:
+            if pattern.search(header):
                 claim_type = ctype
                 break
 
         # Split content into individual sentences
-        sentences = re.split(r'(?<=[.!?])\s+', content)
+        sentences = _RE_SENT.split(content)
         for sentence in sentences:
             sentence = sentence.strip().rstrip('.')
             # Skip very short or empty sentences
@@ -144,14 +210,15 @@ def _extract_dash_based_claims(text: str) -> List[Dict[str, str]]:
     Extract claims in format: - RISK: statement
     """
     claims = []
-    pattern = r'^-\s+([A-Z]+):\s+(.+)$'
 
     for line in text.splitlines():
-        match = re.match(pattern, line.strip())
+        match = _RE_DASH_CLAIM.match(line.strip())
         if match:
             claim_type = match.group(1).lower()
             statement = match.group(2).strip()
-            if claim_type not in ['risk', 'monitoring', 'warning', 'recommendation']:
+            if claim_type in _DASH_CLAIM_TYPES:
+                claim_type = sys.intern(claim_type)
+            else:
                 claim_type = 'general'
             claims.append({"type": claim_type, "statement": statement})
 
@@ -162,26 +229,23 @@ def _split_by_headers(text: str) -> Dict[str, str]:
     """
     Split text into sections by markdown headers (# or ##).
     """
-    sections = {}
-    current_section = "unknown"
-    buffer = []
+    # One multiline finditer; section bodies come out as slices between
+    # consecutive header matches instead of re-joined line buffers.
+    matches = list(_RE_HEADER_LINE.finditer(text))
+    if not matches:
+        stripped = text.strip()
+        return {"unknown": stripped} if stripped else {}
 
-    for line in text.splitlines():
-        header_match = re.match(r'^#+\s+(.+)$', line.strip())
-        if header_match:
-            if buffer:
-                section_text = "\n".join(buffer).strip()
-                if section_text:
-                    sections[current_section] = section_text
-                buffer = []
-            current_section = header_match.group(1).lower()
-        else:
-            buffer.append(line)
+    sections = {}
+    preamble = text[:matches[0].start()].strip()
+    if preamble:
+        sections["unknown"] = preamble
 
-    if buffer:
-        section_text = "\n".join(buffer).strip()
-        if section_text:
-            sections[current_section] = section_text
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        content = text[match.end():end].strip()
+        if content:
+            sections[match.group(1).lower()] = content
 
     return sections
 
@@ -199,8 +263,8 @@ def _extract_bullet_points(text: str) -> List[str]:
             claim = line.lstrip('-*•').strip()
             if claim:
                 claims.append(claim)
-        elif re.match(r'^\d+\.\s+', line):
-            claim = re.sub(r'^\d+\.\s+', '', line).strip()
+        elif _RE_NUM_BULLET.match(line):
+            claim = _RE_NUM_BULLET.sub('', line).strip()
             if claim:
                 claims.append(claim)
     return claims
@@ -211,35 +275,69 @@ def _extract_smart_sentences(text: str) -> List[Dict[str, str]]:
     Smart sentence extraction with type classification (fallback).
     """
     claims = []
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    n = len(text)
+    start = 0
+    i = 0
+
+    # Single left-to-right walk: emit a sentence at each terminator
+    # followed by whitespace, classify it in one automaton scan, and
+    # stop as soon as the 15-claim cap is hit.
+    while i < n and len(claims) < 15:
+        if text[i] in '.!?' and i + 1 < n and text[i + 1].isspace():
+            sentence = text[start:i + 1].strip()
+            if 15 < len(sentence) < 500:
+                claims.append({
+                    "type": _classify_sentence(sentence),
+                    "statement": sentence
+                })
+            i += 1
+            while i < n and text[i].isspace():
+                i += 1
+            start = i
+        else:
+            i += 1
 
-    for sentence in sentences:
-        sentence = sentence.strip()
+    if start < n and len(claims) < 15:
+        sentence = text[start:].strip()
         if 15 < len(sentence) < 500:
             claims.append({
                 "type": _classify_sentence(sentence),
                 "statement": sentence
             })
 
-    return claims[:15]
+    return claims
 
 
 def _classify_sentence(sentence: str) -> str:
     """
     Classify a sentence into a claim type based on keywords.
     """
-    s = sentence.lower()
+    best = len(_TYPE_PRIORITY)
+
+    for _, rank in _KEYWORD_AUTOMATON.iter(sentence.lower()):
+        if rank < best:
+            best = rank
+            if best == 0:
+                break
+
+    return _TYPE_PRIORITY[best] if best < len(_TYPE_PRIORITY) else "general"
+
 
-    if any(w in s for w in ['risk', 'danger', 'avoid', 'contraindicated', 'caution', 'can cause', 'may cause']):
-        return "risk"
-    if any(w in s for w in ['monitor', 'track', 'watch', 'check', 'measure', 'test', 'observe']):
-        return "monitoring"
-    if any(w in s for w in ['urgent', 'immediately', 'emergency', 'seek', 'call', 'hospital']):
-        return "warning"
-    if any(w in s for w in ['recommend', 'suggest', 'consider', 'should', 'important', 'maintain']):
-        return "recommendation"
+# Section-title keywords by claim type, in the same priority order as
+# _TYPE_PRIORITY-based classification (risk checked first).
+_SECTION_KEYWORDS = {
+    'risk': ['risk', 'concern', 'danger'],
+    'monitoring': ['monitor', 'watch', 'track'],
+    'warning': ['help', 'urgent', 'emergency', 'seek'],
+    'recommendation': ['recommend', 'consider', 'suggest', 'safety', 'note'],
+}
 
-    return "general"
+# Exact-token fast path: one dict probe per title word.
+_SECTION_TOKEN_MAP = {
+    keyword: (rank, ctype)
+    for rank, (ctype, keywords) in enumerate(_SECTION_KEYWORDS.items())
+    for keyword in keywords
+}
 
 
 def _map_section_to_type(section: str) -> str:
@@ -248,13 +346,16 @@ def _map_section_to_type(section: str) -> str:
     """
     s = section.lower()
 
-    if any(w in s for w in ['risk', 'concern', 'danger']):
-        return "risk"
-    if any(w in s for w in ['monitor', 'watch', 'track']):
-        return "monitoring"
-    if any(w in s for w in ['help', 'urgent', 'emergency', 'seek']):
-        return "warning"
-    if any(w in s for w in ['recommend', 'consider', 'suggest', 'safety', 'note']):
-        return "recommendation"
+    # Hashed token lookup handles the common exact-word titles; ties
+    # resolve by category priority, matching the substring fallback.
+    hits = [_SECTION_TOKEN_MAP[t] for t in s.split() if t in _SECTION_TOKEN_MAP]
+    if hits:
+        return min(hits)[1]
+
+    # Substring fallback catches derived forms ("Recommendations",
+    # "Risks") that the token map misses.
+    for ctype, keywords in _SECTION_KEYWORDS.items():
+        if any(w in s for w in keywords):
+            return ctype
 
     return "general"
\ No newline at end of file
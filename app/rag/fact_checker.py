@@ -7,21 +7,39 @@ Simple fact checker for Graph-RAG claims.
 - Returns augmented claims: { type, statement, verified: bool, sources: [ ... ] }
 """
 
-from typing import List, Dict
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import re
+
+import ahocorasick
+
+from app.config import settings
 from app.rag.claim_extractor import extract_claims
 
+_RE_WORD = re.compile(r"\w+")
 
+
+@lru_cache(maxsize=4096)
 def _normalize(text: str) -> str:
+    # Memoized: med/condition names and repeated statements dominate
+    # real inputs, and every .lower() otherwise allocates a new string.
     return (text or "").lower()
 
 
+@lru_cache(maxsize=512)
+def _compile_any(tokens: Tuple[str, ...]) -> "re.Pattern[str]":
+    """One alternation pattern per distinct token set."""
+    return re.compile("|".join(re.escape(t) for t in tokens))
+
+
 def _match_any(token_list: List[str], text: str) -> bool:
-    t = _normalize(text)
-    for tok in token_list:
-        if tok and tok.lower() in t:
-            return True
-    return False
+    tokens = tuple(sorted({t.lower() for t in token_list if t}))
+    if not tokens:
+        return False
+    # Single C-level scan for all tokens instead of one substring
+    # search per token.
+    return _compile_any(tokens).search(_normalize(text)) is not None
 
 
 def _patient_med_names(context: Dict) -> List[str]:
@@ -34,47 +52,140 @@ def _patient_conditions(context: Dict) -> List[str]:
     return [c.get("name", "").lower() for c in conds if c.get("name")]
 
 
-def _papers_evidence(context: Dict, claim_text: str) -> List[Dict]:
-    hits = []
+# Above this many papers, scan one concatenated blob instead of
+# looping paper-by-paper in Python.
+_PAPERS_BLOB_THRESHOLD = 8
+
+
+def _normalize_papers(context: Dict):
+    """
+    Lowercase each paper's title+preview once per verification run.
+
+    For larger corpora the lowercased texts are additionally joined
+    into a single sentinel-separated blob with a start-offset table,
+    so each claim is matched in one C-level scan across all papers.
+    """
+    entries = []
     for p in context.get("papers", []) or []:
         title = p.get("title", "") or ""
         preview = (p.get("text_preview") or "")[:1000]
-        combined = f"{title}\n{preview}".lower()
-        if claim_text.lower() in combined or any(word in combined for word in re.findall(r"\w+", claim_text.lower())[:5]):
-            hits.append(
-                {
-                    "type": "paper",
-                    "pmid": p.get("pmid"),
-                    "title": p.get("title"),
-                    "snippet": (preview[:300] + "...") if preview else "",
-                }
-            )
+        entries.append((p, preview, f"{title}\n{preview}".lower()))
+
+    blob = None
+    starts = None
+    if len(entries) > _PAPERS_BLOB_THRESHOLD:
+        starts = []
+        pos = 0
+        for _, _, combined in entries:
+            starts.append(pos)
+            pos += len(combined) + 1
+        blob = "\x1f".join(combined for _, _, combined in entries)
+
+    return entries, blob, starts
+
+
+def _paper_hit(paper: Dict, preview: str) -> Dict:
+    return {
+        "type": "paper",
+        "pmid": paper.get("pmid"),
+        "title": paper.get("title"),
+        "snippet": (preview[:300] + "...") if preview else "",
+    }
+
+
+def _papers_evidence(context: Dict, claim_text: str) -> List[Dict]:
+    return _papers_evidence_normalized(_normalize_papers(context), claim_text)
+
+
+def _papers_evidence_normalized(normalized_papers, claim_text: str) -> List[Dict]:
+    entries, blob, starts = normalized_papers
+    lowered = claim_text.lower()
+    words = _RE_WORD.findall(lowered)[:5]
+
+    if blob is not None and lowered:
+        # One alternation scan over the whole corpus; match offsets map
+        # back to papers through the start table.
+        tokens = dict.fromkeys([lowered, *words])
+        pattern = re.compile("|".join(re.escape(t) for t in tokens if t))
+        hit_indexes = set()
+        for match in pattern.finditer(blob):
+            hit_indexes.add(bisect_right(starts, match.start()) - 1)
+            if len(hit_indexes) == len(entries):
+                break
+        return [_paper_hit(entries[i][0], entries[i][1]) for i in sorted(hit_indexes)]
+
+    hits = []
+    for p, preview, combined in entries:
+        if lowered in combined or any(word in combined for word in words):
+            hits.append(_paper_hit(p, preview))
     return hits
 
 
-def verify_claim(claim: Dict[str, str], context: Dict) -> Dict:
+def _build_context_automaton(context: Dict) -> Tuple[Optional["ahocorasick.Automaton"], List[str], List[str]]:
     """
-    Verify a single claim dictionary: {"type":..., "statement":...}
-    Returns claim augmented with "verified": bool and "sources": list.
+    One Aho-Corasick automaton over all patient med/condition names, so
+    each claim is probed with a single scan of its statement instead of
+    one substring search per name.
     """
+    meds = _patient_med_names(context)
+    conds = _patient_conditions(context)
+
+    if not meds and not conds:
+        return None, meds, conds
+
+    tags: Dict[str, set] = {}
+    for name in meds:
+        tags.setdefault(name, set()).add("med")
+    for name in conds:
+        tags.setdefault(name, set()).add("cond")
+
+    automaton = ahocorasick.Automaton()
+    for name, categories in tags.items():
+        automaton.add_word(name, frozenset(categories))
+    automaton.make_automaton()
+
+    return automaton, meds, conds
+
+
+def _verify_claim_with_auto(
+    claim: Dict[str, str],
+    automaton: Optional["ahocorasick.Automaton"],
+    meds: List[str],
+    conds: List[str],
+    normalized_papers,
+    semantic_row=None,
+) -> Dict:
     statement = claim.get("statement", "")
     sources = []
     verified = False
 
+    matched: set = set()
+    if automaton is not None:
+        for _, categories in automaton.iter(_normalize(statement)):
+            matched |= categories
+            if len(matched) == 2:
+                break
+
     # Check KG: patient meds
-    meds = _patient_med_names(context)
-    if _match_any(meds, statement):
+    if "med" in matched:
         sources.append({"type": "kg", "detail": "patient_medication_match", "medications": meds})
         verified = True
 
     # Check KG: patient conditions
-    conds = _patient_conditions(context)
-    if _match_any(conds, statement):
+    if "cond" in matched:
         sources.append({"type": "kg", "detail": "patient_condition_match", "conditions": conds})
         verified = True
 
     # Check papers (Qdrant results included in context)
-    paper_hits = _papers_evidence(context, statement)
+    paper_hits = _papers_evidence_normalized(normalized_papers, statement)
+    if semantic_row is not None:
+        entries = normalized_papers[0]
+        hit_pmids = {h.get("pmid") for h in paper_hits}
+        threshold = settings.FACT_CHECK_SEMANTIC_THRESHOLD
+        for i, score in enumerate(semantic_row):
+            paper = entries[i][0]
+            if score >= threshold and paper.get("pmid") not in hit_pmids:
+                paper_hits.append(_paper_hit(paper, entries[i][1]))
     if paper_hits:
         sources.extend(paper_hits)
         verified = True
@@ -87,6 +198,17 @@ def verify_claim(claim: Dict[str, str], context: Dict) -> Dict:
     }
 
 
+def verify_claim(claim: Dict[str, str], context: Dict) -> Dict:
+    """
+    Verify a single claim dictionary: {"type":..., "statement":...}
+    Returns claim augmented with "verified": bool and "sources": list.
+    """
+    automaton, meds, conds = _build_context_automaton(context)
+    return _verify_claim_with_auto(
+        claim, automaton, meds, conds, _normalize_papers(context)
+    )
+
+
 def verify_claims(claims: List[Dict[str, str]], context: Dict) -> List[Dict]:
     """
     Verify a list of extracted claims.
@@ -99,18 +221,68 @@ def verify_claims(claims: List[Dict[str, str]], context: Dict) -> List[Dict]:
     if isinstance(claims, str):
         claims = extract_claims(claims)
 
+    # Build the med/condition automaton and normalized paper text once
+    # for the whole batch instead of per claim.
+    automaton, meds, conds = _build_context_automaton(context)
+    normalized_papers = _normalize_papers(context)
+
+    # Optional semantic evidence: embed every statement in one batch
+    # and score all claims against all papers with a single matmul.
+    scores = None
+    if settings.FACT_CHECK_SEMANTIC:
+        statements = [
+            c["statement"]
+            for c in claims
+            if isinstance(c, dict) and isinstance(c.get("statement"), str) and c["statement"]
+        ]
+        scores = _semantic_scores(statements, normalized_papers[0])
+
+    row = 0
     verified = []
     for c in claims:
-        try:
-            v = verify_claim(c, context)
-            verified.append(v)
-        except Exception:
-            verified.append(
-                {
-                    "type": c.get("type", "general"),
-                    "statement": c.get("statement", ""),
-                    "verified": False,
-                    "sources": [],
-                }
+        # Cheap shape check up front: malformed claims get an explicit
+        # unverified result instead of paying for raise/catch.
+        if not isinstance(c, dict) or not isinstance(c.get("statement"), str) or not c["statement"]:
+            verified.append(_unverified_claim(c))
+            continue
+
+        semantic_row = scores[row] if scores is not None else None
+        row += 1
+        verified.append(
+            _verify_claim_with_auto(
+                c, automaton, meds, conds, normalized_papers, semantic_row
             )
-    return verified
\ No newline at end of file
+        )
+    return verified
+
+
+def _semantic_scores(statements: List[str], entries):
+    """
+    Cosine scores for every (statement, paper) pair in one shot.
+
+    Embeddings are normalized, so a single [N, D] @ [D, P] matmul
+    yields the full similarity matrix — one model call for all
+    statements instead of one per claim.
+    """
+    if not statements or not entries:
+        return None
+
+    from app.processing.embedding import embed_texts
+
+    queries = embed_texts(statements)
+    papers = embed_texts([combined for _, _, combined in entries])
+    if len(queries) != len(statements) or len(papers) != len(entries):
+        return None
+
+    return queries @ papers.T
+
+
+def _unverified_claim(claim) -> Dict:
+    if not isinstance(claim, dict):
+        claim = {}
+    return {
+        "type": claim.get("type", "general"),
+        "statement": claim.get("statement", "") or "",
+        "verified": False,
+        "sources": [],
+    }
\ No newline at end of file
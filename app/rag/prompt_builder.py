@@ -10,28 +10,17 @@ This file contains ZERO business logic.
 Only formatting + safety instructions.
 """
 
+import hashlib
+from collections import OrderedDict
 from typing import Dict, Any, List
 
+import jinja2
+import orjson
 
-# ------------------------------------------------------------------
-# Public API
-# ------------------------------------------------------------------
-
-def build_medical_prompt(
-    question: str,
-    context: Dict[str, Any],
-) -> str:
-    """
-    Build a clinical-grade prompt for medical explanation.
-    Context contains FACTS ONLY.
-    """
-
-    patient    = context.get("patient", {})
-    wearables  = context.get("wearables", {})
-    papers     = context.get("papers", [])
-    drug_facts = context.get("drug_facts", {}) or context.get("drug_interactions", {})
-
-    prompt = f"""
+# The prompt skeleton is compiled to template bytecode once at import;
+# per call only the five variable slots are interpolated, instead of
+# re-assembling the multi-KB static rule text through an f-string.
+_PROMPT_TEMPLATE = jinja2.Environment(autoescape=False).from_string("""
 You are a clinical explanation assistant.
 You are NOT a doctor.
 You do NOT diagnose diseases.
@@ -58,17 +47,17 @@ CRITICAL SAFETY RULES (MUST FOLLOW):
 ========================
 PATIENT FACTS
 ========================
-{_format_patient(patient)}
+{{ patient_block }}
 
 ========================
 WEARABLE OBSERVATIONS (FACTS)
 ========================
-{_format_wearables(wearables)}
+{{ wearables_block }}
 
 ========================
 MEDICATION SAFETY FACTS
 ========================
-{_format_drug_facts(drug_facts)}
+{{ drug_facts_block }}
 
 ========================
 RELEVANT MEDICAL LITERATURE
@@ -76,12 +65,12 @@ RELEVANT MEDICAL LITERATURE
 Rules: Cite ONLY papers listed below. Include journal + year.
 If the section below says "No research papers available", skip ## What the Research Says entirely.
 ========================
-{_format_papers(papers)}
+{{ papers_block }}
 
 ========================
 USER QUESTION
 ========================
-{question}
+{{ question }}
 
 ========================
 RESPONSE FORMAT (MANDATORY — FOLLOW EXACTLY)
@@ -137,18 +126,95 @@ STRICT OUTPUT RULES
 - Never truncate mid-sentence — shorten bullet points if needed but complete every section.
 - Keep total response concise — quality over length.
 ========================
-"""
-   
-    return prompt.strip()
+""")
+
+
+# Rendered-prompt memo: key is a digest of (context, question), value
+# the finished prompt string. OrderedDict gives LRU eviction.
+_PROMPT_CACHE_SIZE = 256
+_prompt_cache: "OrderedDict[bytes, str]" = OrderedDict()
+
+
+def clear_prompt_cache() -> None:
+    """Drop all memoized prompts (tests / manual invalidation)."""
+    _prompt_cache.clear()
+
+
+# ------------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------------
+
+def build_medical_prompt(
+    question: str,
+    context: Dict[str, Any],
+) -> str:
+    """
+    Build a clinical-grade prompt for medical explanation.
+    Context contains FACTS ONLY.
+    """
+
+    # Empty context renders to a fixed skeleton — substitute the
+    # question into the prerendered constant instead of re-running the
+    # formatters and template.
+    if not context:
+        return _EMPTY_CONTEXT_PROMPT.replace(_QUESTION_SLOT, question)
+
+    # The prompt is a pure function of (question, context); repeated
+    # questions over an unchanged profile hit the memo instead of
+    # re-rendering. Contexts aren't hashable, so the key is a blake2b
+    # digest of the sort-keyed JSON form.
+    try:
+        key = hashlib.blake2b(
+            orjson.dumps(context, option=orjson.OPT_SORT_KEYS)
+            + question.encode(),
+            digest_size=16,
+        ).digest()
+    except (TypeError, orjson.JSONEncodeError):
+        key = None
+
+    if key is not None:
+        cached = _prompt_cache.get(key)
+        if cached is not None:
+            _prompt_cache.move_to_end(key)
+            return cached
+
+    patient    = context.get("patient", {})
+    wearables  = context.get("wearables", {})
+    papers     = context.get("papers", [])
+    drug_facts = context.get("drug_facts", {}) or context.get("drug_interactions", {})
+
+    prompt = _PROMPT_TEMPLATE.render(
+        question=question,
+        patient_block=_format_patient(patient),
+        wearables_block=_format_wearables(wearables),
+        drug_facts_block=_format_drug_facts(drug_facts),
+        papers_block=_format_papers(papers),
+    ).strip()
+
+    if key is not None:
+        _prompt_cache[key] = prompt
+        if len(_prompt_cache) > _PROMPT_CACHE_SIZE:
+            _prompt_cache.popitem(last=False)
+
+    return prompt
 
 
 # ------------------------------------------------------------------
 # Formatting helpers
 # ------------------------------------------------------------------
 
+# Fixed empty-case outputs, hoisted so the formatters return a shared
+# constant instead of rebuilding the literal per call.
+_EMPTY_PATIENT = "No patient data available."
+_EMPTY_WEARABLES = "No wearable data available."
+_NO_WEARABLE_METRICS = "No wearable metrics recorded."
+_EMPTY_DRUGS = "No medication safety data available."
+_EMPTY_PAPERS = "No relevant research papers found."
+
+
 def _format_patient(patient: Dict[str, Any]) -> str:
     if not patient:
-        return "No patient data available."
+        return _EMPTY_PATIENT
 
     lines = [f"Patient ID: {patient.get('patient_id', 'Unknown')}"]
 
@@ -204,10 +270,15 @@ def _format_patient(patient: Dict[str, Any]) -> str:
 
 def _format_wearables(wearables: Dict[str, Any]) -> str:
     if not wearables or not wearables.get("available"):
-        return "No wearable data available."
+        return _EMPTY_WEARABLES
+
+    # Available-but-empty short-circuits before the loop/join below.
+    metrics = wearables.get("metrics")
+    if not metrics:
+        return _NO_WEARABLE_METRICS
 
     lines = []
-    for m in wearables.get("metrics", []):
+    for m in metrics:
 
         # Sanitize trend — never expose raw internal system labels
         trend = m.get("trend", "")
@@ -236,52 +307,56 @@ def _format_wearables(wearables: Dict[str, Any]) -> str:
                 value = r.get("value", "unknown value")
                 lines.append(f"      [{date}] → {value}")
 
-    return "\n".join(lines) if lines else "No wearable metrics recorded."
+    return "\n".join(lines) if lines else _NO_WEARABLE_METRICS
 
 
 def _format_drug_facts(drug_facts: Dict[str, Any]) -> str:
     if not drug_facts:
-        return "No medication safety data available."
-
-    lines = []
-
-    # Drug-Drug interactions
-    for f in drug_facts.get("drug_drug_interactions", []):
-        drugs = ", ".join(f.get("drugs_involved", []))
-        lines.append(
-            f"  - Drug–Drug ({f.get('severity', 'unknown')}): "
-            f"{drugs} → {f.get('interaction', 'N/A')}"
-        )
-
-    # Drug-Condition interactions
-    for f in drug_facts.get("drug_condition_interactions", []):
-        lines.append(
-            f"  - Drug–Condition ({f.get('severity', 'unknown')}): "
-            f"{f.get('drug')} contraindicated in {f.get('condition')}"
-        )
-
-    # Drug effect facts
-    for f in drug_facts.get("drug_effect_facts", []):
-        lines.append(
-            f"  - Drug Effect: {f.get('drug')} → {f.get('effect')} "
-            f"(Mechanism: {f.get('mechanism', 'N/A')})"
-        )
+        return _EMPTY_DRUGS
+
+    # One comprehension per category keeps each loop in fused
+    # LIST_APPEND bytecode; a single join assembles the block.
+    lines = [
+        f"  - Drug–Drug ({f.get('severity', 'unknown')}): "
+        f"{', '.join(f.get('drugs_involved', []))} → {f.get('interaction', 'N/A')}"
+        for f in drug_facts.get("drug_drug_interactions", [])
+    ]
+    lines += [
+        f"  - Drug–Condition ({f.get('severity', 'unknown')}): "
+        f"{f.get('drug')} contraindicated in {f.get('condition')}"
+        for f in drug_facts.get("drug_condition_interactions", [])
+    ]
+    lines += [
+        f"  - Drug Effect: {f.get('drug')} → {f.get('effect')} "
+        f"(Mechanism: {f.get('mechanism', 'N/A')})"
+        for f in drug_facts.get("drug_effect_facts", [])
+    ]
 
     return "\n".join(lines) if lines else "No known medication risks identified."
 
 
 def _format_papers(papers: List[Dict[str, Any]]) -> str:
     if not papers:
-        return "No relevant research papers found."
-
-    lines = []
-    for i, p in enumerate(papers[:3], start=1):
-        lines.append(
-            f"[{i}] {p.get('title', 'Untitled')} "
-            f"({p.get('journal', 'Unknown Journal')}, {p.get('year', 'N/A')})"
-        )
-        preview = p.get("text_preview", "")[:300]
-        if preview:
-            lines.append(f"     Summary: {preview}")
-
-    return "\n".join(lines)
\ No newline at end of file
+        return _EMPTY_PAPERS
+
+    # One fully-formed entry string per paper; the optional summary line
+    # rides along in the same f-string instead of a second append.
+    return "\n".join(
+        f"[{i}] {p.get('title', 'Untitled')} "
+        f"({p.get('journal', 'Unknown Journal')}, {p.get('year', 'N/A')})"
+        + (f"\n     Summary: {preview}" if (preview := p.get("text_preview", "")[:300]) else "")
+        for i, p in enumerate(papers[:3], start=1)
+    )
+
+
+# Prerendered empty-context prompt: everything but the question is
+# static, so the template runs once at import and build_medical_prompt
+# answers `{}` contexts with a single str.replace.
+_QUESTION_SLOT = "\x00QUESTION\x00"
+_EMPTY_CONTEXT_PROMPT = _PROMPT_TEMPLATE.render(
+    question=_QUESTION_SLOT,
+    patient_block=_EMPTY_PATIENT,
+    wearables_block=_EMPTY_WEARABLES,
+    drug_facts_block=_EMPTY_DRUGS,
+    papers_block=_EMPTY_PAPERS,
+).strip()
\ No newline at end of file
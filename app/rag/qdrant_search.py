@@ -1,9 +1,69 @@
+import orjson
 import requests
-from typing import Dict, List, Any
+from requests.adapters import HTTPAdapter, Retry
+import numpy as np
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
 
 from app.processing.embedding import embed_texts
+from app.processing.entity_extractor import _ASCII_FOLD
 from app.vector_store.qdrant_store import COLLECTION
 
+# Pooled keep-alive session — a bare requests.post opens a fresh TCP
+# connection to Qdrant on every query.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "http://",
+    HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=50,
+        max_retries=Retry(total=3, backoff_factor=0.2),
+    ),
+)
+
+
+@lru_cache(maxsize=256)
+def _context_filter(
+    drugs: tuple,
+    conditions: tuple,
+) -> Optional[Dict[str, Any]]:
+    """
+    Build (and cache) the payload filter for a user's entity context.
+
+    Users re-ask with the same conditions/drugs, so the filter dict is
+    memoized on the frozen entity tuples. Uses one MatchAny clause per
+    indexed key instead of fanned-out should branches. Values are
+    case-folded with the same table ingest applies in
+    _collect_entities — MatchAny on a keyword index is case-sensitive,
+    and profiles store display casing ("Metformin").
+    """
+    should = []
+    if drugs:
+        should.append({
+            "key": "entities.drugs",
+            "match": {"any": [d.translate(_ASCII_FOLD) for d in drugs]},
+        })
+    if conditions:
+        should.append({
+            "key": "entities.conditions",
+            "match": {"any": [c.translate(_ASCII_FOLD) for c in conditions]},
+        })
+
+    return {"should": should} if should else None
+
+
+def _parse_response(response) -> Dict[str, Any]:
+    """
+    Decode a Qdrant response body with orjson — several times faster
+    than requests' stdlib-json .json() on payload-heavy results.
+    Falls back to .json() when the body isn't raw bytes (stubbed
+    responses in tests).
+    """
+    content = response.content
+    if isinstance(content, (bytes, bytearray, str)):
+        return orjson.loads(content)
+    return response.json()
+
 
 def qdrant_hybrid_search(
     question: str,
@@ -18,27 +78,62 @@ def qdrant_hybrid_search(
     for k in expanded_entities:
         terms.extend(expanded_entities[k])
 
-    query_text = question + "\nContext: " + ", ".join(set(terms))
-    query_vector = embed_texts([query_text])[0]
+    # dict.fromkeys dedups while keeping insertion order, so the same
+    # context always embeds the same string (set iteration order would
+    # defeat the embedding cache); one join builds the query text.
+    query_text = "".join((question, "\nContext: ", ", ".join(dict.fromkeys(terms))))
+    # embed_texts returns float32 numpy rows — convert only at the JSON
+    # wire boundary, which requests cannot serialize directly.
+    query_vector = np.asarray(embed_texts([query_text])[0]).tolist()
+
+    # Project the payload to the fields we return; the pre-truncated
+    # text_preview keeps 10KB text blobs off the wire entirely.
+    body = {
+        "vector": query_vector,
+        "limit": top_k,
+        "with_payload": {"include": ["pmid", "title", "text_preview", "entities"]},
+    }
+
+    entity_filter = _context_filter(
+        tuple(sorted(set(user_context.get("drugs", [])))),
+        tuple(sorted(set(user_context.get("conditions", [])))),
+    )
+    if entity_filter is not None:
+        body["filter"] = entity_filter
+
+    results = _run_search(body)
+
+    # `should` is a hard constraint in Qdrant — at least one clause must
+    # match — so a profile whose terms are absent from the corpus (or
+    # legacy points stored without an entities block) would get zero
+    # hits where an unfiltered search returns top_k. Retry without the
+    # filter rather than fall off that recall cliff.
+    if not results and "filter" in body:
+        retry_body = {k: v for k, v in body.items() if k != "filter"}
+        results = _run_search(retry_body)
+
+    return results
+
 
-    resp = requests.post(
+def _run_search(body: Dict[str, Any]) -> List[Dict[str, Any]]:
+    resp = _SESSION.post(
         f"http://localhost:6333/collections/{COLLECTION}/points/search",
-        json={"vector": query_vector, "limit": top_k, "with_payload": True},
+        json=body,
         timeout=10,
     )
     resp.raise_for_status()
 
-    results = []
-    for hit in resp.json().get("result", []):
-        payload = hit["payload"]
-        results.append(
-            {
-                "score": hit["score"],
-                "pmid": payload.get("pmid"),
-                "title": payload.get("title"),
-                "text_preview": payload.get("text", "")[:500],
-                "entities": payload.get("entities"),
-            }
-        )
-
-    return results
\ No newline at end of file
+    # Comprehension keeps the mapping loop in fused LIST_APPEND
+    # bytecode; the walrus binds each payload once per row. Falls back
+    # to slicing full text for points ingested before text_preview
+    # existed.
+    return [
+        {
+            "score": hit["score"],
+            "pmid": (payload := hit["payload"]).get("pmid"),
+            "title": payload.get("title"),
+            "text_preview": payload.get("text_preview") or (payload.get("text") or "")[:500],
+            "entities": payload.get("entities"),
+        }
+        for hit in _parse_response(resp).get("result", [])
+    ]
\ No newline at end of file
@@ -1,4 +1,14 @@
-from flask import Blueprint, render_template, request, jsonify
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import (
+    Blueprint,
+    render_template,
+    request,
+    jsonify,
+    Response,
+    stream_with_context,
+)
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from app.models import db, User
 from app.utils.logger import get_logger
@@ -9,15 +19,26 @@ from app.knowledge_graph.autopilot import analyze_health_intent, apply_graph_upd
 from app.knowledge_graph.wearables_graph import get_wearable_summary
 from app.knowledge_graph.drug_interactions import check_drug_interactions
 from app.vector_store.paper_search import search_papers
+from app.processing.embedding import embed_texts
+from app.cache.answer_cache import answer_cache, context_key
 from app.rag.prompt_builder import build_medical_prompt
 from app.rag.claim_extractor import extract_claims
-from app.llm.ollama_client import call_ollama
+from app.llm.ollama_client import call_ollama, call_ollama_stream
+
+import numpy as np
 
 logger = get_logger(__name__)
 
 # Create a Blueprint object to hold the routes
 api_bp = Blueprint("api", __name__)
 
+# Shared pool for the independent lookups inside the ask routes,
+# mirroring the pipeline's _PIPELINE_POOL: intent analysis is a full
+# Ollama round-trip and the wearables summary is its own Neo4j query,
+# so both overlap the profile fetch and retrieval instead of running
+# strictly before them.
+_ROUTE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ask-route")
+
 @api_bp.route("/")
 def index():
     return render_template("index.html")
@@ -66,6 +87,26 @@ def login():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+def _build_suggestions(facts):
+    """Turn detected health-intent facts into confirm-update prompts."""
+    return [
+        {
+            "message": (
+                f"I noticed you mentioned '{fact['original_term']}'. "
+                f"Add '{fact['normalized_term']}' to your profile?"
+            ),
+            "data": {
+                "category": fact["category"],
+                "entity":   fact["normalized_term"],
+            },
+        }
+        for fact in facts or []
+    ]
+
+def _sse(event, data):
+    """Format one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @api_bp.route("/api/ask", methods=["POST"])
 @jwt_required()
 def ask_question():
@@ -79,45 +120,57 @@ def ask_question():
 
         logger.info(f"Processing question for user: {user_id}")
 
-        facts               = analyze_health_intent(question)
-        suggestions_payload = []
-        if facts:
-            for fact in facts:
-                suggestions_payload.append({
-                    "message": (
-                        f"I noticed you mentioned '{fact['original_term']}'. "
-                        f"Add '{fact['normalized_term']}' to your profile?"
-                    ),
-                    "data": {
-                        "category": fact["category"],
-                        "entity":   fact["normalized_term"],
-                    },
-                })
+        # Dispatched first, joined last: the intent LLM call runs for
+        # the entire retrieval/generation phase instead of before it.
+        intent_future    = _ROUTE_POOL.submit(analyze_health_intent, question)
+        wearables_future = _ROUTE_POOL.submit(get_wearable_summary, user_id)
 
         patient_profile = get_patient_profile(user_id)
         if not patient_profile:
             create_patient(user_id=user_id)
             patient_profile = get_patient_profile(user_id)
 
-        wearables_summary = get_wearable_summary(user_id)
+        wearables_summary = wearables_future.result()
         wearable_metrics  = wearables_summary.get("metrics", [])
         wearables_count   = len(wearable_metrics)
 
-        papers = search_papers(query=question, top_k=3)
+        # Semantic answer cache: near-duplicate questions from the same
+        # entity context skip retrieval, safety checks, and the LLM.
+        question_vector = np.asarray(embed_texts([question])[0], dtype=np.float32)
+        cache_key       = context_key(patient_profile)
+        cached          = answer_cache.get(question_vector, cache_key)
 
-        medications       = patient_profile.get("medications", []) if patient_profile else []
-        drug_interactions = check_drug_interactions(medications=medications)
+        if cached is not None:
+            logger.info(f"Answer served from semantic cache for user: {user_id}")
+            papers            = cached["papers"]
+            drug_interactions = cached["drug_interactions"]
+            response          = cached["answer"]
+            claims            = cached["claims"]
+        else:
+            papers = search_papers(query=question, top_k=3)
 
-        context = {
-            "patient":    patient_profile,
-            "wearables":  wearables_summary,
-            "papers":     papers,
-            "drug_facts": drug_interactions,
-        }
+            medications       = patient_profile.get("medications", []) if patient_profile else []
+            drug_interactions = check_drug_interactions(medications=medications)
+
+            context = {
+                "patient":    patient_profile,
+                "wearables":  wearables_summary,
+                "papers":     papers,
+                "drug_facts": drug_interactions,
+            }
 
-        prompt   = build_medical_prompt(question=question, context=context)
-        response = call_ollama(prompt)
-        claims   = extract_claims(response)
+            prompt   = build_medical_prompt(question=question, context=context)
+            response = call_ollama(prompt)
+            claims   = extract_claims(response)
+
+            answer_cache.put(question_vector, cache_key, {
+                "answer":            response,
+                "claims":            claims,
+                "papers":            papers,
+                "drug_interactions": drug_interactions,
+            })
+
+        suggestions_payload = _build_suggestions(intent_future.result())
 
         conditions_count = len(patient_profile.get("conditions",  [])) if patient_profile else 0
         meds_count       = len(patient_profile.get("medications", [])) if patient_profile else 0
@@ -149,6 +202,89 @@ def ask_question():
         logger.exception("Error processing question")
         return jsonify({"success": False, "error": str(e)}), 500
 
+@api_bp.route("/api/ask/stream", methods=["POST"])
+@jwt_required()
+def ask_question_stream():
+    """
+    Streaming variant of /api/ask (Server-Sent Events).
+
+    Everything that is ready before generation — suggestions and the
+    context summary — is emitted first, then answer tokens are forwarded
+    as Ollama produces them, so the browser shows useful output after
+    retrieval time instead of waiting out the whole generation.
+    """
+    try:
+        user_id  = get_jwt_identity()
+        data     = request.json
+        question = data.get("question", "")
+
+        if not question:
+            return jsonify({"success": False, "error": "question is required"}), 400
+
+        logger.info(f"Processing streamed question for user: {user_id}")
+
+        # Same fan-out as /api/ask: intent analysis (an Ollama round
+        # trip) and the wearables query overlap retrieval; both are
+        # joined while assembling the header frame.
+        intent_future    = _ROUTE_POOL.submit(analyze_health_intent, question)
+        wearables_future = _ROUTE_POOL.submit(get_wearable_summary, user_id)
+
+        patient_profile = get_patient_profile(user_id)
+        if not patient_profile:
+            create_patient(user_id=user_id)
+            patient_profile = get_patient_profile(user_id)
+
+        wearables_summary = wearables_future.result()
+        wearable_metrics  = wearables_summary.get("metrics", [])
+
+        papers            = search_papers(query=question, top_k=3)
+        medications       = patient_profile.get("medications", []) if patient_profile else []
+        drug_interactions = check_drug_interactions(medications=medications)
+
+        context = {
+            "patient":    patient_profile,
+            "wearables":  wearables_summary,
+            "papers":     papers,
+            "drug_facts": drug_interactions,
+        }
+        prompt = build_medical_prompt(question=question, context=context)
+
+        drug_warnings = (drug_interactions or {}).get("drug_drug_interactions", [])
+
+        header = {
+            "success":     True,
+            "suggestions": _build_suggestions(intent_future.result()),
+            "context": {
+                "patient_id":          user_id,
+                "conditions_count":    len(patient_profile.get("conditions",  [])) if patient_profile else 0,
+                "meds_count":          len(patient_profile.get("medications", [])) if patient_profile else 0,
+                "labs_count":          len(patient_profile.get("lab_results", [])) if patient_profile else 0,
+                "wearables_available": len(wearable_metrics) > 0,
+                "wearables_count":     len(wearable_metrics),
+                "papers_found":        len(papers),
+                "drug_warnings_count": len(drug_warnings),
+                "has_drug_warnings":   len(drug_warnings) > 0,
+            },
+        }
+
+        def generate():
+            yield _sse("context", header)
+
+            pieces = []
+            for chunk in call_ollama_stream(prompt):
+                pieces.append(chunk)
+                yield _sse("token", {"text": chunk})
+
+            claims = extract_claims("".join(pieces))
+            yield _sse("claims", {"claims": claims})
+            yield _sse("done", {})
+
+        return Response(stream_with_context(generate()), mimetype="text/event-stream")
+
+    except Exception as e:
+        logger.exception("Error processing streamed question")
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @api_bp.route("/api/confirm_update", methods=["POST"])
 @jwt_required()
 def confirm_update():
@@ -1,17 +1,130 @@
+import uuid
+from dataclasses import dataclass, fields
+from hashlib import blake2b
+from time import time
 from typing import Any, Dict, List, Optional
 from datetime import datetime, UTC
 
+import orjson
+
 SCHEMA_VERSION = "1.0"
 
+# retrieved_at has second resolution, so during bulk ingest the same
+# string is reused until the clock ticks — one isoformat() per second
+# instead of one per chunk.
+_ts_second = -1
+_ts_string = ""
+
+
+def _retrieved_at() -> str:
+    global _ts_second, _ts_string
+
+    second = int(time())
+    if second != _ts_second:
+        _ts_string = datetime.fromtimestamp(second, tz=UTC).isoformat()
+        _ts_second = second
+    return _ts_string
+
+
+# Canonical entity bucket names, shared by entities and kg_node_ids.
+_ENTITY_KEYS = ("drugs", "conditions", "biomarkers", "symptoms")
+
 
 def _empty_entity_block() -> Dict[str, List[str]]:
-    """Standard empty entity structure."""
-    return {
-        "drugs": [],
-        "conditions": [],
-        "biomarkers": [],
-        "symptoms": [],
-    }
+    """Standard empty entity structure (fresh lists per call)."""
+    return {k: [] for k in _ENTITY_KEYS}
+
+
+@dataclass(slots=True)
+class PubmedPayload:
+    """
+    Standardized chunk payload for Qdrant storage.
+
+    Slotted dataclass instead of a per-chunk dict: large ingests build
+    millions of these, and slots avoid the per-instance dict overhead.
+    Convert to a plain dict only at the wire boundary via `to_dict()`.
+    """
+
+    # ---- schema metadata ----
+    schema_version: str
+    source: str
+    retrieved_at: str
+
+    # ---- document metadata ----
+    pmid: str
+    title: str
+    journal: str
+    year: int
+    authors: List[str]
+    section: str
+    chunk_index: int
+    api_query: str
+
+    # ---- content ----
+    text: str
+    text_preview: str
+
+    # ---- NLP / KG ----
+    entities: Dict[str, List[str]]
+    relations: List[Any]
+    kg_node_ids: Dict[str, List[str]]
+
+    # ---- future ML fields ----
+    study_type: Optional[str]
+    confidence_level: Optional[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Shallow dict for the Qdrant upsert boundary.
+
+        Empty placeholders (no relations, no entities, unknown study
+        type) are omitted — stored on every chunk they cost bytes on
+        disk, in RAM, and on the wire. Readers default on access.
+        """
+        payload = {name: getattr(self, name) for name in _PAYLOAD_FIELDS}
+
+        if not payload["relations"]:
+            del payload["relations"]
+        for key in ("entities", "kg_node_ids"):
+            if not any(payload[key].values()):
+                del payload[key]
+        for key in ("study_type", "confidence_level"):
+            if payload[key] is None:
+                del payload[key]
+
+        return payload
+
+
+    def to_bytes(self) -> bytes:
+        """
+        JSON-encode the payload with orjson in one step.
+
+        For callers persisting raw JSON (exports, Postgres jsonb), this
+        skips the dict -> json.dumps round through the stdlib encoder;
+        OPT_SERIALIZE_NUMPY lets numpy scalars pass through untouched.
+        """
+        return orjson.dumps(self.to_dict(), option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+# Cached once — building the dict from a precomputed field tuple is
+# faster than dataclasses.asdict (which deep-copies every value).
+_PAYLOAD_FIELDS = tuple(f.name for f in fields(PubmedPayload))
+
+
+def content_point_id(pmid: str, chunk_index: int, text: str) -> str:
+    """
+    Deterministic Qdrant point ID for a chunk.
+
+    Hashing (pmid, chunk_index, text) means re-ingesting the same paper
+    overwrites its existing points instead of inserting duplicates —
+    upserts become idempotent and repeat runs skip the HNSW insertions
+    that dominate ingest time. Qdrant only accepts UUIDs or unsigned
+    ints as IDs, so the 16-byte digest is presented as a UUID.
+    """
+    digest = blake2b(
+        f"{pmid}|{chunk_index}|{text}".encode(), digest_size=16
+    ).digest()
+    return str(uuid.UUID(bytes=digest))
 
 
 def build_payload(
@@ -27,40 +140,38 @@ def build_payload(
     api_query: str,
     entities: Optional[Dict[str, List[str]]] = None,
     kg_node_ids: Optional[Dict[str, List[str]]] = None,
-) -> Dict[str, Any]:
+) -> PubmedPayload:
     """
     Build a standardized payload for Qdrant storage.
 
     This schema is versioned and safe for long-term storage.
+
+    Types are normalized at the fetcher boundary (pubmed_fetcher), not
+    re-coerced per chunk here; the asserts vanish under `python -O`.
     """
+    assert isinstance(pmid, str), f"pmid must be str, got {type(pmid).__name__}"
+    assert isinstance(year, int), f"year must be int, got {type(year).__name__}"
+    assert isinstance(chunk_index, int), (
+        f"chunk_index must be int, got {type(chunk_index).__name__}"
+    )
 
-    payload = {
-        # ---- schema metadata ----
-        "schema_version": SCHEMA_VERSION,
-        "source": "pubmed_api",
-        "retrieved_at": datetime.now(UTC).isoformat(),
-
-        # ---- document metadata ----
-        "pmid": str(pmid),
-        "title": title,
-        "journal": journal,
-        "year": int(year),
-        "authors": authors,
-        "section": section,
-        "chunk_index": int(chunk_index),
-        "api_query": api_query,
-
-        # ---- content ----
-        "text": text,
-
-        # ---- NLP / KG ----
-        "entities": entities if entities is not None else _empty_entity_block(),
-        "relations": [],
-        "kg_node_ids": kg_node_ids if kg_node_ids is not None else _empty_entity_block(),
-
-        # ---- future ML fields ----
-        "study_type": None,
-        "confidence_level": None,
-    }
-
-    return payload
+    return PubmedPayload(
+        schema_version=SCHEMA_VERSION,
+        source="pubmed_api",
+        retrieved_at=_retrieved_at(),
+        pmid=pmid,
+        title=title,
+        journal=journal,
+        year=year,
+        authors=authors,
+        section=section,
+        chunk_index=chunk_index,
+        api_query=api_query,
+        text=text,
+        text_preview=text[:500],
+        entities=entities if entities is not None else _empty_entity_block(),
+        relations=[],
+        kg_node_ids=kg_node_ids if kg_node_ids is not None else _empty_entity_block(),
+        study_type=None,
+        confidence_level=None,
+    )
@@ -6,53 +6,372 @@ Purpose:
 - Return LLM-ready paper context
 """
 
-from typing import List, Dict, Any
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Iterator, List, Dict, Any, Optional
 
+import numpy as np
+
+from app.config import settings
 from app.vector_store.qdrant_store import get_client, COLLECTION
 from app.processing.embedding import embed_texts
 from app.utils.logger import get_logger
-from qdrant_client.models import SearchRequest
+from qdrant_client.models import (
+    SearchRequest,
+    PayloadSelectorInclude,
+    QueryRequest,
+    SearchParams,
+    QuantizationSearchParams,
+)
 
 logger = get_logger(__name__)
 
+# Read-side default for chunks stored without an entities block. A
+# fresh dict with fresh lists per hit — cached paper dicts are shared
+# by reference, so a single template here would let one caller's
+# append corrupt every cached and future result.
+_ENTITY_KEYS = ("drugs", "conditions", "biomarkers", "symptoms")
 
-def search_papers(
+
+def _empty_entity_block() -> Dict[str, List[str]]:
+    return {k: [] for k in _ENTITY_KEYS}
+
+
+# Fields actually needed by callers — projecting on the Qdrant side keeps
+# the full `text` field (often tens of KB per chunk) off the wire.
+_RESULT_FIELDS = [
+    "pmid",
+    "title",
+    "journal",
+    "year",
+    "section",
+    "text_preview",
+    "entities",
+]
+
+# Static parts of every query_points call, bound once at import so the
+# selector objects are not rebuilt per query. `query`, `limit` and
+# `search_params` vary per call.
+_BASE_QUERY_KWARGS = dict(
+    collection_name=COLLECTION,
+    with_payload=PayloadSelectorInclude(include=_RESULT_FIELDS),
+    with_vectors=False,
+)
+
+
+@lru_cache(maxsize=16)
+def _search_params(top_k: int) -> SearchParams:
+    """
+    HNSW search params sized to the requested result count.
+
+    hnsw_ef bounds how much of the graph each query explores; scaling
+    it with top_k keeps recall flat when callers ask for deeper result
+    lists, while small queries stay at the configured floor. Cached —
+    callers use a handful of distinct top_k values.
+    """
+    return SearchParams(
+        hnsw_ef=max(settings.QDRANT_HNSW_EF, 4 * top_k),
+        exact=False,
+        # Search the int8-quantized vectors, then rescore the
+        # oversampled candidates with full-precision vectors.
+        quantization=QuantizationSearchParams(
+            ignore=False,
+            rescore=True,
+            oversampling=2.0,
+        ),
+    )
+
+
+class _SemanticQueryCache:
+    """
+    In-process cache of recent query embeddings and their paper lists.
+
+    Many user questions are semantic near-duplicates, so a cosine
+    threshold lookup over cached query vectors lets repeats skip the
+    Qdrant round-trip entirely. Bounded ring buffer, thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 1024, threshold: float = 0.95):
+        self._max_entries = max_entries
+        self._threshold = threshold
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None  # normalized query vectors
+        self._entries: List[tuple] = []            # (vec_bytes, top_k, papers)
+        self._exact: Dict[bytes, int] = {}         # first-level exact-match tier
+        self._next_slot = 0
+
+    def get(self, vector: np.ndarray, top_k: int) -> Optional[List[Dict[str, Any]]]:
+        vec_bytes = vector.tobytes()
+
+        with self._lock:
+            # Tier 1: exact byte match
+            slot = self._exact.get(vec_bytes)
+            if slot is not None and self._entries[slot][1] == top_k:
+                return list(self._entries[slot][2])
+
+            # Tier 2: cosine similarity over cached vectors
+            if self._entries:
+                count = len(self._entries)
+                sims = self._matrix[:count] @ _normalize(vector)
+                best = int(np.argmax(sims))
+                if sims[best] >= self._threshold and self._entries[best][1] == top_k:
+                    return list(self._entries[best][2])
+
+        return None
+
+    def put(self, vector: np.ndarray, top_k: int, papers: List[Dict[str, Any]]) -> None:
+        vec_bytes = vector.tobytes()
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty(
+                    (self._max_entries, vector.shape[0]), dtype=np.float32
+                )
+
+            slot = self._next_slot
+            if len(self._entries) < self._max_entries:
+                self._entries.append((vec_bytes, top_k, list(papers)))
+            else:
+                # Ring buffer: overwrite the oldest entry
+                self._exact.pop(self._entries[slot][0], None)
+                self._entries[slot] = (vec_bytes, top_k, list(papers))
+
+            self._matrix[slot] = _normalize(vector)
+            self._exact[vec_bytes] = slot
+            self._next_slot = (slot + 1) % self._max_entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self._entries = []
+            self._exact = {}
+            self._next_slot = 0
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+_query_cache = _SemanticQueryCache()
+
+
+class _TextQueryCache:
+    """
+    First-tier LRU+TTL cache keyed on the normalized query text.
+
+    An exact textual repeat (refresh/retry) returns its result list
+    before the query is even embedded; the semantic cache below still
+    catches paraphrases. Entries expire so re-ingested papers surface
+    within TTL even without an explicit invalidation.
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 300.0):
+        self._max_size = max_size
+        self._ttl = ttl_seconds
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(query: str, top_k: int) -> bytes:
+        return hashlib.blake2b(
+            f"{top_k}|{query.strip().lower()}".encode(), digest_size=16
+        ).digest()
+
+    def get(self, key: bytes) -> Optional[List[Dict[str, Any]]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry[1]:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return list(entry[0])
+                del self._entries[key]
+            self._misses += 1
+        return None
+
+    def put(self, key: bytes, papers: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (list(papers), time.monotonic() + self._ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "size": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+_text_cache = _TextQueryCache()
+
+
+def search_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for the text-keyed search cache."""
+    return _text_cache.stats()
+
+
+def clear_search_cache() -> None:
+    """Drop all cached search results (ingest / tests / invalidation)."""
+    _query_cache.clear()
+    _text_cache.clear()
+
+
+def _embed_query(text: str) -> np.ndarray:
+    """
+    Embed one query, optionally through the micro-batching queue so
+    concurrent requests share a single model forward pass.
+    """
+    if settings.EMBEDDING_MICROBATCH:
+        # Imported lazily: the embedder starts a worker thread on first
+        # use, which plain single-threaded deployments never need.
+        from app.processing.batched_embedder import get_shared_embedder
+
+        return get_shared_embedder().embed(text)
+    return embed_texts([text])[0]
+
+
+def _hit_to_paper(hit) -> Dict[str, Any]:
+    payload = hit.payload or {}
+
+    return {
+        "score": hit.score,
+        "pmid": payload.get("pmid"),
+        "title": payload.get("title"),
+        "journal": payload.get("journal"),
+        "year": payload.get("year"),
+        "section": payload.get("section"),
+        # Prefer the ingest-time preview; fall back to slicing the
+        # full text for points ingested before text_preview existed.
+        "text_preview": payload.get("text_preview") or (payload.get("text") or "")[:500],
+        "entities": payload.get("entities") or _empty_entity_block(),
+    }
+
+
+def search_papers_iter(
     query: str,
     top_k: int = 5,
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
-    Search medical research papers stored in Qdrant.
+    Search medical research papers stored in Qdrant, yielding one result
+    dict per hit. Lets consumers that only need the first few results
+    (itertools.islice) skip building the rest.
+
+    Results are inserted into the semantic cache only when the iterator
+    is fully consumed.
     """
 
-    client = get_client()
+    # Blank or degenerate queries can't match anything meaningful —
+    # bail before spending a tokenizer+forward pass on them.
+    if len((query or "").strip()) < 3:
+        logger.info("Paper search skipped: blank or too-short query")
+        return
+
     logger.info("Searching papers", extra={"query": query})
 
-    query_vector = embed_texts([query])[0]
+    # Tier 0: exact textual repeat — answered before embedding.
+    text_key = _TextQueryCache.key(query, top_k)
+    cached = _text_cache.get(text_key)
+    if cached is not None:
+        logger.info("Paper search served from text cache", extra={"results": len(cached)})
+        yield from cached
+        return
+
+    vector = np.asarray(_embed_query(query), dtype=np.float32)
+
+    cached = _query_cache.get(vector, top_k)
+    if cached is not None:
+        logger.info("Paper search served from cache", extra={"results": len(cached)})
+        _text_cache.put(text_key, cached)
+        yield from cached
+        return
+
+    client = get_client()
 
     response = client.query_points(
-        collection_name=COLLECTION,
-        query=query_vector,
+        **_BASE_QUERY_KWARGS,
+        query=vector,
         limit=top_k,
-        with_payload=True,
+        search_params=_search_params(top_k),
     )
 
     papers = []
 
     for hit in response.points:
-        payload = hit.payload or {}
-
-        papers.append(
-            {
-                "score": hit.score,
-                "pmid": payload.get("pmid"),
-                "title": payload.get("title"),
-                "journal": payload.get("journal"),
-                "year": payload.get("year"),
-                "section": payload.get("section"),
-                "text_preview": (payload.get("text") or "")[:500],
-                "entities": payload.get("entities"),
-            }
-        )
+        paper = _hit_to_paper(hit)
+        papers.append(paper)
+        yield paper
+
+    _query_cache.put(vector, top_k, papers)
+    _text_cache.put(text_key, papers)
 
     logger.info("Paper search completed", extra={"results": len(papers)})
-    return papers
+
+
+def search_papers(
+    query: str,
+    top_k: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Search medical research papers stored in Qdrant.
+    List wrapper over search_papers_iter for existing callers.
+    """
+    return list(search_papers_iter(query, top_k=top_k))
+
+
+def search_papers_batch(
+    queries: List[str],
+    top_k: int = 5,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Search several queries in one Qdrant round-trip.
+
+    All queries are embedded in a single encode pass and sent as one
+    query_batch_points RPC, so the gRPC frame, filter parsing and warm
+    HNSW caches are shared across them. Returns one paper list per
+    query, in input order.
+    """
+    if not queries:
+        return []
+
+    logger.info("Batch searching papers", extra={"queries": len(queries)})
+
+    vectors = np.asarray(embed_texts(queries), dtype=np.float32)
+
+    client = get_client()
+    responses = client.query_batch_points(
+        collection_name=COLLECTION,
+        requests=[
+            QueryRequest(
+                query=vector.tolist(),
+                limit=top_k,
+                with_payload=PayloadSelectorInclude(include=_RESULT_FIELDS),
+                with_vector=False,
+                params=_search_params(top_k),
+            )
+            for vector in vectors
+        ],
+    )
+
+    results = []
+    for vector, response in zip(vectors, responses):
+        papers = [_hit_to_paper(hit) for hit in response.points]
+        _query_cache.put(vector, top_k, papers)
+        results.append(papers)
+
+    logger.info(
+        "Batch paper search completed",
+        extra={"results": [len(p) for p in results]},
+    )
+    return results
@@ -9,26 +9,172 @@ if str(PROJECT_ROOT) not in sys.path:
 # tests/conftest.py
 import pytest
 import importlib.util
-import sys
-from pathlib import Path
+from types import MappingProxyType
 
 # Absolute path to app.py
-APP_PATH = Path(__file__).resolve().parent.parent / "app.py"
+APP_PATH = PROJECT_ROOT / "app.py"
+
+_LOADED = None
+
+
+def _load_flask_entrypoint():
+    """
+    Load app.py as a real module exactly once per session.
+
+    The importlib exec of app.py (Flask init, blueprint registration) is
+    the expensive part — guard it so re-entry is a no-op.
+    """
+    global _LOADED
+
+    if _LOADED is None:
+        if "flask_entrypoint" in sys.modules:
+            _LOADED = sys.modules["flask_entrypoint"]
+        else:
+            spec = importlib.util.spec_from_file_location("flask_entrypoint", APP_PATH)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules["flask_entrypoint"] = module
+            spec.loader.exec_module(module)
+            _LOADED = module
+
+    return _LOADED
+
+
+@pytest.fixture(scope="session")
+def flask_entrypoint():
+    return _load_flask_entrypoint()
+
+
+@pytest.fixture(scope="session")
+def base_medical_context():
+    """
+    Canonical context dict for build_medical_prompt tests.
+
+    Session-scoped: the nested literal is built once instead of per
+    test, and the MappingProxyType wrapper turns accidental mutation
+    into an immediate TypeError. Tests that mutate copy first.
+    """
+    return MappingProxyType({
+        "patient": {
+            "patient_id": "user_1",
+            "demographics": {"age": 52, "gender": "Male", "blood_type": "O+"},
+            "conditions": [{"name": "Type 2 Diabetes", "severity": "moderate", "status": "active"}],
+            "medications": [{"name": "Metformin", "dosage": "1000mg", "frequency": "twice daily", "purpose": "Blood sugar control"}],
+            "lab_results": [{"name": "HbA1c", "result": 7.2, "unit": "%", "normal_range": "< 5.7%", "status": "slightly elevated", "date": "2025-01-10"}],
+        },
+        "wearables": {"available": False, "metrics": []},
+        "papers": [],
+        "drug_interactions": {},
+    })
+
+
+@pytest.fixture(scope="session")
+def patient_profile_fixture():
+    """
+    Canonical get_patient_profile() return value for pipeline tests.
+
+    The pipeline pops "wearables" out of the profile it is given, so
+    tests hand it a deepcopy; the proxy makes sharing the original
+    impossible to get wrong.
+    """
+    return MappingProxyType({
+        "patient_id": "user_1",
+        "name": "John Doe",
+        "age": 52,
+        "gender": "Male",
+        "demographics": {"age": 52, "gender": "Male", "blood_type": "O+"},
+        "conditions": [{"name": "Type 2 Diabetes", "severity": "moderate", "status": "active"}],
+        "medications": [{"name": "Metformin", "dosage": "1000mg", "frequency": "twice daily"}],
+        "lab_results": [],
+        "wearables": {"available": False, "metrics": []},
+    })
+
+
+@pytest.fixture(scope="session")
+def base_payload_kwargs():
+    """
+    Canonical build_payload() keyword arguments.
 
-# Load app.py as a real module
-spec = importlib.util.spec_from_file_location("flask_entrypoint", APP_PATH)
-flask_entrypoint = importlib.util.module_from_spec(spec)
+    build_payload never mutates its inputs, so the shared dict is safe
+    to spread directly; per-test overrides go through {**kwargs, ...}.
+    The proxy guards against in-place edits leaking across tests.
+    """
+    return MappingProxyType(dict(
+        text="Sample chunk text.",
+        pmid="PMC12345",
+        title="Diabetes Study",
+        journal="Lancet",
+        year=2024,
+        authors=["Dr. A", "Dr. B"],
+        section="Full Text",
+        chunk_index=0,
+        api_query="type 2 diabetes",
+    ))
+
+
+@pytest.fixture
+def mock_node_factory():
+    """
+    Factory for Neo4j-node-shaped test doubles.
+
+    The graph formatters only ever call `.get(key)`, so a SimpleNamespace
+    wrapping dict.get stands in for a node at a fraction of the cost of
+    building a MagicMock per test.
+    """
+    import types
+
+    def make(**properties):
+        node = types.SimpleNamespace()
+        node.get = properties.get
+        return node
+
+    return make
+
+
+class FakeSession:
+    """
+    Minimal Neo4j session stand-in: context manager whose run() returns
+    a canned result and records its calls. Avoids the MagicMock
+    attribute-chain scaffolding (and its per-access auto-creation cost).
+    """
+
+    def __init__(self, run_result):
+        self._result = run_result
+        self.run_calls = []
+
+    def run(self, *args, **kwargs):
+        self.run_calls.append((args, kwargs))
+        return self._result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeDriver:
+    def __init__(self, session):
+        self._session = session
+
+    def session(self):
+        return self._session
+
+
+@pytest.fixture
+def fake_driver_factory():
+    """Build a (driver, session) pair around a canned query result."""
 
-# 🔑 REGISTER THE MODULE (this is what was missing)
-sys.modules["flask_entrypoint"] = flask_entrypoint
+    def make(run_result):
+        session = FakeSession(run_result)
+        return FakeDriver(session), session
 
-spec.loader.exec_module(flask_entrypoint)
+    return make
 
 
 @pytest.fixture
-def client():
+def client(flask_entrypoint):
     flask_app = flask_entrypoint.app
     flask_app.config["TESTING"] = True
 
     with flask_app.test_client() as client:
-        yield client
\ No newline at end of file
+        yield client
@@ -30,11 +30,94 @@ Run with:
     pytest tests/test_suite.py -k "chunk or embed"   (multiple keywords)
 """
 
+import copy
+
 import pytest
 from unittest.mock import patch, MagicMock, PropertyMock
 import json
+import types
+
 import requests
 
+from app.cache.answer_cache import answer_cache
+from app.fetchers.pubmed_fetcher import (
+    search_pmc_articles,
+    _extract_full_text,
+    fetch_pmc_details,
+    fetch_all_pmc_articles,
+)
+from app.ingestion import pubmed_ingest
+from app.knowledge_graph import autopilot, patient_graph_reader, wearables_graph
+from app.knowledge_graph.autopilot import analyze_health_intent, apply_graph_update
+from app.knowledge_graph.drug_interactions import (
+    check_drug_interactions,
+    _check_drug_drug_facts,
+    _check_drug_effect_facts,
+    _safe_response,
+)
+from app.knowledge_graph.patient_graph_reader import (
+    _format_medications,
+    _extract_numeric_values,
+    _compute_trend,
+    _safe_date,
+)
+from app.knowledge_graph.wearables_graph import (
+    _extract_bp_systolic,
+    _extract_bp_diastolic,
+    _compute_numeric_trend,
+    _compute_string_trend,
+)
+from app.llm.ollama_client import call_ollama, clear_ollama_cache, MAX_PROMPT_CHARS, _smart_truncate
+from app.models import User, db
+from app.processing.chunker import simple_chunk, simple_chunk_offsets
+from app.processing.embedding import embed_texts, clear_embedding_cache
+from app.processing.entity_extractor import (
+    _empty_result,
+    extract_medical_entities,
+    _get_device,
+)
+from app.rag.claim_extractor import (
+    _strip_markdown,
+    extract_claims,
+    _classify_sentence,
+    _map_section_to_type,
+    _extract_bullet_points,
+    _split_by_headers,
+    _extract_smart_sentences,
+)
+from app.rag.fact_checker import (
+    _normalize,
+    _match_any,
+    _patient_med_names,
+    _patient_conditions,
+    _papers_evidence,
+    verify_claim,
+    verify_claims,
+)
+from app.rag import prompt_builder
+from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
+from app.rag.prompt_builder import (
+    build_medical_prompt,
+    _format_patient,
+    _format_drug_facts,
+    _format_papers,
+)
+from app.rag.qdrant_search import qdrant_hybrid_search, _context_filter
+from app.schema.schema_builder import (
+    _empty_entity_block,
+    build_payload,
+    content_point_id,
+    PubmedPayload,
+)
+from app.vector_store.paper_search import clear_search_cache, search_papers
+from app.vector_store.qdrant_store import (
+    get_client,
+    close_client,
+    create_collection_if_not_exists,
+    create_indexes,
+    _create_payload_index_safe,
+)
+
 
 # ===========================================================================
 # SECTION 1 — pubmed_fetcher.py
@@ -47,8 +130,6 @@ class TestSearchPmcArticles:
     @patch("app.fetchers.pubmed_fetcher.Entrez.read")
     def test_returns_id_list_on_success(self, mock_read, mock_esearch):
         """Should return list of PMC IDs when search succeeds."""
-        from app.fetchers.pubmed_fetcher import search_pmc_articles
-
         mock_read.return_value = {"IdList": ["12345", "67890"]}
         mock_esearch.return_value = MagicMock()
 
@@ -61,8 +142,6 @@ class TestSearchPmcArticles:
     @patch("app.fetchers.pubmed_fetcher.Entrez.read")
     def test_returns_empty_list_when_no_results(self, mock_read, mock_esearch):
         """Should return empty list when no articles found."""
-        from app.fetchers.pubmed_fetcher import search_pmc_articles
-
         mock_read.return_value = {"IdList": []}
         mock_esearch.return_value = MagicMock()
 
@@ -73,8 +152,6 @@ class TestSearchPmcArticles:
     @patch("app.fetchers.pubmed_fetcher.Entrez.esearch", side_effect=Exception("Network error"))
     def test_returns_empty_list_on_exception(self, mock_esearch):
         """Should return empty list and not raise on network failure."""
-        from app.fetchers.pubmed_fetcher import search_pmc_articles
-
         result = search_pmc_articles("diabetes", max_results=5)
 
         assert result == []
@@ -83,8 +160,6 @@ class TestSearchPmcArticles:
     @patch("app.fetchers.pubmed_fetcher.Entrez.read")
     def test_appends_open_access_filter(self, mock_read, mock_esearch):
         """Should add 'open access[filter]' to query."""
-        from app.fetchers.pubmed_fetcher import search_pmc_articles
-
         mock_read.return_value = {"IdList": []}
         mock_esearch.return_value = MagicMock()
 
@@ -100,8 +175,6 @@ class TestExtractFullText:
     def test_extracts_sections_with_titles(self):
         """Should extract section titles and paragraphs."""
         from bs4 import BeautifulSoup
-        from app.fetchers.pubmed_fetcher import _extract_full_text
-
         xml = """
         <body>
           <sec>
@@ -121,8 +194,6 @@ class TestExtractFullText:
     def test_returns_empty_string_when_no_body(self):
         """Should return empty string if no <body> tag."""
         from bs4 import BeautifulSoup
-        from app.fetchers.pubmed_fetcher import _extract_full_text
-
         soup = BeautifulSoup("<article><front/></article>", "lxml-xml")
         result = _extract_full_text(soup)
 
@@ -131,8 +202,6 @@ class TestExtractFullText:
     def test_skips_sections_with_no_paragraphs(self):
         """Sections without <p> tags should not appear in output."""
         from bs4 import BeautifulSoup
-        from app.fetchers.pubmed_fetcher import _extract_full_text
-
         xml = """
         <body>
           <sec><title>Empty Section</title></sec>
@@ -148,8 +217,6 @@ class TestExtractFullText:
     def test_uses_default_title_when_missing(self):
         """Should use 'Section' label when no <title> present."""
         from bs4 import BeautifulSoup
-        from app.fetchers.pubmed_fetcher import _extract_full_text
-
         xml = "<body><sec><p>Some content.</p></sec></body>"
         soup = BeautifulSoup(xml, "lxml-xml")
         result = _extract_full_text(soup)
@@ -164,8 +231,6 @@ class TestFetchPmcDetails:
     @patch("app.fetchers.pubmed_fetcher.Entrez.efetch")
     def test_returns_none_on_exception(self, mock_efetch):
         """Should return None if fetching fails."""
-        from app.fetchers.pubmed_fetcher import fetch_pmc_details
-
         mock_efetch.side_effect = Exception("Connection failed")
 
         result = fetch_pmc_details("PMC12345")
@@ -175,8 +240,6 @@ class TestFetchPmcDetails:
     @patch("app.fetchers.pubmed_fetcher.Entrez.efetch")
     def test_parses_title_and_journal(self, mock_efetch):
         """Should correctly parse title and journal from XML."""
-        from app.fetchers.pubmed_fetcher import fetch_pmc_details
-
         xml = b"""
         <pmc-articleset>
           <article>
@@ -211,8 +274,6 @@ class TestFetchPmcDetails:
     @patch("app.fetchers.pubmed_fetcher.Entrez.efetch")
     def test_defaults_when_fields_missing(self, mock_efetch):
         """Should use default values when optional fields are absent."""
-        from app.fetchers.pubmed_fetcher import fetch_pmc_details
-
         xml = b"<pmc-articleset><article><front></front><body></body></article></pmc-articleset>"
         mock_handle = MagicMock()
         mock_handle.read.return_value = xml
@@ -232,8 +293,6 @@ class TestFetchAllPmcArticles:
     @patch("app.fetchers.pubmed_fetcher.search_pmc_articles", return_value=[])
     def test_returns_empty_list_when_no_ids(self, mock_search):
         """Should return empty list if no PMC IDs found."""
-        from app.fetchers.pubmed_fetcher import fetch_all_pmc_articles
-
         result = fetch_all_pmc_articles("diabetes", max_results=5)
 
         assert result == []
@@ -243,8 +302,6 @@ class TestFetchAllPmcArticles:
     @patch("app.fetchers.pubmed_fetcher.search_pmc_articles")
     def test_filters_articles_below_min_length(self, mock_search, mock_fetch, mock_sleep):
         """Should skip articles with abstract shorter than MIN_TEXT_LENGTH."""
-        from app.fetchers.pubmed_fetcher import fetch_all_pmc_articles
-
         mock_search.return_value = ["PMC1"]
         mock_fetch.return_value = {"pmid": "PMC1", "abstract": "short"}
 
@@ -257,8 +314,6 @@ class TestFetchAllPmcArticles:
     @patch("app.fetchers.pubmed_fetcher.search_pmc_articles")
     def test_skips_none_articles(self, mock_search, mock_fetch, mock_sleep):
         """Should skip None results from fetch_pmc_details."""
-        from app.fetchers.pubmed_fetcher import fetch_all_pmc_articles
-
         mock_search.return_value = ["PMC1", "PMC2"]
         mock_fetch.side_effect = [None, None]
 
@@ -280,10 +335,7 @@ class TestBatchUtility:
     """
 
     def _import_batch(self):
-        # Patch the side-effectful ingest call before importing
-        with patch("app.ingestion.pubmed_ingest.ingest_from_pubmed"):
-            from app.ingestion.pubmed_ingest import _batch
-        return _batch
+        return pubmed_ingest._batch
 
     def test_yields_correct_batch_sizes(self):
         _batch = self._import_batch()
@@ -307,9 +359,7 @@ class TestBatchUtility:
 
 
 def _import_ingest():
-    """Import ingest_from_pubmed safely, suppressing module-level side effects."""
-    with patch("app.ingestion.pubmed_ingest.ingest_from_pubmed"):
-        from app.ingestion import pubmed_ingest
+    """Resolve ingest_from_pubmed from the already-imported module."""
     return pubmed_ingest.ingest_from_pubmed
 
 
@@ -365,31 +415,23 @@ class TestCheckDrugInteractions:
     """Tests for check_drug_interactions() entry point."""
 
     def test_returns_safe_response_for_non_list_input(self):
-        from app.knowledge_graph.drug_interactions import check_drug_interactions
-
         result = check_drug_interactions("metformin")  # string, not list
 
         assert "note" in result
         assert result["checked_drugs"] == []
 
     def test_returns_safe_response_for_empty_list(self):
-        from app.knowledge_graph.drug_interactions import check_drug_interactions
-
         result = check_drug_interactions([])
 
         assert "note" in result
         assert result["checked_drugs"] == []
 
     def test_returns_safe_response_for_items_without_name(self):
-        from app.knowledge_graph.drug_interactions import check_drug_interactions
-
         result = check_drug_interactions([{"dosage": "10mg"}])  # no 'name' key
 
         assert "note" in result
 
     def test_normalizes_drug_names_to_lowercase(self):
-        from app.knowledge_graph.drug_interactions import check_drug_interactions
-
         with patch("app.knowledge_graph.drug_interactions._check_drug_condition_facts", return_value=[]):
             result = check_drug_interactions([{"name": "METFORMIN"}, {"name": "Aspirin"}])
 
@@ -397,8 +439,6 @@ class TestCheckDrugInteractions:
         assert "aspirin" in result["checked_drugs"]
 
     def test_deduplicates_drug_names(self):
-        from app.knowledge_graph.drug_interactions import check_drug_interactions
-
         with patch("app.knowledge_graph.drug_interactions._check_drug_condition_facts", return_value=[]):
             result = check_drug_interactions([
                 {"name": "metformin"}, {"name": "metformin"}, {"name": "Metformin"}
@@ -407,8 +447,6 @@ class TestCheckDrugInteractions:
         assert result["checked_drugs"].count("metformin") == 1
 
     def test_returns_all_required_keys(self):
-        from app.knowledge_graph.drug_interactions import check_drug_interactions
-
         with patch("app.knowledge_graph.drug_interactions._check_drug_condition_facts", return_value=[]):
             result = check_drug_interactions([{"name": "aspirin"}])
 
@@ -422,8 +460,6 @@ class TestCheckDrugDrugFacts:
     """Tests for _check_drug_drug_facts() — deterministic rule engine."""
 
     def test_detects_metformin_contrast_dye_interaction(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_drug_facts
-
         result = _check_drug_drug_facts(["metformin", "contrast dye"])
 
         assert any(
@@ -432,30 +468,22 @@ class TestCheckDrugDrugFacts:
         )
 
     def test_detects_aspirin_atorvastatin_interaction(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_drug_facts
-
         result = _check_drug_drug_facts(["aspirin", "atorvastatin"])
 
         assert len(result) >= 1
         assert all(f["type"] == "drug-drug-interaction" for f in result)
 
     def test_no_interaction_for_unrelated_drugs(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_drug_facts
-
         result = _check_drug_drug_facts(["vitamin_c", "zinc"])
 
         assert result == []
 
     def test_returns_list_type(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_drug_facts
-
         result = _check_drug_drug_facts(["metformin"])
 
         assert isinstance(result, list)
 
     def test_interaction_has_required_fields(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_drug_facts
-
         result = _check_drug_drug_facts(["metformin", "contrast dye"])
 
         assert len(result) > 0
@@ -467,8 +495,6 @@ class TestCheckDrugDrugFacts:
             assert "mechanism" in fact
 
     def test_severity_levels_are_valid(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_drug_facts
-
         result = _check_drug_drug_facts(["metformin", "insulin", "aspirin", "atorvastatin"])
 
         valid_severities = {"low", "moderate", "high"}
@@ -476,8 +502,6 @@ class TestCheckDrugDrugFacts:
             assert fact["severity"] in valid_severities
 
     def test_drugs_involved_are_sorted(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_drug_facts
-
         result = _check_drug_drug_facts(["metformin", "contrast dye"])
 
         for fact in result:
@@ -488,52 +512,38 @@ class TestCheckDrugEffectFacts:
     """Tests for _check_drug_effect_facts() — knowledge base lookup."""
 
     def test_metformin_returns_b12_fact(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_effect_facts
-
         result = _check_drug_effect_facts(["metformin"])
 
         assert any("B12" in f["effect"] for f in result)
 
     def test_aspirin_returns_gi_bleeding_fact(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_effect_facts
-
         result = _check_drug_effect_facts(["aspirin"])
 
         assert any("bleeding" in f["effect"].lower() for f in result)
 
     def test_montelukast_returns_black_box_warning(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_effect_facts
-
         result = _check_drug_effect_facts(["montelukast"])
 
         assert any("black box" in f["evidence"].lower() for f in result)
 
     def test_returns_empty_for_unknown_drug(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_effect_facts
-
         result = _check_drug_effect_facts(["unknowndrug999"])
 
         assert result == []
 
     def test_combination_lisinopril_amlodipine_returns_extra_fact(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_effect_facts
-
         result = _check_drug_effect_facts(["lisinopril", "amlodipine"])
 
         drug_names = [f["drug"] for f in result]
         assert "lisinopril + amlodipine" in drug_names
 
     def test_all_facts_have_type_drug_effect(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_effect_facts
-
         result = _check_drug_effect_facts(["metformin", "aspirin", "losartan"])
 
         for fact in result:
             assert fact["type"] == "drug-effect"
 
     def test_all_facts_have_required_fields(self):
-        from app.knowledge_graph.drug_interactions import _check_drug_effect_facts
-
         result = _check_drug_effect_facts(["metformin"])
 
         for fact in result:
@@ -545,15 +555,11 @@ class TestSafeResponse:
     """Tests for _safe_response() helper."""
 
     def test_returns_dict_with_note(self):
-        from app.knowledge_graph.drug_interactions import _safe_response
-
         result = _safe_response("No medications provided")
 
         assert result["note"] == "No medications provided"
 
     def test_returns_empty_lists(self):
-        from app.knowledge_graph.drug_interactions import _safe_response
-
         result = _safe_response("test")
 
         assert result["drug_drug_interactions"] == []
@@ -569,32 +575,25 @@ class TestSafeResponse:
 class TestFormatMedications:
     """Tests for _format_medications()"""
 
-    def test_returns_list_of_dicts(self):
-        from app.knowledge_graph.patient_graph_reader import _format_medications
-
-        mock_node = MagicMock()
-        mock_node.get.side_effect = lambda key, *args: {
-            "name": "Metformin", "dosage": "1000mg",
-            "frequency": "twice daily", "purpose": "Blood sugar control",
-            "atcCode": "A10BA02"
-        }.get(key)
+    def test_returns_list_of_dicts(self, mock_node_factory):
+        node = mock_node_factory(
+            name="Metformin", dosage="1000mg",
+            frequency="twice daily", purpose="Blood sugar control",
+            atcCode="A10BA02",
+        )
 
-        result = _format_medications([mock_node])
+        result = _format_medications([node])
 
         assert len(result) == 1
         assert result[0]["name"] == "Metformin"
         assert result[0]["dosage"] == "1000mg"
 
     def test_skips_none_nodes(self):
-        from app.knowledge_graph.patient_graph_reader import _format_medications
-
         result = _format_medications([None, None])
 
         assert result == []
 
     def test_returns_empty_for_empty_input(self):
-        from app.knowledge_graph.patient_graph_reader import _format_medications
-
         result = _format_medications([])
 
         assert result == []
@@ -604,8 +603,6 @@ class TestExtractNumericValues:
     """Tests for _extract_numeric_values()"""
 
     def test_extracts_plain_numbers(self):
-        from app.knowledge_graph.patient_graph_reader import _extract_numeric_values
-
         readings = [{"value": "156"}, {"value": "142"}]
         result = _extract_numeric_values(readings)
 
@@ -613,8 +610,6 @@ class TestExtractNumericValues:
 
     def test_handles_blood_pressure_format(self):
         """Should extract systolic from '138/88' format."""
-        from app.knowledge_graph.patient_graph_reader import _extract_numeric_values
-
         readings = [{"value": "138/88"}]
         result = _extract_numeric_values(readings)
 
@@ -622,16 +617,12 @@ class TestExtractNumericValues:
 
     def test_skips_non_numeric_strings(self):
         """Should skip values like 'NSR'."""
-        from app.knowledge_graph.patient_graph_reader import _extract_numeric_values
-
         readings = [{"value": "NSR"}, {"value": "72"}]
         result = _extract_numeric_values(readings)
 
         assert result == [72.0]
 
     def test_returns_empty_for_all_non_numeric(self):
-        from app.knowledge_graph.patient_graph_reader import _extract_numeric_values
-
         readings = [{"value": "NSR"}, {"value": "Normal"}]
         result = _extract_numeric_values(readings)
 
@@ -642,36 +633,26 @@ class TestComputeTrend:
     """Tests for _compute_trend()"""
 
     def test_returns_stable_for_small_difference(self):
-        from app.knowledge_graph.patient_graph_reader import _compute_trend
-
         result = _compute_trend([100.0, 101.0])
 
         assert result == "stable"
 
     def test_returns_increasing_for_upward_trend(self):
-        from app.knowledge_graph.patient_graph_reader import _compute_trend
-
         result = _compute_trend([100.0, 120.0])
 
         assert "increasing" in result
 
     def test_returns_decreasing_for_downward_trend(self):
-        from app.knowledge_graph.patient_graph_reader import _compute_trend
-
         result = _compute_trend([120.0, 100.0])
 
         assert "decreasing" in result
 
     def test_returns_monitoring_needed_for_single_value(self):
-        from app.knowledge_graph.patient_graph_reader import _compute_trend
-
         result = _compute_trend([100.0])
 
         assert "more readings needed" in result
 
     def test_returns_monitoring_needed_for_empty_list(self):
-        from app.knowledge_graph.patient_graph_reader import _compute_trend
-
         result = _compute_trend([])
 
         assert "more readings needed" in result
@@ -681,23 +662,17 @@ class TestCleanTimestamp:
     """Tests for _clean_timestamp()"""
 
     def test_extracts_date_from_iso_timestamp(self):
-        from app.knowledge_graph.patient_graph_reader import _clean_timestamp
-
-        result = _clean_timestamp("2026-02-08T08:00:00Z")
+        result = patient_graph_reader._clean_timestamp("2026-02-08T08:00:00Z")
 
         assert result == "2026-02-08"
 
     def test_returns_unknown_date_for_empty_string(self):
-        from app.knowledge_graph.patient_graph_reader import _clean_timestamp
-
-        result = _clean_timestamp("")
+        result = patient_graph_reader._clean_timestamp("")
 
         assert result == "unknown date"
 
     def test_returns_unknown_date_for_none(self):
-        from app.knowledge_graph.patient_graph_reader import _clean_timestamp
-
-        result = _clean_timestamp(None)
+        result = patient_graph_reader._clean_timestamp(None)
 
         assert result == "unknown date"
 
@@ -706,15 +681,11 @@ class TestSafeDate:
     """Tests for _safe_date()"""
 
     def test_converts_value_to_string(self):
-        from app.knowledge_graph.patient_graph_reader import _safe_date
-
         result = _safe_date("2024-01-15")
 
         assert result == "2024-01-15"
 
     def test_returns_none_for_falsy_input(self):
-        from app.knowledge_graph.patient_graph_reader import _safe_date
-
         assert _safe_date(None) is None
         assert _safe_date("") is None
 
@@ -723,16 +694,12 @@ class TestFormatWearables:
     """Tests for _format_wearables()"""
 
     def test_returns_unavailable_for_empty_rows(self):
-        from app.knowledge_graph.patient_graph_reader import _format_wearables
-
-        result = _format_wearables([])
+        result = patient_graph_reader._format_wearables([])
 
         assert result["available"] is False
         assert result["metrics"] == []
 
     def test_returns_available_true_for_valid_rows(self):
-        from app.knowledge_graph.patient_graph_reader import _format_wearables
-
         rows = [{
             "name": "Blood Glucose",
             "type": "blood_glucose",
@@ -744,14 +711,12 @@ class TestFormatWearables:
             ]
         }]
 
-        result = _format_wearables(rows)
+        result = patient_graph_reader._format_wearables(rows)
 
         assert result["available"] is True
         assert len(result["metrics"]) == 1
 
     def test_computes_latest_and_previous_values(self):
-        from app.knowledge_graph.patient_graph_reader import _format_wearables
-
         rows = [{
             "name": "Heart Rate",
             "type": "heart_rate",
@@ -763,15 +728,13 @@ class TestFormatWearables:
             ]
         }]
 
-        result = _format_wearables(rows)
+        result = patient_graph_reader._format_wearables(rows)
         metric = result["metrics"][0]
 
         assert "75" in metric["latest_value"]
         assert "72" in metric["previous_value"]
 
     def test_filters_out_empty_readings(self):
-        from app.knowledge_graph.patient_graph_reader import _format_wearables
-
         rows = [{
             "name": "Steps",
             "type": "steps",
@@ -783,7 +746,7 @@ class TestFormatWearables:
             ]
         }]
 
-        result = _format_wearables(rows)
+        result = patient_graph_reader._format_wearables(rows)
 
         # No valid readings → metric still included but with defaults
         metric = result["metrics"][0]
@@ -798,22 +761,16 @@ class TestExtractBpSystolic:
     """Tests for _extract_bp_systolic()"""
 
     def test_extracts_systolic_from_bp_readings(self):
-        from app.knowledge_graph.wearables_graph import _extract_bp_systolic
-
         result = _extract_bp_systolic(["138/88", "142/90"])
 
         assert result == [138.0, 142.0]
 
     def test_returns_empty_for_non_bp_values(self):
-        from app.knowledge_graph.wearables_graph import _extract_bp_systolic
-
         result = _extract_bp_systolic(["72", "75"])
 
         assert result == []
 
     def test_skips_malformed_bp_values(self):
-        from app.knowledge_graph.wearables_graph import _extract_bp_systolic
-
         result = _extract_bp_systolic(["abc/def"])
 
         assert result == []
@@ -823,8 +780,6 @@ class TestExtractBpDiastolic:
     """Tests for _extract_bp_diastolic()"""
 
     def test_extracts_diastolic_from_bp_readings(self):
-        from app.knowledge_graph.wearables_graph import _extract_bp_diastolic
-
         result = _extract_bp_diastolic(["138/88", "142/90"])
 
         assert result == [88.0, 90.0]
@@ -834,36 +789,26 @@ class TestComputeNumericTrend:
     """Tests for _compute_numeric_trend()"""
 
     def test_stable_within_2_percent(self):
-        from app.knowledge_graph.wearables_graph import _compute_numeric_trend
-
         result = _compute_numeric_trend([100.0, 101.0])
 
         assert result == "stable"
 
     def test_increasing_trend(self):
-        from app.knowledge_graph.wearables_graph import _compute_numeric_trend
-
         result = _compute_numeric_trend([100.0, 130.0])
 
         assert "increasing" in result
 
     def test_decreasing_trend(self):
-        from app.knowledge_graph.wearables_graph import _compute_numeric_trend
-
         result = _compute_numeric_trend([130.0, 100.0])
 
         assert "decreasing" in result
 
     def test_single_value_returns_monitoring_needed(self):
-        from app.knowledge_graph.wearables_graph import _compute_numeric_trend
-
         result = _compute_numeric_trend([100.0])
 
         assert "more readings needed" in result
 
     def test_zero_first_value_returns_monitoring_needed(self):
-        from app.knowledge_graph.wearables_graph import _compute_numeric_trend
-
         result = _compute_numeric_trend([0.0, 50.0])
 
         assert "more readings needed" in result
@@ -873,22 +818,16 @@ class TestComputeStringTrend:
     """Tests for _compute_string_trend()"""
 
     def test_stable_when_values_equal(self):
-        from app.knowledge_graph.wearables_graph import _compute_string_trend
-
         result = _compute_string_trend(["NSR", "NSR"])
 
         assert result == "stable"
 
     def test_changed_when_values_differ(self):
-        from app.knowledge_graph.wearables_graph import _compute_string_trend
-
         result = _compute_string_trend(["NSR", "Irregular"])
 
         assert result == "changed between readings"
 
     def test_single_value_returns_monitoring_needed(self):
-        from app.knowledge_graph.wearables_graph import _compute_string_trend
-
         result = _compute_string_trend(["NSR"])
 
         assert "more readings needed" in result
@@ -898,23 +837,17 @@ class TestWearablesCleanTimestamp:
     """Tests for _clean_timestamp() in wearables_graph."""
 
     def test_truncates_to_date(self):
-        from app.knowledge_graph.wearables_graph import _clean_timestamp
-
-        result = _clean_timestamp("2026-02-08T08:00:00Z")
+        result = wearables_graph._clean_timestamp("2026-02-08T08:00:00Z")
 
         assert result == "2026-02-08"
 
     def test_handles_none_string(self):
-        from app.knowledge_graph.wearables_graph import _clean_timestamp
-
-        result = _clean_timestamp("None")
+        result = wearables_graph._clean_timestamp("None")
 
         assert result == "unknown date"
 
     def test_handles_empty_string(self):
-        from app.knowledge_graph.wearables_graph import _clean_timestamp
-
-        result = _clean_timestamp("")
+        result = wearables_graph._clean_timestamp("")
 
         assert result == "unknown date"
 
@@ -926,10 +859,14 @@ class TestWearablesCleanTimestamp:
 class TestCallOllama:
     """Tests for call_ollama()"""
 
-    @patch("app.llm.ollama_client.requests.post")
-    def test_returns_message_content_on_success(self, mock_post):
-        from app.llm.ollama_client import call_ollama
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        clear_ollama_cache()
+        yield
+        clear_ollama_cache()
 
+    @patch("app.llm.ollama_client._SESSION.post")
+    def test_returns_message_content_on_success(self, mock_post):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {
@@ -941,10 +878,33 @@ class TestCallOllama:
 
         assert result == "Test response from model"
 
-    @patch("app.llm.ollama_client.requests.post")
-    def test_returns_error_message_on_non_200(self, mock_post):
-        from app.llm.ollama_client import call_ollama
+    @patch("app.llm.ollama_client._SESSION.post")
+    def test_repeated_prompt_served_from_cache(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"message": {"content": "cached answer"}}
+        mock_post.return_value = mock_response
+
+        first = call_ollama("What is diabetes?")
+        second = call_ollama("What is diabetes?")
 
+        assert first == second == "cached answer"
+        assert mock_post.call_count == 1
+
+    @patch("app.llm.ollama_client._SESSION.post")
+    def test_error_responses_are_not_cached(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.status_code = 500
+        mock_response.text = "Internal Server Error"
+        mock_post.return_value = mock_response
+
+        call_ollama("question")
+        call_ollama("question")
+
+        assert mock_post.call_count == 2
+
+    @patch("app.llm.ollama_client._SESSION.post")
+    def test_returns_error_message_on_non_200(self, mock_post):
         mock_response = MagicMock()
         mock_response.status_code = 500
         mock_response.text = "Internal Server Error"
@@ -954,26 +914,20 @@ class TestCallOllama:
 
         assert "Ollama error 500" in result
 
-    @patch("app.llm.ollama_client.requests.post", side_effect=requests.exceptions.ConnectionError)
+    @patch("app.llm.ollama_client._SESSION.post", side_effect=requests.exceptions.ConnectionError)
     def test_returns_error_when_ollama_not_running(self, mock_post):
-        from app.llm.ollama_client import call_ollama
-
         result = call_ollama("question")
 
         assert "not running" in result.lower() or "Error" in result
 
-    @patch("app.llm.ollama_client.requests.post", side_effect=Exception("Unexpected"))
+    @patch("app.llm.ollama_client._SESSION.post", side_effect=Exception("Unexpected"))
     def test_returns_generic_error_on_unknown_exception(self, mock_post):
-        from app.llm.ollama_client import call_ollama
-
         result = call_ollama("question")
 
         assert "Error" in result
 
-    @patch("app.llm.ollama_client.requests.post")
+    @patch("app.llm.ollama_client._SESSION.post")
     def test_truncates_long_prompt(self, mock_post):
-        from app.llm.ollama_client import call_ollama, MAX_PROMPT_CHARS
-
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"message": {"content": "ok"}}
@@ -985,10 +939,8 @@ class TestCallOllama:
         actual_prompt = mock_post.call_args[1]["json"]["messages"][1]["content"]
         assert len(actual_prompt) <= MAX_PROMPT_CHARS + 500  # some buffer for smart truncation
 
-    @patch("app.llm.ollama_client.requests.post")
+    @patch("app.llm.ollama_client._SESSION.post")
     def test_uses_correct_model(self, mock_post):
-        from app.llm.ollama_client import call_ollama
-
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"message": {"content": "ok"}}
@@ -999,10 +951,8 @@ class TestCallOllama:
         payload = mock_post.call_args[1]["json"]
         assert payload["model"] == "phi3:mini"
 
-    @patch("app.llm.ollama_client.requests.post")
+    @patch("app.llm.ollama_client._SESSION.post")
     def test_sends_system_message(self, mock_post):
-        from app.llm.ollama_client import call_ollama
-
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"message": {"content": "ok"}}
@@ -1020,8 +970,6 @@ class TestSmartTruncate:
     """Tests for _smart_truncate()"""
 
     def test_truncates_literature_section(self):
-        from app.llm.ollama_client import _smart_truncate
-
         prompt = (
             "Patient info...\n"
             "========================\nRELEVANT MEDICAL LITERATURE\n========================\n"
@@ -1035,16 +983,12 @@ class TestSmartTruncate:
         assert "USER QUESTION" in result
 
     def test_fallback_truncation_when_markers_absent(self):
-        from app.llm.ollama_client import _smart_truncate
-
         prompt = "A" * 2000
         result = _smart_truncate(prompt, 500)
 
         assert len(result) == 500
 
     def test_preserves_user_question_section(self):
-        from app.llm.ollama_client import _smart_truncate
-
         prompt = (
             "Before literature\n"
             "RELEVANT MEDICAL LITERATURE\n" + "content " * 200 +
@@ -1060,16 +1004,24 @@ class TestSmartTruncate:
 # SECTION 7 — autopilot.py
 # ===========================================================================
 
+# Canned LLM responses — serialized once instead of json.dumps per test.
+_FEVER_RESP = '[{"category": "Condition", "original_term": "high fever", "normalized_term": "Fever"}]'
+_ASPIRIN_DICT_RESP = '{"category": "Medication", "original_term": "aspirin", "normalized_term": "Aspirin"}'
+_MIXED_VALIDITY_RESP = '[{"original_term": "something"}, {"category": "Condition", "normalized_term": "Fever"}]'
+
+
 class TestAnalyzeHealthIntent:
     """Tests for analyze_health_intent()"""
 
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        autopilot._analyze_impl.cache_clear()
+        yield
+        autopilot._analyze_impl.cache_clear()
+
     @patch("app.knowledge_graph.autopilot.call_ollama")
     def test_returns_list_on_success(self, mock_ollama):
-        from app.knowledge_graph.autopilot import analyze_health_intent
-
-        mock_ollama.return_value = json.dumps([
-            {"category": "Condition", "original_term": "high fever", "normalized_term": "Fever"}
-        ])
+        mock_ollama.return_value = _FEVER_RESP
 
         result = analyze_health_intent("I have high fever")
 
@@ -1079,8 +1031,6 @@ class TestAnalyzeHealthIntent:
 
     @patch("app.knowledge_graph.autopilot.call_ollama")
     def test_returns_empty_list_when_no_facts(self, mock_ollama):
-        from app.knowledge_graph.autopilot import analyze_health_intent
-
         mock_ollama.return_value = "[]"
 
         result = analyze_health_intent("What is diabetes?")
@@ -1090,11 +1040,7 @@ class TestAnalyzeHealthIntent:
     @patch("app.knowledge_graph.autopilot.call_ollama")
     def test_handles_dict_response_by_wrapping_in_list(self, mock_ollama):
         """Should wrap a single dict into a list."""
-        from app.knowledge_graph.autopilot import analyze_health_intent
-
-        mock_ollama.return_value = json.dumps(
-            {"category": "Medication", "original_term": "aspirin", "normalized_term": "Aspirin"}
-        )
+        mock_ollama.return_value = _ASPIRIN_DICT_RESP
 
         result = analyze_health_intent("I take aspirin")
 
@@ -1104,12 +1050,8 @@ class TestAnalyzeHealthIntent:
     @patch("app.knowledge_graph.autopilot.call_ollama")
     def test_filters_out_invalid_entries(self, mock_ollama):
         """Entries without category or normalized_term should be filtered."""
-        from app.knowledge_graph.autopilot import analyze_health_intent
-
-        mock_ollama.return_value = json.dumps([
-            {"original_term": "something"},  # missing category and normalized_term
-            {"category": "Condition", "normalized_term": "Fever"},  # valid
-        ])
+        # First entry is missing category and normalized_term
+        mock_ollama.return_value = _MIXED_VALIDITY_RESP
 
         result = analyze_health_intent("I have fever")
 
@@ -1118,8 +1060,6 @@ class TestAnalyzeHealthIntent:
 
     @patch("app.knowledge_graph.autopilot.call_ollama", side_effect=Exception("LLM error"))
     def test_returns_empty_list_on_exception(self, mock_ollama):
-        from app.knowledge_graph.autopilot import analyze_health_intent
-
         result = analyze_health_intent("I have fever")
 
         assert result == []
@@ -1127,8 +1067,6 @@ class TestAnalyzeHealthIntent:
     @patch("app.knowledge_graph.autopilot.call_ollama")
     def test_strips_markdown_json_fences(self, mock_ollama):
         """Should handle ```json ... ``` wrapped responses."""
-        from app.knowledge_graph.autopilot import analyze_health_intent
-
         mock_ollama.return_value = (
             "```json\n"
             '[{"category": "Allergy", "original_term": "penicillin", "normalized_term": "Penicillin"}]\n'
@@ -1146,24 +1084,15 @@ class TestApplyGraphUpdate:
 
     @patch("app.knowledge_graph.autopilot.get_driver")
     def test_returns_false_for_invalid_category(self, mock_get_driver):
-        from app.knowledge_graph.autopilot import apply_graph_update
-
         success, msg = apply_graph_update("user_1", "InvalidCategory", "SomeDrug")
 
         assert success is False
         assert "Invalid category" in msg
 
     @patch("app.knowledge_graph.autopilot.get_driver")
-    def test_condition_update_returns_true_when_patient_found(self, mock_get_driver):
-        from app.knowledge_graph.autopilot import apply_graph_update
-
-        mock_session = MagicMock()
-        mock_result = MagicMock()
-        mock_result.single.return_value = {"u.id": "user_1"}
-        mock_session.run.return_value = mock_result
-        mock_get_driver.return_value.__enter__ = MagicMock()
-        mock_get_driver.return_value.session.return_value.__enter__ = MagicMock(return_value=mock_session)
-        mock_get_driver.return_value.session.return_value.__exit__ = MagicMock(return_value=False)
+    def test_condition_update_returns_true_when_patient_found(self, mock_get_driver, fake_driver_factory):
+        result = types.SimpleNamespace(single=lambda: {"u.id": "user_1"})
+        mock_get_driver.return_value, _ = fake_driver_factory(result)
 
         success, msg = apply_graph_update("user_1", "Condition", "Fever")
 
@@ -1171,15 +1100,9 @@ class TestApplyGraphUpdate:
         assert "Fever" in msg
 
     @patch("app.knowledge_graph.autopilot.get_driver")
-    def test_returns_false_when_patient_not_found(self, mock_get_driver):
-        from app.knowledge_graph.autopilot import apply_graph_update
-
-        mock_session = MagicMock()
-        mock_result = MagicMock()
-        mock_result.single.return_value = None  # Patient not found
-        mock_session.run.return_value = mock_result
-        mock_get_driver.return_value.session.return_value.__enter__ = MagicMock(return_value=mock_session)
-        mock_get_driver.return_value.session.return_value.__exit__ = MagicMock(return_value=False)
+    def test_returns_false_when_patient_not_found(self, mock_get_driver, fake_driver_factory):
+        result = types.SimpleNamespace(single=lambda: None)  # Patient not found
+        mock_get_driver.return_value, _ = fake_driver_factory(result)
 
         success, msg = apply_graph_update("unknown_user", "Condition", "Fever")
 
@@ -1188,8 +1111,6 @@ class TestApplyGraphUpdate:
 
     @patch("app.knowledge_graph.autopilot.get_driver")
     def test_returns_false_on_db_exception(self, mock_get_driver):
-        from app.knowledge_graph.autopilot import apply_graph_update
-
         # Exception raised when opening a session, not at get_driver() call
         mock_driver = MagicMock()
         mock_driver.session.side_effect = Exception("Neo4j down")
@@ -1199,22 +1120,47 @@ class TestApplyGraphUpdate:
 
         assert success is False
 
+    @patch("app.knowledge_graph.autopilot.get_driver")
+    def test_confirmed_update_visible_in_next_profile_fetch(self, mock_get_driver, fake_driver_factory):
+        """A confirmed write must evict the cached profile."""
+        from app.knowledge_graph import patient_graph_reader
+
+        patient_graph_reader.clear_profile_cache()
+        stale = {"patient_id": "user_1", "medications": [], "facts_version": "1.0"}
+        patient_graph_reader._profile_cache["user_1"] = (0, stale)
+
+        # The seeded entry is served before the update...
+        assert patient_graph_reader.get_patient_profile("user_1")["medications"] == []
+
+        result = types.SimpleNamespace(single=lambda: {"u.id": "user_1"})
+        mock_get_driver.return_value, _ = fake_driver_factory(result)
+        success, _ = apply_graph_update("user_1", "Medication", "Aspirin")
+        assert success is True
+
+        # ...and the next fetch goes back to Neo4j instead of the cache.
+        fresh_result = types.SimpleNamespace(single=lambda: None, data=lambda: [])
+        driver, session = fake_driver_factory(fresh_result)
+        driver.close = lambda: None
+        with patch(
+            "app.knowledge_graph.patient_graph_reader._get_driver",
+            return_value=driver,
+        ):
+            profile = patient_graph_reader.get_patient_profile("user_1")
+
+        assert len(session.run_calls) == 2  # core + wearables queries ran
+        assert "medications" not in profile  # not the stale cached dict
+        patient_graph_reader.clear_profile_cache()
+
     @pytest.mark.parametrize("category", ["Condition", "Medication", "Allergy"])
     @patch("app.knowledge_graph.autopilot.get_driver")
-    def test_all_valid_categories_produce_query(self, mock_get_driver, category):
+    def test_all_valid_categories_produce_query(self, mock_get_driver, category, fake_driver_factory):
         """All 3 valid categories should produce a Cypher query and attempt DB write."""
-        from app.knowledge_graph.autopilot import apply_graph_update
-
-        mock_session = MagicMock()
-        mock_result = MagicMock()
-        mock_result.single.return_value = {"u.id": "user_1"}
-        mock_session.run.return_value = mock_result
-        mock_get_driver.return_value.session.return_value.__enter__ = MagicMock(return_value=mock_session)
-        mock_get_driver.return_value.session.return_value.__exit__ = MagicMock(return_value=False)
+        result = types.SimpleNamespace(single=lambda: {"u.id": "user_1"})
+        mock_get_driver.return_value, session = fake_driver_factory(result)
 
         success, msg = apply_graph_update("user_1", category, "TestEntity")
 
-        mock_session.run.assert_called_once()
+        assert len(session.run_calls) == 1
 
 
 # ===========================================================================
@@ -1225,37 +1171,27 @@ class TestSimpleChunk:
     """Tests for simple_chunk()"""
 
     def test_returns_list_of_strings(self):
-        from app.processing.chunker import simple_chunk
-
         result = simple_chunk("This is a test sentence. " * 20)
 
         assert isinstance(result, list)
         assert all(isinstance(c, str) for c in result)
 
     def test_returns_empty_list_for_empty_string(self):
-        from app.processing.chunker import simple_chunk
-
         result = simple_chunk("")
 
         assert result == []
 
     def test_returns_empty_list_for_none(self):
-        from app.processing.chunker import simple_chunk
-
         result = simple_chunk(None)
 
         assert result == []
 
     def test_returns_empty_list_for_non_string_input(self):
-        from app.processing.chunker import simple_chunk
-
         assert simple_chunk(123) == []
         assert simple_chunk(["list"]) == []
 
     def test_short_text_returns_single_chunk(self):
         """Text shorter than chunk_size should return as one chunk."""
-        from app.processing.chunker import simple_chunk
-
         text = "Short text."
         result = simple_chunk(text, chunk_size=500, overlap=50)
 
@@ -1264,8 +1200,6 @@ class TestSimpleChunk:
 
     def test_long_text_is_split_into_multiple_chunks(self):
         """Long text should produce multiple chunks."""
-        from app.processing.chunker import simple_chunk
-
         text = "Word " * 500  # ~2500 chars
         result = simple_chunk(text, chunk_size=200, overlap=20)
 
@@ -1273,8 +1207,6 @@ class TestSimpleChunk:
 
     def test_respects_custom_chunk_size(self):
         """Each chunk should not exceed chunk_size by much."""
-        from app.processing.chunker import simple_chunk
-
         text = "A" * 1000
         result = simple_chunk(text, chunk_size=100, overlap=10)
 
@@ -1284,8 +1216,6 @@ class TestSimpleChunk:
 
     def test_overlapping_chunks_share_content(self):
         """With overlap > 0, adjacent chunks should share some text."""
-        from app.processing.chunker import simple_chunk
-
         # Use a text with clear word boundaries so overlap works properly
         text = " ".join([f"word{i}" for i in range(200)])
         result = simple_chunk(text, chunk_size=100, overlap=30)
@@ -1299,8 +1229,6 @@ class TestSimpleChunk:
 
     def test_no_overlap_when_zero(self):
         """With overlap=0 no content should be duplicated."""
-        from app.processing.chunker import simple_chunk
-
         text = "sentence one. sentence two. sentence three. " * 20
         result = simple_chunk(text, chunk_size=100, overlap=0)
 
@@ -1308,7 +1236,6 @@ class TestSimpleChunk:
 
     def test_uses_settings_defaults_when_no_args(self):
         """Should use settings.CHUNK_SIZE and CHUNK_OVERLAP if not specified."""
-        from app.processing.chunker import simple_chunk
         from unittest.mock import patch
 
         with patch("app.processing.chunker.settings") as mock_settings:
@@ -1322,16 +1249,12 @@ class TestSimpleChunk:
 
     def test_whitespace_only_string_returns_empty_or_single(self):
         """Whitespace-only input should not crash."""
-        from app.processing.chunker import simple_chunk
-
         result = simple_chunk("   \n\n   ")
 
         assert isinstance(result, list)
 
     def test_chunks_are_non_empty_strings(self):
         """All returned chunks should be non-empty strings."""
-        from app.processing.chunker import simple_chunk
-
         text = "Medical research paragraph. " * 50
         result = simple_chunk(text, chunk_size=200, overlap=20)
 
@@ -1339,6 +1262,32 @@ class TestSimpleChunk:
             assert len(chunk.strip()) > 0
 
 
+class TestSimpleChunkOffsets:
+    """Tests for simple_chunk_offsets()"""
+
+    def test_offsets_round_trip_to_chunk_strings(self):
+        text = "This is a test sentence. " * 40
+        chunks = simple_chunk(text, chunk_size=100, overlap=10)
+        returned_text, offsets = simple_chunk_offsets(text, chunk_size=100, overlap=10)
+
+        assert returned_text == text
+        assert [text[s:e] for s, e in offsets] == chunks
+
+    def test_empty_input_returns_empty_offset_table(self):
+        returned_text, offsets = simple_chunk_offsets("")
+
+        assert returned_text == ""
+        assert offsets.shape == (0, 2)
+
+    def test_offset_table_is_int64_pairs(self):
+        import numpy as np
+
+        _, offsets = simple_chunk_offsets("Word " * 200, chunk_size=100, overlap=10)
+
+        assert offsets.dtype == np.int64
+        assert offsets.shape[1] == 2
+
+
 # ===========================================================================
 # SECTION 9 — embedding.py
 # ===========================================================================
@@ -1346,79 +1295,69 @@ class TestSimpleChunk:
 class TestEmbedTexts:
     """Tests for embed_texts()"""
 
-    def test_returns_empty_list_for_none(self):
-        from app.processing.embedding import embed_texts
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        clear_embedding_cache()
+        yield
+        clear_embedding_cache()
 
+    def test_returns_empty_array_for_none(self):
         result = embed_texts(None)
 
-        assert result == []
+        assert len(result) == 0
 
-    def test_returns_empty_list_for_non_list(self):
-        from app.processing.embedding import embed_texts
-
-        assert embed_texts("string input") == []
-        assert embed_texts(123) == []
-
-    def test_returns_empty_list_for_empty_list(self):
-        from app.processing.embedding import embed_texts
+    def test_returns_empty_array_for_non_list(self):
+        assert len(embed_texts("string input")) == 0
+        assert len(embed_texts(123)) == 0
 
+    def test_returns_empty_array_for_empty_list(self):
         result = embed_texts([])
 
-        assert result == []
-
-    def test_returns_empty_list_for_list_of_empty_strings(self):
-        from app.processing.embedding import embed_texts
+        assert len(result) == 0
 
+    def test_returns_empty_array_for_list_of_empty_strings(self):
         result = embed_texts(["", "   ", "\n"])
 
-        assert result == []
+        assert len(result) == 0
 
     def test_filters_out_non_string_items(self):
         """Non-string items in list should be filtered out, not crash."""
-        from app.processing.embedding import embed_texts
         import numpy as np
 
         mock_model = MagicMock()
-        mock_array = MagicMock()
-        mock_array.tolist.return_value = [[0.1, 0.2, 0.3]]
-        mock_array.shape = (1, 3)
-        mock_model.encode.return_value = mock_array
+        mock_model.encode.return_value = np.array([[0.1, 0.2, 0.3]], dtype=np.float32)
 
         with patch("app.processing.embedding._get_model", return_value=mock_model):
             result = embed_texts([None, 123, "valid text"])
 
-        assert isinstance(result, list)
+        assert isinstance(result, np.ndarray)
         assert len(result) == 1  # only "valid text" passes filter
 
     @patch("app.processing.embedding._get_model")
-    def test_returns_list_of_lists_on_success(self, mock_get_model):
-        """Should return list of float vectors."""
-        from app.processing.embedding import embed_texts
+    def test_returns_float32_array_on_success(self, mock_get_model):
+        """Should return an (N, D) float32 array of vectors."""
         import numpy as np
 
         mock_model = MagicMock()
-        fake_embeddings = MagicMock()
-        fake_embeddings.tolist.return_value = [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]
-        fake_embeddings.shape = (2, 3)
-        mock_model.encode.return_value = fake_embeddings
+        mock_model.encode.return_value = np.array(
+            [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]], dtype=np.float32
+        )
         mock_get_model.return_value = mock_model
 
         result = embed_texts(["text one", "text two"])
 
-        assert isinstance(result, list)
-        assert len(result) == 2
-        assert result[0] == [0.1, 0.2, 0.3]
+        assert isinstance(result, np.ndarray)
+        assert result.dtype == np.float32
+        assert result.shape == (2, 3)
+        assert np.allclose(result[0], [0.1, 0.2, 0.3])
 
     @patch("app.processing.embedding._get_model")
     def test_calls_encode_with_normalize_true(self, mock_get_model):
         """Should always call encode with normalize_embeddings=True."""
-        from app.processing.embedding import embed_texts
+        import numpy as np
 
         mock_model = MagicMock()
-        fake_embeddings = MagicMock()
-        fake_embeddings.tolist.return_value = [[0.1]]
-        fake_embeddings.shape = (1, 1)
-        mock_model.encode.return_value = fake_embeddings
+        mock_model.encode.return_value = np.array([[0.1]], dtype=np.float32)
         mock_get_model.return_value = mock_model
 
         embed_texts(["sample text"])
@@ -1429,13 +1368,10 @@ class TestEmbedTexts:
     @patch("app.processing.embedding._get_model")
     def test_passes_correct_batch_size(self, mock_get_model):
         """Should pass settings.EMBEDDING_BATCH_SIZE to encode."""
-        from app.processing.embedding import embed_texts
+        import numpy as np
 
         mock_model = MagicMock()
-        fake_embeddings = MagicMock()
-        fake_embeddings.tolist.return_value = [[0.1]]
-        fake_embeddings.shape = (1, 1)
-        mock_model.encode.return_value = fake_embeddings
+        mock_model.encode.return_value = np.array([[0.1]], dtype=np.float32)
         mock_get_model.return_value = mock_model
 
         with patch("app.processing.embedding.settings") as mock_settings:
@@ -1449,19 +1385,31 @@ class TestEmbedTexts:
     @patch("app.processing.embedding._get_model")
     def test_output_length_matches_input_length(self, mock_get_model):
         """Number of embeddings must match number of input texts."""
-        from app.processing.embedding import embed_texts
+        import numpy as np
 
         mock_model = MagicMock()
-        fake_embeddings = MagicMock()
-        fake_embeddings.tolist.return_value = [[0.1], [0.2], [0.3]]
-        fake_embeddings.shape = (3, 1)
-        mock_model.encode.return_value = fake_embeddings
+        mock_model.encode.return_value = np.array([[0.1], [0.2], [0.3]], dtype=np.float32)
         mock_get_model.return_value = mock_model
 
         result = embed_texts(["a", "b", "c"])
 
         assert len(result) == 3
 
+    @patch("app.processing.embedding._get_model")
+    def test_repeated_text_served_from_cache(self, mock_get_model):
+        """A second call with the same text must not re-encode."""
+        import numpy as np
+
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([[0.1, 0.2]], dtype=np.float32)
+        mock_get_model.return_value = mock_model
+
+        first = embed_texts(["same text"])
+        second = embed_texts(["same text"])
+
+        assert np.allclose(first, second)
+        assert mock_model.encode.call_count == 1
+
 
 class TestGetEmbeddingModel:
     """Tests for _get_model() lazy loading."""
@@ -1505,6 +1453,59 @@ class TestGetEmbeddingModel:
             emb_module._model = original_model
 
 
+class TestOnnxEncoder:
+    """Tests for the ONNX backend's pooling parity with the torch path."""
+
+    @staticmethod
+    def _make_encoder(hidden, attention_mask):
+        """OnnxEncoder over stub model/tokenizer returning fixed tensors."""
+        import numpy as np
+
+        from app.processing.embedding_onnx import OnnxEncoder
+
+        tokenizer = MagicMock(return_value={
+            "input_ids": np.zeros(attention_mask.shape, dtype=np.int64),
+            "attention_mask": attention_mask,
+        })
+        model = MagicMock(return_value=types.SimpleNamespace(last_hidden_state=hidden))
+        return OnnxEncoder(model, tokenizer)
+
+    def test_pools_cls_token_like_torch_backend(self):
+        """
+        BAAI/bge-m3 uses CLS-token pooling in its sentence-transformers
+        config; the ONNX path must pool the same way or its query
+        vectors live in a different space than the torch-written points.
+        The hidden states are built so CLS and mean pooling disagree.
+        """
+        import numpy as np
+
+        hidden = np.array([
+            [[1.0, 0.0], [0.0, 1.0], [0.0, 1.0]],
+            [[0.0, 2.0], [2.0, 0.0], [2.0, 0.0]],
+        ], dtype=np.float32)
+        mask = np.ones((2, 3), dtype=np.int64)
+
+        encoder = self._make_encoder(hidden, mask)
+        result = encoder.encode(["first", "second"])
+
+        # What SentenceTransformer produces for CLS pooling: the first
+        # token's hidden state, L2-normalized.
+        cls = hidden[:, 0]
+        expected = cls / np.linalg.norm(cls, axis=1, keepdims=True)
+        assert np.allclose(result, expected)
+
+    def test_unnormalized_output_is_raw_cls_row(self):
+        import numpy as np
+
+        hidden = np.array([[[3.0, 4.0], [9.0, 9.0]]], dtype=np.float32)
+        mask = np.ones((1, 2), dtype=np.int64)
+
+        encoder = self._make_encoder(hidden, mask)
+        result = encoder.encode(["text"], normalize_embeddings=False)
+
+        assert np.allclose(result, [[3.0, 4.0]])
+
+
 # ===========================================================================
 # SECTION 10 — entity_extractor.py
 # ===========================================================================
@@ -1513,15 +1514,11 @@ class TestEmptyResult:
     """Tests for _empty_result()"""
 
     def test_returns_dict_with_four_keys(self):
-        from app.processing.entity_extractor import _empty_result
-
         result = _empty_result()
 
         assert set(result.keys()) == {"drugs", "conditions", "biomarkers", "symptoms"}
 
     def test_all_values_are_empty_lists(self):
-        from app.processing.entity_extractor import _empty_result
-
         result = _empty_result()
 
         for key, val in result.items():
@@ -1529,8 +1526,6 @@ class TestEmptyResult:
 
     def test_returns_independent_instances(self):
         """Each call should return a fresh dict to avoid shared mutation."""
-        from app.processing.entity_extractor import _empty_result
-
         r1 = _empty_result()
         r2 = _empty_result()
         r1["drugs"].append("metformin")
@@ -1542,30 +1537,22 @@ class TestExtractMedicalEntities:
     """Tests for extract_medical_entities()"""
 
     def test_returns_empty_result_for_none(self):
-        from app.processing.entity_extractor import extract_medical_entities
-
         result = extract_medical_entities(None)
 
         assert result == {"drugs": [], "conditions": [], "biomarkers": [], "symptoms": []}
 
     def test_returns_empty_result_for_empty_string(self):
-        from app.processing.entity_extractor import extract_medical_entities
-
         result = extract_medical_entities("")
 
         assert result["drugs"] == []
         assert result["conditions"] == []
 
     def test_returns_empty_result_for_non_string(self):
-        from app.processing.entity_extractor import extract_medical_entities
-
         assert extract_medical_entities(42)["drugs"] == []
         assert extract_medical_entities(["text"])["drugs"] == []
 
     @patch("app.processing.entity_extractor._get_model")
     def test_extracts_drugs_correctly(self, mock_get_model):
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = [
             {"text": "Metformin", "label": "drug"},
@@ -1580,8 +1567,6 @@ class TestExtractMedicalEntities:
 
     @patch("app.processing.entity_extractor._get_model")
     def test_extracts_conditions_correctly(self, mock_get_model):
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = [
             {"text": "Type 2 Diabetes", "label": "medical condition"},
@@ -1595,8 +1580,6 @@ class TestExtractMedicalEntities:
     @patch("app.processing.entity_extractor._get_model")
     def test_deduplicates_entities(self, mock_get_model):
         """Same entity appearing twice should only be stored once."""
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = [
             {"text": "Aspirin", "label": "drug"},
@@ -1610,8 +1593,6 @@ class TestExtractMedicalEntities:
 
     @patch("app.processing.entity_extractor._get_model")
     def test_normalizes_entity_text_to_lowercase(self, mock_get_model):
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = [
             {"text": "METFORMIN", "label": "drug"},
@@ -1625,8 +1606,6 @@ class TestExtractMedicalEntities:
 
     @patch("app.processing.entity_extractor._get_model")
     def test_skips_entity_with_empty_text(self, mock_get_model):
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = [
             {"text": "", "label": "drug"},
@@ -1641,8 +1620,6 @@ class TestExtractMedicalEntities:
     @patch("app.processing.entity_extractor._get_model")
     def test_returns_empty_result_on_inference_exception(self, mock_get_model):
         """Should return empty result dict and not raise on NER failure."""
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.side_effect = RuntimeError("CUDA OOM")
         mock_get_model.return_value = mock_model
@@ -1653,8 +1630,6 @@ class TestExtractMedicalEntities:
 
     @patch("app.processing.entity_extractor._get_model")
     def test_extracts_multiple_entity_types_simultaneously(self, mock_get_model):
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = [
             {"text": "Metformin", "label": "drug"},
@@ -1674,8 +1649,6 @@ class TestExtractMedicalEntities:
     @patch("app.processing.entity_extractor._get_model")
     def test_ignores_unknown_labels(self, mock_get_model):
         """Entities with unknown labels should be silently ignored."""
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = [
             {"text": "something", "label": "unknown_label"},
@@ -1692,8 +1665,6 @@ class TestExtractMedicalEntities:
     @patch("app.processing.entity_extractor._get_model")
     def test_passes_settings_labels_to_model(self, mock_get_model):
         """Should use settings.NER_LABELS and NER_CONFIDENCE_THRESHOLD."""
-        from app.processing.entity_extractor import extract_medical_entities
-
         mock_model = MagicMock()
         mock_model.predict_entities.return_value = []
         mock_get_model.return_value = mock_model
@@ -1714,9 +1685,13 @@ class TestExtractMedicalEntities:
 class TestGetNerDevice:
     """Tests for _get_device()"""
 
-    def test_uses_settings_ner_device_when_set(self):
-        from app.processing.entity_extractor import _get_device
+    @pytest.fixture(autouse=True)
+    def _fresh_device_cache(self):
+        _get_device.cache_clear()
+        yield
+        _get_device.cache_clear()
 
+    def test_uses_settings_ner_device_when_set(self):
         with patch("app.processing.entity_extractor.settings") as mock_settings:
             mock_settings.NER_DEVICE = "cpu"
             result = _get_device()
@@ -1724,8 +1699,6 @@ class TestGetNerDevice:
         assert result == "cpu"
 
     def test_falls_back_to_cuda_when_available(self):
-        from app.processing.entity_extractor import _get_device
-
         with patch("app.processing.entity_extractor.settings") as mock_settings:
             mock_settings.NER_DEVICE = None
             with patch("app.processing.entity_extractor.torch.cuda.is_available", return_value=True):
@@ -1734,8 +1707,6 @@ class TestGetNerDevice:
         assert result == "cuda"
 
     def test_falls_back_to_cpu_when_cuda_unavailable(self):
-        from app.processing.entity_extractor import _get_device
-
         with patch("app.processing.entity_extractor.settings") as mock_settings:
             mock_settings.NER_DEVICE = None
             with patch("app.processing.entity_extractor.torch.cuda.is_available", return_value=False):
@@ -1793,35 +1764,25 @@ class TestStripMarkdown:
     """Tests for _strip_markdown()"""
 
     def test_removes_bold_markers(self):
-        from app.rag.claim_extractor import _strip_markdown
-
         result = _strip_markdown("**Bold Text** is here")
         assert "**" not in result
         assert "Bold Text" in result
 
     def test_removes_italic_markers(self):
-        from app.rag.claim_extractor import _strip_markdown
-
         result = _strip_markdown("*italic text* here")
         assert "*" not in result
         assert "italic text" in result
 
     def test_removes_inline_code(self):
-        from app.rag.claim_extractor import _strip_markdown
-
         result = _strip_markdown("`code block`")
         assert "`" not in result
         assert "code block" in result
 
     def test_preserves_plain_text(self):
-        from app.rag.claim_extractor import _strip_markdown
-
         text = "Normal sentence without markdown."
         assert _strip_markdown(text) == text
 
     def test_handles_empty_string(self):
-        from app.rag.claim_extractor import _strip_markdown
-
         assert _strip_markdown("") == ""
 
 
@@ -1829,22 +1790,16 @@ class TestExtractClaims:
     """Tests for extract_claims() — main entry point."""
 
     def test_returns_empty_list_for_empty_input(self):
-        from app.rag.claim_extractor import extract_claims
-
         assert extract_claims("") == []
         assert extract_claims(None) == []
 
     def test_returns_list_of_dicts(self):
-        from app.rag.claim_extractor import extract_claims
-
         result = extract_claims("- RISK: High bleeding risk with aspirin.")
         assert isinstance(result, list)
         assert all(isinstance(c, dict) for c in result)
 
     def test_dash_based_extraction(self):
         """Should extract RISK/MONITORING/WARNING/RECOMMENDATION typed claims."""
-        from app.rag.claim_extractor import extract_claims
-
         text = (
             "- RISK: Metformin raises lactic acidosis risk.\n"
             "- MONITORING: Monitor blood glucose weekly.\n"
@@ -1858,15 +1813,11 @@ class TestExtractClaims:
         assert "warning" in types
 
     def test_dash_based_unknown_type_maps_to_general(self):
-        from app.rag.claim_extractor import extract_claims
-
         result = extract_claims("- UNKNOWN_TYPE: Some statement here.")
         assert result[0]["type"] == "general"
 
     def test_fallback_produces_general_type(self):
         """Plain prose without structure should fall back to sentence extraction."""
-        from app.rag.claim_extractor import extract_claims
-
         text = "This is a plain sentence about diabetes management."
         result = extract_claims(text)
 
@@ -1874,8 +1825,6 @@ class TestExtractClaims:
         assert result[0]["statement"]
 
     def test_all_claims_have_type_and_statement_keys(self):
-        from app.rag.claim_extractor import extract_claims
-
         result = extract_claims("- RISK: Something dangerous can happen here.")
         for claim in result:
             assert "type" in claim
@@ -1883,8 +1832,6 @@ class TestExtractClaims:
 
     def test_bold_section_extraction(self):
         """Should handle inline bold-style section headers after stripping."""
-        from app.rag.claim_extractor import extract_claims
-
         text = (
             "**Key Considerations:** Monitor your blood pressure carefully. "
             "**What to Monitor:** Check glucose levels every morning."
@@ -1895,8 +1842,6 @@ class TestExtractClaims:
 
     def test_markdown_header_extraction(self):
         """Should extract claims from ## header-based structure."""
-        from app.rag.claim_extractor import extract_claims
-
         text = (
             "## Risk Factors\n"
             "- High blood pressure is dangerous.\n"
@@ -1910,8 +1855,6 @@ class TestExtractClaims:
 
     def test_final_fallback_returns_at_least_one_claim(self):
         """Even completely unstructured text should produce at least 1 claim."""
-        from app.rag.claim_extractor import extract_claims
-
         result = extract_claims("Unstructured blurb with no formatting whatsoever.")
         assert len(result) >= 1
 
@@ -1920,32 +1863,22 @@ class TestClassifySentence:
     """Tests for _classify_sentence()"""
 
     def test_classifies_risk_keywords(self):
-        from app.rag.claim_extractor import _classify_sentence
-
         assert _classify_sentence("This can cause serious bleeding.") == "risk"
         assert _classify_sentence("Avoid this drug with alcohol.") == "risk"
 
     def test_classifies_monitoring_keywords(self):
-        from app.rag.claim_extractor import _classify_sentence
-
         assert _classify_sentence("Monitor your blood pressure daily.") == "monitoring"
         assert _classify_sentence("Track glucose levels carefully.") == "monitoring"
 
     def test_classifies_warning_keywords(self):
-        from app.rag.claim_extractor import _classify_sentence
-
         assert _classify_sentence("Seek emergency help immediately.") == "warning"
         assert _classify_sentence("Call your doctor urgently.") == "warning"
 
     def test_classifies_recommendation_keywords(self):
-        from app.rag.claim_extractor import _classify_sentence
-
         assert _classify_sentence("It is recommended to take this daily.") == "recommendation"
         assert _classify_sentence("You should maintain a healthy diet.") == "recommendation"
 
     def test_returns_general_for_no_keywords(self):
-        from app.rag.claim_extractor import _classify_sentence
-
         assert _classify_sentence("The patient was seen on Tuesday.") == "general"
 
 
@@ -1953,23 +1886,18 @@ class TestMapSectionToType:
     """Tests for _map_section_to_type()"""
 
     def test_risk_section(self):
-        from app.rag.claim_extractor import _map_section_to_type
         assert _map_section_to_type("Risk Factors") == "risk"
 
     def test_monitoring_section(self):
-        from app.rag.claim_extractor import _map_section_to_type
         assert _map_section_to_type("What to Watch") == "monitoring"
 
     def test_warning_section(self):
-        from app.rag.claim_extractor import _map_section_to_type
         assert _map_section_to_type("When to Seek Help") == "warning"
 
     def test_recommendation_section(self):
-        from app.rag.claim_extractor import _map_section_to_type
         assert _map_section_to_type("Safety Notes") == "recommendation"
 
     def test_unknown_section_returns_general(self):
-        from app.rag.claim_extractor import _map_section_to_type
         assert _map_section_to_type("Introduction") == "general"
 
 
@@ -1977,35 +1905,25 @@ class TestExtractBulletPoints:
     """Tests for _extract_bullet_points()"""
 
     def test_extracts_dash_bullets(self):
-        from app.rag.claim_extractor import _extract_bullet_points
-
         text = "- First item\n- Second item"
         result = _extract_bullet_points(text)
         assert "First item" in result
         assert "Second item" in result
 
     def test_extracts_asterisk_bullets(self):
-        from app.rag.claim_extractor import _extract_bullet_points
-
         result = _extract_bullet_points("* Item one\n* Item two")
         assert len(result) == 2
 
     def test_extracts_numbered_list(self):
-        from app.rag.claim_extractor import _extract_bullet_points
-
         result = _extract_bullet_points("1. First\n2. Second")
         assert "First" in result
         assert "Second" in result
 
     def test_skips_empty_lines(self):
-        from app.rag.claim_extractor import _extract_bullet_points
-
         result = _extract_bullet_points("\n\n- Item\n\n")
         assert len(result) == 1
 
     def test_returns_empty_for_plain_text(self):
-        from app.rag.claim_extractor import _extract_bullet_points
-
         result = _extract_bullet_points("No bullets here at all.")
         assert result == []
 
@@ -2014,8 +1932,6 @@ class TestSplitByHeaders:
     """Tests for _split_by_headers()"""
 
     def test_splits_on_double_hash(self):
-        from app.rag.claim_extractor import _split_by_headers
-
         text = "## Risks\nContent A\n## Monitoring\nContent B"
         result = _split_by_headers(text)
 
@@ -2023,16 +1939,12 @@ class TestSplitByHeaders:
         assert "monitoring" in result
 
     def test_content_is_captured_under_header(self):
-        from app.rag.claim_extractor import _split_by_headers
-
         text = "## Risks\nContent A\nMore content"
         result = _split_by_headers(text)
 
         assert "Content A" in result.get("risks", "")
 
     def test_returns_empty_dict_for_no_headers(self):
-        from app.rag.claim_extractor import _split_by_headers
-
         result = _split_by_headers("No headers here.")
         assert result == {} or "unknown" in result
 
@@ -2041,23 +1953,17 @@ class TestExtractSmartSentences:
     """Tests for _extract_smart_sentences()"""
 
     def test_returns_up_to_15_claims(self):
-        from app.rag.claim_extractor import _extract_smart_sentences
-
         text = "This is a valid sentence about health. " * 20
         result = _extract_smart_sentences(text)
 
         assert len(result) <= 15
 
     def test_skips_very_short_sentences(self):
-        from app.rag.claim_extractor import _extract_smart_sentences
-
         result = _extract_smart_sentences("Hi. Ok. Yes. No. This sentence is long enough to be included.")
         statements = [c["statement"] for c in result]
         assert not any(s in ["Hi", "Ok", "Yes", "No"] for s in statements)
 
     def test_all_claims_have_type_and_statement(self):
-        from app.rag.claim_extractor import _extract_smart_sentences
-
         result = _extract_smart_sentences("Monitor your blood pressure every day for best results.")
         for c in result:
             assert "type" in c
@@ -2070,40 +1976,31 @@ class TestExtractSmartSentences:
 
 class TestNormalize:
     def test_lowercases_text(self):
-        from app.rag.fact_checker import _normalize
         assert _normalize("METFORMIN") == "metformin"
 
     def test_handles_none(self):
-        from app.rag.fact_checker import _normalize
         assert _normalize(None) == ""
 
     def test_handles_empty_string(self):
-        from app.rag.fact_checker import _normalize
         assert _normalize("") == ""
 
 
 class TestMatchAny:
     def test_returns_true_when_token_found(self):
-        from app.rag.fact_checker import _match_any
         assert _match_any(["metformin", "aspirin"], "The patient takes metformin.") is True
 
     def test_returns_false_when_no_token_found(self):
-        from app.rag.fact_checker import _match_any
         assert _match_any(["lisinopril"], "Patient takes aspirin.") is False
 
     def test_returns_false_for_empty_token_list(self):
-        from app.rag.fact_checker import _match_any
         assert _match_any([], "Patient takes aspirin.") is False
 
     def test_skips_empty_tokens(self):
-        from app.rag.fact_checker import _match_any
         assert _match_any(["", None, "aspirin"], "Patient takes aspirin.") is True
 
 
 class TestPatientMedNames:
     def test_extracts_medication_names(self):
-        from app.rag.fact_checker import _patient_med_names
-
         context = {
             "patient": {
                 "medications": [
@@ -2117,20 +2014,15 @@ class TestPatientMedNames:
         assert "aspirin" in result
 
     def test_returns_empty_for_missing_patient(self):
-        from app.rag.fact_checker import _patient_med_names
         assert _patient_med_names({}) == []
 
     def test_skips_meds_without_name(self):
-        from app.rag.fact_checker import _patient_med_names
-
         context = {"patient": {"medications": [{"dosage": "10mg"}]}}
         assert _patient_med_names(context) == []
 
 
 class TestPatientConditions:
     def test_extracts_condition_names(self):
-        from app.rag.fact_checker import _patient_conditions
-
         context = {
             "patient": {
                 "conditions": [
@@ -2144,14 +2036,11 @@ class TestPatientConditions:
         assert "hypertension" in result
 
     def test_returns_empty_for_empty_context(self):
-        from app.rag.fact_checker import _patient_conditions
         assert _patient_conditions({}) == []
 
 
 class TestPapersEvidence:
     def test_matches_paper_by_title_keyword(self):
-        from app.rag.fact_checker import _papers_evidence
-
         context = {
             "papers": [
                 {
@@ -2166,8 +2055,6 @@ class TestPapersEvidence:
         assert hits[0]["type"] == "paper"
 
     def test_returns_empty_when_no_match(self):
-        from app.rag.fact_checker import _papers_evidence
-
         context = {
             "papers": [
                 {"pmid": "999", "title": "Kidney disease study", "text_preview": "CKD research."}
@@ -2178,8 +2065,6 @@ class TestPapersEvidence:
         assert isinstance(hits, list)
 
     def test_returns_empty_for_no_papers(self):
-        from app.rag.fact_checker import _papers_evidence
-
         hits = _papers_evidence({"papers": []}, "metformin")
         assert hits == []
 
@@ -2188,8 +2073,6 @@ class TestVerifyClaim:
     """Tests for verify_claim()"""
 
     def test_verified_true_when_medication_matches(self):
-        from app.rag.fact_checker import verify_claim
-
         claim = {"type": "risk", "statement": "metformin may cause lactic acidosis."}
         context = {
             "patient": {"medications": [{"name": "Metformin"}], "conditions": []},
@@ -2202,8 +2085,6 @@ class TestVerifyClaim:
         assert result["statement"] == claim["statement"]
 
     def test_verified_true_when_condition_matches(self):
-        from app.rag.fact_checker import verify_claim
-
         # "diabetes" appears in "type 2 diabetes" — _match_any does substring match
         claim = {"type": "general", "statement": "type 2 diabetes requires careful monitoring."}
         context = {
@@ -2218,8 +2099,6 @@ class TestVerifyClaim:
         assert result["verified"] is True
 
     def test_verified_false_when_no_match(self):
-        from app.rag.fact_checker import verify_claim
-
         claim = {"type": "general", "statement": "xyz completely unrelated nonsense statement."}
         context = {
             "patient": {
@@ -2234,8 +2113,6 @@ class TestVerifyClaim:
         assert result["sources"] == []
 
     def test_result_always_has_required_keys(self):
-        from app.rag.fact_checker import verify_claim
-
         claim = {"type": "risk", "statement": "test statement."}
         result = verify_claim(claim, {})
 
@@ -2243,8 +2120,6 @@ class TestVerifyClaim:
             assert key in result
 
     def test_sources_include_kg_type_for_med_match(self):
-        from app.rag.fact_checker import verify_claim
-
         claim = {"type": "risk", "statement": "aspirin increases bleeding risk."}
         context = {
             "patient": {"medications": [{"name": "Aspirin"}], "conditions": []},
@@ -2260,14 +2135,10 @@ class TestVerifyClaims:
     """Tests for verify_claims()"""
 
     def test_returns_empty_list_for_no_claims(self):
-        from app.rag.fact_checker import verify_claims
-
         assert verify_claims([], {}) == []
         assert verify_claims(None, {}) == []
 
     def test_processes_list_of_claim_dicts(self):
-        from app.rag.fact_checker import verify_claims
-
         claims = [
             {"type": "risk", "statement": "metformin causes lactic acidosis."},
         ]
@@ -2282,14 +2153,10 @@ class TestVerifyClaims:
 
     def test_handles_string_input_by_extracting_claims(self):
         """If a raw string is passed, should auto-extract claims first."""
-        from app.rag.fact_checker import verify_claims
-
         result = verify_claims("- RISK: Monitor blood pressure carefully.", {})
         assert isinstance(result, list)
 
     def test_exception_in_single_claim_does_not_break_others(self):
-        from app.rag.fact_checker import verify_claims
-
         # Malformed claim dict (missing keys) should not crash full list
         claims = [
             {},  # malformed
@@ -2305,8 +2172,6 @@ class TestVerifyClaims:
         assert result[0]["verified"] is False  # malformed → False
 
     def test_all_results_have_verified_key(self):
-        from app.rag.fact_checker import verify_claims
-
         claims = [{"type": "general", "statement": "some health claim."}]
         result = verify_claims(claims, {})
 
@@ -2322,10 +2187,8 @@ class TestQdrantHybridSearch:
     """Tests for qdrant_hybrid_search()"""
 
     @patch("app.rag.qdrant_search.embed_texts")
-    @patch("app.rag.qdrant_search.requests.post")
+    @patch("app.rag.qdrant_search._SESSION.post")
     def test_returns_list_of_results(self, mock_post, mock_embed):
-        from app.rag.qdrant_search import qdrant_hybrid_search
-
         mock_embed.return_value = [[0.1, 0.2, 0.3]]
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -2356,10 +2219,8 @@ class TestQdrantHybridSearch:
         assert result[0]["score"] == 0.95
 
     @patch("app.rag.qdrant_search.embed_texts")
-    @patch("app.rag.qdrant_search.requests.post")
+    @patch("app.rag.qdrant_search._SESSION.post")
     def test_result_has_required_fields(self, mock_post, mock_embed):
-        from app.rag.qdrant_search import qdrant_hybrid_search
-
         mock_embed.return_value = [[0.1, 0.2]]
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -2386,10 +2247,8 @@ class TestQdrantHybridSearch:
         assert "entities" in result[0]
 
     @patch("app.rag.qdrant_search.embed_texts")
-    @patch("app.rag.qdrant_search.requests.post")
+    @patch("app.rag.qdrant_search._SESSION.post")
     def test_truncates_text_preview_to_500_chars(self, mock_post, mock_embed):
-        from app.rag.qdrant_search import qdrant_hybrid_search
-
         mock_embed.return_value = [[0.1]]
         mock_response = MagicMock()
         mock_response.json.return_value = {
@@ -2412,10 +2271,8 @@ class TestQdrantHybridSearch:
         assert len(result[0]["text_preview"]) <= 500
 
     @patch("app.rag.qdrant_search.embed_texts")
-    @patch("app.rag.qdrant_search.requests.post")
+    @patch("app.rag.qdrant_search._SESSION.post")
     def test_returns_empty_list_for_no_results(self, mock_post, mock_embed):
-        from app.rag.qdrant_search import qdrant_hybrid_search
-
         mock_embed.return_value = [[0.1]]
         mock_response = MagicMock()
         mock_response.json.return_value = {"result": []}
@@ -2426,11 +2283,9 @@ class TestQdrantHybridSearch:
         assert result == []
 
     @patch("app.rag.qdrant_search.embed_texts")
-    @patch("app.rag.qdrant_search.requests.post")
+    @patch("app.rag.qdrant_search._SESSION.post")
     def test_combines_context_entities_into_query(self, mock_post, mock_embed):
         """Should merge conditions + drugs + expanded_entities into query text."""
-        from app.rag.qdrant_search import qdrant_hybrid_search
-
         mock_embed.return_value = [[0.1]]
         mock_response = MagicMock()
         mock_response.json.return_value = {"result": []}
@@ -2447,10 +2302,95 @@ class TestQdrantHybridSearch:
         assert "metformin" in embedded_text
 
     @patch("app.rag.qdrant_search.embed_texts")
-    @patch("app.rag.qdrant_search.requests.post", side_effect=Exception("Qdrant unreachable"))
-    def test_raises_on_connection_error(self, mock_post, mock_embed):
-        from app.rag.qdrant_search import qdrant_hybrid_search
+    @patch("app.rag.qdrant_search._SESSION.post")
+    def test_context_entities_become_payload_filter(self, mock_post, mock_embed):
+        mock_embed.return_value = [[0.1]]
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"result": []}
+        mock_post.return_value = mock_response
+
+        qdrant_hybrid_search(
+            question="test question",
+            user_context={"conditions": ["diabetes"], "drugs": ["metformin"]},
+            expanded_entities={},
+        )
+
+        body = mock_post.call_args_list[0][1]["json"]
+        assert body["filter"] == {
+            "should": [
+                {"key": "entities.drugs", "match": {"any": ["metformin"]}},
+                {"key": "entities.conditions", "match": {"any": ["diabetes"]}},
+            ]
+        }
+
+    @patch("app.rag.qdrant_search.embed_texts")
+    @patch("app.rag.qdrant_search._SESSION.post")
+    def test_filter_values_case_folded_to_match_ingest(self, mock_post, mock_embed):
+        """Profiles store display casing; ingest lowercases entities."""
+        mock_embed.return_value = [[0.1]]
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"result": []}
+        mock_post.return_value = mock_response
+
+        qdrant_hybrid_search(
+            question="test question",
+            user_context={"conditions": ["Type 2 Diabetes"], "drugs": ["Metformin"]},
+            expanded_entities={},
+        )
+
+        body = mock_post.call_args_list[0][1]["json"]
+        assert body["filter"] == {
+            "should": [
+                {"key": "entities.drugs", "match": {"any": ["metformin"]}},
+                {"key": "entities.conditions", "match": {"any": ["type 2 diabetes"]}},
+            ]
+        }
 
+    @patch("app.rag.qdrant_search.embed_texts")
+    @patch("app.rag.qdrant_search._SESSION.post")
+    def test_falls_back_to_unfiltered_search_on_empty_results(self, mock_post, mock_embed):
+        """A hard should-filter matching nothing must not mean zero hits."""
+        mock_embed.return_value = [[0.1]]
+
+        empty = MagicMock()
+        empty.json.return_value = {"result": []}
+        unfiltered = MagicMock()
+        unfiltered.json.return_value = {
+            "result": [{"score": 0.6, "payload": {"pmid": "PMC1", "title": "Study"}}]
+        }
+        mock_post.side_effect = [empty, unfiltered]
+
+        result = qdrant_hybrid_search(
+            question="question",
+            user_context={"conditions": ["Rare Condition"], "drugs": []},
+            expanded_entities={},
+        )
+
+        assert len(mock_post.call_args_list) == 2
+        assert "filter" not in mock_post.call_args_list[1][1]["json"]
+        assert result[0]["pmid"] == "PMC1"
+
+    @patch("app.rag.qdrant_search.embed_texts")
+    @patch("app.rag.qdrant_search._SESSION.post")
+    def test_no_filter_without_context_entities(self, mock_post, mock_embed):
+        mock_embed.return_value = [[0.1]]
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"result": []}
+        mock_post.return_value = mock_response
+
+        qdrant_hybrid_search("question", {}, {})
+
+        assert "filter" not in mock_post.call_args[1]["json"]
+
+    def test_context_filter_is_cached(self):
+        first = _context_filter(("metformin",), ("diabetes",))
+        second = _context_filter(("metformin",), ("diabetes",))
+
+        assert first is second
+
+    @patch("app.rag.qdrant_search.embed_texts")
+    @patch("app.rag.qdrant_search._SESSION.post", side_effect=Exception("Qdrant unreachable"))
+    def test_raises_on_connection_error(self, mock_post, mock_embed):
         mock_embed.return_value = [[0.1]]
 
         with pytest.raises(Exception):
@@ -2464,73 +2404,41 @@ class TestQdrantHybridSearch:
 class TestBuildMedicalPrompt:
     """Tests for build_medical_prompt()"""
 
-    def _base_context(self):
-        return {
-            "patient": {
-                "patient_id": "user_1",
-                "demographics": {"age": 52, "gender": "Male", "blood_type": "O+"},
-                "conditions": [{"name": "Type 2 Diabetes", "severity": "moderate", "status": "active"}],
-                "medications": [{"name": "Metformin", "dosage": "1000mg", "frequency": "twice daily", "purpose": "Blood sugar control"}],
-                "lab_results": [{"name": "HbA1c", "result": 7.2, "unit": "%", "normal_range": "< 5.7%", "status": "slightly elevated", "date": "2025-01-10"}],
-            },
-            "wearables": {"available": False, "metrics": []},
-            "papers": [],
-            "drug_interactions": {},
-        }
-
-    def test_returns_non_empty_string(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("What should I monitor?", self._base_context())
+    def test_returns_non_empty_string(self, base_medical_context):
+        result = build_medical_prompt("What should I monitor?", base_medical_context)
         assert isinstance(result, str)
         assert len(result) > 100
 
-    def test_contains_user_question(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("Is my blood sugar under control?", self._base_context())
+    def test_contains_user_question(self, base_medical_context):
+        result = build_medical_prompt("Is my blood sugar under control?", base_medical_context)
         assert "Is my blood sugar under control?" in result
 
-    def test_contains_patient_id(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("question", self._base_context())
+    def test_contains_patient_id(self, base_medical_context):
+        result = build_medical_prompt("question", base_medical_context)
         assert "user_1" in result
 
-    def test_contains_medication_names(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("question", self._base_context())
+    def test_contains_medication_names(self, base_medical_context):
+        result = build_medical_prompt("question", base_medical_context)
         assert "Metformin" in result
 
-    def test_contains_condition_names(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("question", self._base_context())
+    def test_contains_condition_names(self, base_medical_context):
+        result = build_medical_prompt("question", base_medical_context)
         assert "Type 2 Diabetes" in result
 
-    def test_contains_safety_rules_header(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("question", self._base_context())
+    def test_contains_safety_rules_header(self, base_medical_context):
+        result = build_medical_prompt("question", base_medical_context)
         assert "CRITICAL SAFETY RULES" in result
 
-    def test_contains_response_format_section(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("question", self._base_context())
+    def test_contains_response_format_section(self, base_medical_context):
+        result = build_medical_prompt("question", base_medical_context)
         assert "RESPONSE FORMAT" in result
 
-    def test_no_research_papers_message_when_empty(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("question", self._base_context())
+    def test_no_research_papers_message_when_empty(self, base_medical_context):
+        result = build_medical_prompt("question", base_medical_context)
         assert "No relevant research papers found" in result
 
-    def test_includes_papers_when_provided(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        context = self._base_context()
+    def test_includes_papers_when_provided(self, base_medical_context):
+        context = copy.deepcopy(dict(base_medical_context))
         context["papers"] = [
             {"title": "Diabetes Research 2024", "journal": "Lancet", "year": 2024, "text_preview": "HbA1c reduction..."}
         ]
@@ -2538,29 +2446,45 @@ class TestBuildMedicalPrompt:
         assert "Diabetes Research 2024" in result
 
     def test_handles_empty_context(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
         result = build_medical_prompt("question", {})
         assert isinstance(result, str)
         assert "No patient data available" in result
 
-    def test_ends_with_consult_disclaimer(self):
-        from app.rag.prompt_builder import build_medical_prompt
-
-        result = build_medical_prompt("question", self._base_context())
+    def test_ends_with_consult_disclaimer(self, base_medical_context):
+        result = build_medical_prompt("question", base_medical_context)
         assert "Consult your healthcare provider" in result
 
+    def test_prompt_contains_all_expected_fields(self, base_medical_context):
+        """Consolidated contains-check: one automaton scan of the prompt."""
+        import ahocorasick
+
+        expected = [
+            "user_1",
+            "Metformin",
+            "Type 2 Diabetes",
+            "CRITICAL SAFETY RULES",
+            "RESPONSE FORMAT",
+            "Consult your healthcare provider",
+            "No relevant research papers found",
+        ]
+        automaton = ahocorasick.Automaton()
+        for needle in expected:
+            automaton.add_word(needle, needle)
+        automaton.make_automaton()
+
+        result = build_medical_prompt("question", base_medical_context)
+        found = {needle for _, needle in automaton.iter(result)}
+
+        assert found == set(expected)
+
 
 class TestFormatPatient:
     """Tests for _format_patient()"""
 
     def test_returns_no_data_message_for_empty_dict(self):
-        from app.rag.prompt_builder import _format_patient
         assert "No patient data available" in _format_patient({})
 
     def test_formats_demographics(self):
-        from app.rag.prompt_builder import _format_patient
-
         patient = {
             "patient_id": "user_1",
             "demographics": {"age": 52, "gender": "Male", "blood_type": "O+"},
@@ -2572,8 +2496,6 @@ class TestFormatPatient:
         assert "O+" in result
 
     def test_formats_medications(self):
-        from app.rag.prompt_builder import _format_patient
-
         patient = {
             "patient_id": "u1",
             "demographics": {},
@@ -2586,8 +2508,6 @@ class TestFormatPatient:
         assert "81mg" in result
 
     def test_formats_lab_results(self):
-        from app.rag.prompt_builder import _format_patient
-
         patient = {
             "patient_id": "u1",
             "demographics": {},
@@ -2604,20 +2524,14 @@ class TestFormatWearables:
     """Tests for _format_wearables()"""
 
     def test_returns_no_data_when_unavailable(self):
-        from app.rag.prompt_builder import _format_wearables
-
-        result = _format_wearables({"available": False, "metrics": []})
+        result = prompt_builder._format_wearables({"available": False, "metrics": []})
         assert "No wearable data available" in result
 
     def test_returns_no_data_for_empty_dict(self):
-        from app.rag.prompt_builder import _format_wearables
-
-        result = _format_wearables({})
+        result = prompt_builder._format_wearables({})
         assert "No wearable data available" in result
 
     def test_formats_metric_with_readings(self):
-        from app.rag.prompt_builder import _format_wearables
-
         wearables = {
             "available": True,
             "metrics": [{
@@ -2630,14 +2544,12 @@ class TestFormatWearables:
                 "readings": [{"date": "2026-02-08", "value": "156 mg/dL"}]
             }]
         }
-        result = _format_wearables(wearables)
+        result = prompt_builder._format_wearables(wearables)
         assert "Blood Glucose" in result
         assert "156 mg/dL" in result
 
     def test_sanitizes_internal_labels_in_trend(self):
         """Trends with 'insufficient' or 'N/A' should be replaced."""
-        from app.rag.prompt_builder import _format_wearables
-
         wearables = {
             "available": True,
             "metrics": [{
@@ -2650,7 +2562,7 @@ class TestFormatWearables:
                 "readings": []
             }]
         }
-        result = _format_wearables(wearables)
+        result = prompt_builder._format_wearables(wearables)
         assert "insufficient" not in result
         assert "more readings needed" in result
 
@@ -2659,14 +2571,10 @@ class TestFormatDrugFacts:
     """Tests for _format_drug_facts()"""
 
     def test_returns_no_data_for_empty(self):
-        from app.rag.prompt_builder import _format_drug_facts
-
         assert "No medication safety data available" in _format_drug_facts({})
         assert "No medication safety data available" in _format_drug_facts(None)
 
     def test_formats_drug_drug_interaction(self):
-        from app.rag.prompt_builder import _format_drug_facts
-
         facts = {
             "drug_drug_interactions": [{
                 "drugs_involved": ["metformin", "contrast dye"],
@@ -2683,8 +2591,6 @@ class TestFormatDrugFacts:
         assert "high" in result
 
     def test_formats_drug_effect_facts(self):
-        from app.rag.prompt_builder import _format_drug_facts
-
         facts = {
             "drug_drug_interactions": [],
             "drug_condition_interactions": [],
@@ -2699,8 +2605,6 @@ class TestFormatDrugFacts:
         assert "B12" in result
 
     def test_returns_no_risks_when_all_lists_empty(self):
-        from app.rag.prompt_builder import _format_drug_facts
-
         facts = {
             "drug_drug_interactions": [],
             "drug_condition_interactions": [],
@@ -2714,14 +2618,10 @@ class TestFormatPapers:
     """Tests for _format_papers()"""
 
     def test_returns_no_papers_message_for_empty(self):
-        from app.rag.prompt_builder import _format_papers
-
         assert "No relevant research papers found" in _format_papers([])
         assert "No relevant research papers found" in _format_papers(None)
 
     def test_formats_paper_title_and_journal(self):
-        from app.rag.prompt_builder import _format_papers
-
         papers = [{"title": "Diabetes Study", "journal": "Lancet", "year": 2024, "text_preview": "HbA1c data..."}]
         result = _format_papers(papers)
         assert "Diabetes Study" in result
@@ -2729,8 +2629,6 @@ class TestFormatPapers:
         assert "2024" in result
 
     def test_limits_to_three_papers(self):
-        from app.rag.prompt_builder import _format_papers
-
         papers = [
             {"title": f"Study {i}", "journal": "Journal", "year": 2024, "text_preview": ""}
             for i in range(10)
@@ -2748,35 +2646,44 @@ class TestFormatPapers:
 class TestRunHybridRagPipeline:
     """Tests for run_hybrid_rag_pipeline()"""
 
-    def _make_mocks(self):
-        """Helper to return a consistent set of mock return values."""
-        patient_profile = {
-            "patient_id": "user_1",
-            "name": "John Doe",
-            "age": 52,
-            "gender": "Male",
-            "demographics": {"age": 52, "gender": "Male", "blood_type": "O+"},
-            "conditions": [{"name": "Type 2 Diabetes", "severity": "moderate", "status": "active"}],
-            "medications": [{"name": "Metformin", "dosage": "1000mg", "frequency": "twice daily"}],
-            "lab_results": [],
-            "wearables": {"available": False, "metrics": []},
-        }
-        return patient_profile
-
-    @patch("app.rag.graph_rag_pipeline.extract_claims", return_value=[{"type": "risk", "statement": "monitor glucose"}])
-    @patch("app.rag.graph_rag_pipeline.call_ollama", return_value="Monitor your glucose carefully.")
-    @patch("app.rag.graph_rag_pipeline.build_medical_prompt", return_value="Prompt text")
-    @patch("app.rag.graph_rag_pipeline.search_papers", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.check_drug_interactions", return_value={})
-    @patch("app.rag.graph_rag_pipeline.get_patient_profile")
-    @patch("app.rag.graph_rag_pipeline.upsert_user_from_question")
-    def test_returns_dict_with_required_keys(
-        self, mock_upsert, mock_profile, mock_drugs,
-        mock_papers, mock_prompt, mock_ollama, mock_claims
-    ):
-        from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
+    @pytest.fixture
+    def pipeline_mocks(self, monkeypatch, patient_profile_fixture):
+        """
+        Stub every pipeline collaborator through one monkeypatch pass.
 
-        mock_profile.return_value = self._make_mocks()
+        One fixture replaces the 7-deep @patch decorator stack each test
+        used to carry; plain Mock objects skip MagicMock's magic-method
+        population. The profile is a deepcopy because the pipeline pops
+        "wearables" out of the dict it receives.
+        """
+        from unittest.mock import Mock
+
+        from app.rag import graph_rag_pipeline
+
+        # The pipeline memoizes LLM responses on the prompt digest, and
+        # the stubbed prompt is identical across tests.
+        graph_rag_pipeline.clear_llm_cache()
+
+        ns = types.SimpleNamespace(
+            upsert=Mock(),
+            profile=Mock(return_value=copy.deepcopy(dict(patient_profile_fixture))),
+            drugs=Mock(return_value={}),
+            papers=Mock(return_value=[]),
+            prompt=Mock(return_value="prompt"),
+            ollama=Mock(return_value="LLM answer"),
+            claims=Mock(return_value=[]),
+        )
+        monkeypatch.setattr("app.rag.graph_rag_pipeline.upsert_user_from_question", ns.upsert)
+        monkeypatch.setattr("app.rag.graph_rag_pipeline.get_patient_profile", ns.profile)
+        monkeypatch.setattr("app.rag.graph_rag_pipeline.check_drug_interactions", ns.drugs)
+        monkeypatch.setattr("app.rag.graph_rag_pipeline.search_papers", ns.papers)
+        monkeypatch.setattr("app.rag.graph_rag_pipeline.build_medical_prompt", ns.prompt)
+        monkeypatch.setattr("app.rag.graph_rag_pipeline.call_ollama", ns.ollama)
+        monkeypatch.setattr("app.rag.graph_rag_pipeline.extract_claims", ns.claims)
+        return ns
+
+    def test_returns_dict_with_required_keys(self, pipeline_mocks):
+        pipeline_mocks.claims.return_value = [{"type": "risk", "statement": "monitor glucose"}]
 
         result = run_hybrid_rag_pipeline("user_1", "Is my blood sugar okay?")
 
@@ -2784,40 +2691,15 @@ class TestRunHybridRagPipeline:
         assert "claims" in result
         assert "context" in result
 
-    @patch("app.rag.graph_rag_pipeline.extract_claims", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.call_ollama", return_value="LLM response")
-    @patch("app.rag.graph_rag_pipeline.build_medical_prompt", return_value="Prompt")
-    @patch("app.rag.graph_rag_pipeline.search_papers", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.check_drug_interactions", return_value={})
-    @patch("app.rag.graph_rag_pipeline.get_patient_profile")
-    @patch("app.rag.graph_rag_pipeline.upsert_user_from_question")
-    def test_upserts_patient_before_profile_fetch(
-        self, mock_upsert, mock_profile, mock_drugs,
-        mock_papers, mock_prompt, mock_ollama, mock_claims
-    ):
-        from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
-
-        mock_profile.return_value = self._make_mocks()
-
+    def test_upserts_patient_before_profile_fetch(self, pipeline_mocks):
         run_hybrid_rag_pipeline("user_1", "question")
 
-        mock_upsert.assert_called_once_with("user_1", "question")
-        mock_profile.assert_called_once_with("user_1")
-
-    @patch("app.rag.graph_rag_pipeline.extract_claims", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.call_ollama", return_value="response")
-    @patch("app.rag.graph_rag_pipeline.build_medical_prompt", return_value="prompt")
-    @patch("app.rag.graph_rag_pipeline.search_papers", return_value=[{"title": "Paper 1"}])
-    @patch("app.rag.graph_rag_pipeline.check_drug_interactions", return_value={"drug_drug_interactions": []})
-    @patch("app.rag.graph_rag_pipeline.get_patient_profile")
-    @patch("app.rag.graph_rag_pipeline.upsert_user_from_question")
-    def test_context_contains_patient_wearables_papers_drugs(
-        self, mock_upsert, mock_profile, mock_drugs,
-        mock_papers, mock_prompt, mock_ollama, mock_claims
-    ):
-        from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
+        pipeline_mocks.upsert.assert_called_once_with("user_1", "question")
+        pipeline_mocks.profile.assert_called_once_with("user_1")
 
-        mock_profile.return_value = self._make_mocks()
+    def test_context_contains_patient_wearables_papers_drugs(self, pipeline_mocks):
+        pipeline_mocks.papers.return_value = [{"title": "Paper 1"}]
+        pipeline_mocks.drugs.return_value = {"drug_drug_interactions": []}
 
         result = run_hybrid_rag_pipeline("user_1", "question")
 
@@ -2827,83 +2709,31 @@ class TestRunHybridRagPipeline:
         assert "papers" in context
         assert "drug_interactions" in context
 
-    @patch("app.rag.graph_rag_pipeline.extract_claims", return_value=[{"type": "risk", "statement": "monitor"}])
-    @patch("app.rag.graph_rag_pipeline.call_ollama", return_value="LLM answer")
-    @patch("app.rag.graph_rag_pipeline.build_medical_prompt", return_value="prompt")
-    @patch("app.rag.graph_rag_pipeline.search_papers", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.check_drug_interactions", return_value={})
-    @patch("app.rag.graph_rag_pipeline.get_patient_profile")
-    @patch("app.rag.graph_rag_pipeline.upsert_user_from_question")
-    def test_response_is_llm_output(
-        self, mock_upsert, mock_profile, mock_drugs,
-        mock_papers, mock_prompt, mock_ollama, mock_claims
-    ):
-        from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
-
-        mock_profile.return_value = self._make_mocks()
-
+    def test_response_is_llm_output(self, pipeline_mocks):
         result = run_hybrid_rag_pipeline("user_1", "Is my BP okay?")
 
         assert result["response"] == "LLM answer"
 
-    @patch("app.rag.graph_rag_pipeline.extract_claims", return_value=[{"type": "general", "statement": "claim"}])
-    @patch("app.rag.graph_rag_pipeline.call_ollama", return_value="LLM answer")
-    @patch("app.rag.graph_rag_pipeline.build_medical_prompt", return_value="prompt")
-    @patch("app.rag.graph_rag_pipeline.search_papers", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.check_drug_interactions", return_value={})
-    @patch("app.rag.graph_rag_pipeline.get_patient_profile")
-    @patch("app.rag.graph_rag_pipeline.upsert_user_from_question")
-    def test_claims_are_extracted_from_llm_response(
-        self, mock_upsert, mock_profile, mock_drugs,
-        mock_papers, mock_prompt, mock_ollama, mock_claims
-    ):
-        from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
-
-        mock_profile.return_value = self._make_mocks()
+    def test_claims_are_extracted_from_llm_response(self, pipeline_mocks):
+        pipeline_mocks.claims.return_value = [{"type": "general", "statement": "claim"}]
 
         result = run_hybrid_rag_pipeline("user_1", "question")
 
         assert result["claims"] == [{"type": "general", "statement": "claim"}]
-        mock_claims.assert_called_once_with("LLM answer")
-
-    @patch("app.rag.graph_rag_pipeline.extract_claims", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.call_ollama", return_value="response")
-    @patch("app.rag.graph_rag_pipeline.build_medical_prompt", return_value="prompt")
-    @patch("app.rag.graph_rag_pipeline.search_papers", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.check_drug_interactions", return_value={})
-    @patch("app.rag.graph_rag_pipeline.get_patient_profile")
-    @patch("app.rag.graph_rag_pipeline.upsert_user_from_question")
-    def test_drug_interactions_called_with_patient_medications(
-        self, mock_upsert, mock_profile, mock_drugs,
-        mock_papers, mock_prompt, mock_ollama, mock_claims
-    ):
-        from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
+        pipeline_mocks.claims.assert_called_once_with("LLM answer")
 
-        profile = self._make_mocks()
-        mock_profile.return_value = profile
+    def test_drug_interactions_called_with_patient_medications(self, pipeline_mocks, patient_profile_fixture):
+        profile = copy.deepcopy(dict(patient_profile_fixture))
+        pipeline_mocks.profile.return_value = profile
 
         run_hybrid_rag_pipeline("user_1", "question")
 
-        mock_drugs.assert_called_once_with(
+        pipeline_mocks.drugs.assert_called_once_with(
             medications=profile["medications"]
         )
 
-    @patch("app.rag.graph_rag_pipeline.extract_claims", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.call_ollama", return_value="response")
-    @patch("app.rag.graph_rag_pipeline.build_medical_prompt", return_value="prompt")
-    @patch("app.rag.graph_rag_pipeline.search_papers", return_value=[])
-    @patch("app.rag.graph_rag_pipeline.check_drug_interactions", return_value={})
-    @patch("app.rag.graph_rag_pipeline.get_patient_profile")
-    @patch("app.rag.graph_rag_pipeline.upsert_user_from_question")
-    def test_wearables_popped_from_profile_into_context(
-        self, mock_upsert, mock_profile, mock_drugs,
-        mock_papers, mock_prompt, mock_ollama, mock_claims
-    ):
+    def test_wearables_popped_from_profile_into_context(self, pipeline_mocks):
         """Wearables should be moved from profile into top-level context."""
-        from app.rag.graph_rag_pipeline import run_hybrid_rag_pipeline
-
-        mock_profile.return_value = self._make_mocks()
-
         result = run_hybrid_rag_pipeline("user_1", "question")
 
         # Wearables should be in context, not nested inside patient
@@ -2919,22 +2749,16 @@ class TestEmptyEntityBlock:
     """Tests for _empty_entity_block()"""
 
     def test_returns_dict_with_four_keys(self):
-        from app.schema.schema_builder import _empty_entity_block
-
         result = _empty_entity_block()
         assert set(result.keys()) == {"drugs", "conditions", "biomarkers", "symptoms"}
 
     def test_all_values_are_empty_lists(self):
-        from app.schema.schema_builder import _empty_entity_block
-
         result = _empty_entity_block()
         for v in result.values():
             assert v == []
 
     def test_returns_independent_instances(self):
         """Mutation of one result must not affect another."""
-        from app.schema.schema_builder import _empty_entity_block
-
         r1 = _empty_entity_block()
         r2 = _empty_entity_block()
         r1["drugs"].append("metformin")
@@ -2945,142 +2769,142 @@ class TestEmptyEntityBlock:
 class TestBuildPayload:
     """Tests for build_payload()"""
 
-    def _base_kwargs(self):
-        return dict(
-            text="Sample chunk text.",
-            pmid="PMC12345",
-            title="Diabetes Study",
-            journal="Lancet",
-            year=2024,
-            authors=["Dr. A", "Dr. B"],
-            section="Full Text",
-            chunk_index=0,
-            api_query="type 2 diabetes",
-        )
-
-    def test_returns_dict(self):
-        from app.schema.schema_builder import build_payload
+    def test_returns_payload_dataclass(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs)
+        assert isinstance(result, PubmedPayload)
 
-        result = build_payload(**self._base_kwargs())
+    def test_to_dict_returns_dict(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs).to_dict()
         assert isinstance(result, dict)
 
-    def test_contains_all_required_fields(self):
-        from app.schema.schema_builder import build_payload
-
-        result = build_payload(**self._base_kwargs())
+    def test_contains_all_required_fields(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs).to_dict()
         required = [
             "schema_version", "source", "retrieved_at",
             "pmid", "title", "journal", "year", "authors",
             "section", "chunk_index", "api_query", "text",
-            "entities", "relations", "kg_node_ids",
-            "study_type", "confidence_level",
         ]
         for field in required:
             assert field in result, f"Missing field: {field}"
 
-    def test_pmid_stored_as_string(self):
-        from app.schema.schema_builder import build_payload
+    def test_empty_placeholders_omitted_from_dict(self, base_payload_kwargs):
+        """Empty NLP/KG blocks must not be stored on every chunk."""
+        result = build_payload(**base_payload_kwargs).to_dict()
+        for field in ["entities", "relations", "kg_node_ids", "study_type", "confidence_level"]:
+            assert field not in result, f"Placeholder stored: {field}"
 
-        result = build_payload(**{**self._base_kwargs(), "pmid": 12345})
-        assert result["pmid"] == "12345"
+    def test_pmid_stored_verbatim_as_string(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs).to_dict()
+        assert result["pmid"] == "PMC12345"
         assert isinstance(result["pmid"], str)
 
-    def test_year_stored_as_int(self):
-        from app.schema.schema_builder import build_payload
-
-        result = build_payload(**{**self._base_kwargs(), "year": "2024"})
+    def test_year_stored_verbatim_as_int(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs).to_dict()
         assert result["year"] == 2024
         assert isinstance(result["year"], int)
 
-    def test_chunk_index_stored_as_int(self):
-        from app.schema.schema_builder import build_payload
-
-        result = build_payload(**{**self._base_kwargs(), "chunk_index": "3"})
-        assert result["chunk_index"] == 3
-        assert isinstance(result["chunk_index"], int)
+    def test_rejects_untyped_pmid_in_debug(self, base_payload_kwargs):
+        """Type normalization happens at the fetcher boundary."""
+        with pytest.raises(AssertionError):
+            build_payload(**{**base_payload_kwargs, "pmid": 12345})
 
-    def test_entities_defaults_to_empty_block_when_none(self):
-        from app.schema.schema_builder import build_payload
+    def test_rejects_untyped_year_in_debug(self, base_payload_kwargs):
+        with pytest.raises(AssertionError):
+            build_payload(**{**base_payload_kwargs, "year": "2024"})
 
-        result = build_payload(**self._base_kwargs())
-        assert result["entities"] == {"drugs": [], "conditions": [], "biomarkers": [], "symptoms": []}
+    def test_rejects_untyped_chunk_index_in_debug(self, base_payload_kwargs):
+        with pytest.raises(AssertionError):
+            build_payload(**{**base_payload_kwargs, "chunk_index": "3"})
 
-    def test_entities_used_when_provided(self):
-        from app.schema.schema_builder import build_payload
+    def test_entities_defaults_to_empty_block_when_none(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs)
+        assert result.entities == {"drugs": [], "conditions": [], "biomarkers": [], "symptoms": []}
 
+    def test_entities_used_when_provided(self, base_payload_kwargs):
         entities = {"drugs": ["metformin"], "conditions": [], "biomarkers": [], "symptoms": []}
-        result = build_payload(**self._base_kwargs(), entities=entities)
+        result = build_payload(**base_payload_kwargs, entities=entities).to_dict()
         assert result["entities"]["drugs"] == ["metformin"]
 
-    def test_kg_node_ids_defaults_to_empty_block(self):
-        from app.schema.schema_builder import build_payload
-
-        result = build_payload(**self._base_kwargs())
-        assert result["kg_node_ids"] == {"drugs": [], "conditions": [], "biomarkers": [], "symptoms": []}
-
-    def test_source_is_pubmed_api(self):
-        from app.schema.schema_builder import build_payload
+    def test_kg_node_ids_defaults_to_empty_block(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs)
+        assert result.kg_node_ids == {"drugs": [], "conditions": [], "biomarkers": [], "symptoms": []}
 
-        result = build_payload(**self._base_kwargs())
+    def test_source_is_pubmed_api(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs).to_dict()
         assert result["source"] == "pubmed_api"
 
-    def test_schema_version_is_set(self):
-        from app.schema.schema_builder import build_payload
-
-        result = build_payload(**self._base_kwargs())
+    def test_schema_version_is_set(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs).to_dict()
         assert result["schema_version"] == "1.0"
 
-    def test_relations_is_empty_list(self):
-        from app.schema.schema_builder import build_payload
-
-        result = build_payload(**self._base_kwargs())
-        assert result["relations"] == []
+    def test_relations_is_empty_list(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs)
+        assert result.relations == []
 
-    def test_retrieved_at_is_iso_format(self):
-        from app.schema.schema_builder import build_payload
+    def test_retrieved_at_is_iso_format(self, base_payload_kwargs):
         from datetime import datetime
 
-        result = build_payload(**self._base_kwargs())
+        result = build_payload(**base_payload_kwargs).to_dict()
         # Should parse without error
         parsed = datetime.fromisoformat(result["retrieved_at"].replace("Z", "+00:00"))
         assert parsed is not None
 
-    def test_text_stored_verbatim(self):
-        from app.schema.schema_builder import build_payload
-
-        result = build_payload(**{**self._base_kwargs(), "text": "Verbatim chunk."})
+    def test_text_stored_verbatim(self, base_payload_kwargs):
+        result = build_payload(**{**base_payload_kwargs, "text": "Verbatim chunk."}).to_dict()
         assert result["text"] == "Verbatim chunk."
 
-    def test_authors_stored_as_list(self):
-        from app.schema.schema_builder import build_payload
+    def test_text_preview_truncated_to_500(self, base_payload_kwargs):
+        result = build_payload(**{**base_payload_kwargs, "text": "A" * 1000}).to_dict()
+        assert result["text_preview"] == "A" * 500
 
-        result = build_payload(**self._base_kwargs())
+    def test_authors_stored_as_list(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs).to_dict()
         assert isinstance(result["authors"], list)
         assert "Dr. A" in result["authors"]
 
-    def test_study_type_defaults_to_none(self):
-        from app.schema.schema_builder import build_payload
+    def test_study_type_defaults_to_none(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs)
+        assert result.study_type is None
 
-        result = build_payload(**self._base_kwargs())
-        assert result["study_type"] is None
+    def test_confidence_level_defaults_to_none(self, base_payload_kwargs):
+        result = build_payload(**base_payload_kwargs)
+        assert result.confidence_level is None
 
-    def test_confidence_level_defaults_to_none(self):
-        from app.schema.schema_builder import build_payload
 
-        result = build_payload(**self._base_kwargs())
-        assert result["confidence_level"] is None
+class TestContentPointId:
+    """Tests for content_point_id()"""
+
+    def test_same_input_yields_same_id(self):
+        first = content_point_id("PMC12345", 0, "Aspirin reduces risk.")
+        second = content_point_id("PMC12345", 0, "Aspirin reduces risk.")
+        assert first == second
+
+    def test_different_text_yields_different_id(self):
+        a = content_point_id("PMC12345", 0, "Aspirin reduces risk.")
+        b = content_point_id("PMC12345", 0, "Metformin lowers glucose.")
+        assert a != b
+
+    def test_different_chunk_index_yields_different_id(self):
+        a = content_point_id("PMC12345", 0, "Aspirin reduces risk.")
+        b = content_point_id("PMC12345", 1, "Aspirin reduces risk.")
+        assert a != b
+
+    def test_id_is_valid_uuid_string(self):
+        import uuid
+
+        result = content_point_id("PMC12345", 0, "Aspirin reduces risk.")
+        assert str(uuid.UUID(result)) == result
 
 
 # ===========================================================================
 # SECTION 17 — models.py (User)
 # ===========================================================================
 
+@pytest.mark.xdist_group("flask_app")
 class TestUserModel:
     """Tests for the User SQLAlchemy model."""
 
     def test_set_password_hashes_password(self):
-        from app.models import User
-
         user = User(username="testuser")
         user.set_password("securepassword")
 
@@ -3088,24 +2912,18 @@ class TestUserModel:
         assert user.password_hash != "securepassword"
 
     def test_check_password_returns_true_for_correct_password(self):
-        from app.models import User
-
         user = User(username="testuser")
         user.set_password("mypassword")
 
         assert user.check_password("mypassword") is True
 
     def test_check_password_returns_false_for_wrong_password(self):
-        from app.models import User
-
         user = User(username="testuser")
         user.set_password("correct")
 
         assert user.check_password("wrong") is False
 
     def test_check_password_returns_false_for_empty_password(self):
-        from app.models import User
-
         user = User(username="testuser")
         user.set_password("correct")
 
@@ -3113,8 +2931,6 @@ class TestUserModel:
 
     def test_default_role_is_patient(self, flask_app):
         """Role default is applied by SQLAlchemy on DB insert, not plain instantiation."""
-        from app.models import db, User
-
         with flask_app.app_context():
             user = User(username="roletest")
             user.set_password("pw")
@@ -3125,8 +2941,6 @@ class TestUserModel:
 
     def test_different_users_have_different_hashes(self):
         """Same password should produce different hashes (salting)."""
-        from app.models import User
-
         u1 = User(username="user1")
         u2 = User(username="user2")
         u1.set_password("samepassword")
@@ -3135,8 +2949,6 @@ class TestUserModel:
         assert u1.password_hash != u2.password_hash
 
     def test_username_stored_correctly(self):
-        from app.models import User
-
         user = User(username="john_doe")
         assert user.username == "john_doe"
 
@@ -3148,11 +2960,15 @@ class TestUserModel:
 class TestSearchPapers:
     """Tests for search_papers()"""
 
+    @pytest.fixture(autouse=True)
+    def _fresh_cache(self):
+        clear_search_cache()
+        yield
+        clear_search_cache()
+
     @patch("app.vector_store.paper_search.embed_texts")
     @patch("app.vector_store.paper_search.get_client")
     def test_returns_list_of_papers(self, mock_get_client, mock_embed):
-        from app.vector_store.paper_search import search_papers
-
         mock_embed.return_value = [[0.1, 0.2, 0.3]]
 
         mock_hit = MagicMock()
@@ -3181,8 +2997,6 @@ class TestSearchPapers:
     @patch("app.vector_store.paper_search.embed_texts")
     @patch("app.vector_store.paper_search.get_client")
     def test_result_has_required_fields(self, mock_get_client, mock_embed):
-        from app.vector_store.paper_search import search_papers
-
         mock_embed.return_value = [[0.1]]
         mock_hit = MagicMock()
         mock_hit.score = 0.85
@@ -3201,9 +3015,29 @@ class TestSearchPapers:
 
     @patch("app.vector_store.paper_search.embed_texts")
     @patch("app.vector_store.paper_search.get_client")
-    def test_text_preview_truncated_to_500(self, mock_get_client, mock_embed):
-        from app.vector_store.paper_search import search_papers
+    def test_entity_less_hits_get_independent_entity_blocks(self, mock_get_client, mock_embed):
+        """Mutating one result's entities must not leak into another."""
+        mock_embed.return_value = [[0.1]]
+
+        hits = []
+        for pmid in ("PMC1", "PMC2"):
+            hit = MagicMock()
+            hit.score = 0.8
+            hit.payload = {"pmid": pmid, "title": "Study", "text": "Content"}
+            hits.append(hit)
+
+        mock_response = MagicMock()
+        mock_response.points = hits
+        mock_get_client.return_value.query_points.return_value = mock_response
+
+        first, second = search_papers("query")
+        first["entities"]["drugs"].append("aspirin")
 
+        assert second["entities"]["drugs"] == []
+
+    @patch("app.vector_store.paper_search.embed_texts")
+    @patch("app.vector_store.paper_search.get_client")
+    def test_text_preview_truncated_to_500(self, mock_get_client, mock_embed):
         mock_embed.return_value = [[0.1]]
         mock_hit = MagicMock()
         mock_hit.score = 0.7
@@ -3219,9 +3053,23 @@ class TestSearchPapers:
 
     @patch("app.vector_store.paper_search.embed_texts")
     @patch("app.vector_store.paper_search.get_client")
-    def test_returns_empty_list_when_no_hits(self, mock_get_client, mock_embed):
-        from app.vector_store.paper_search import search_papers
+    def test_prefers_ingest_time_preview(self, mock_get_client, mock_embed):
+        mock_embed.return_value = [[0.1]]
+        mock_hit = MagicMock()
+        mock_hit.score = 0.7
+        mock_hit.payload = {"text_preview": "stored preview", "pmid": "1", "title": "T",
+                            "journal": "J", "year": 2024, "section": "S", "entities": {}}
+        mock_response = MagicMock()
+        mock_response.points = [mock_hit]
+        mock_get_client.return_value.query_points.return_value = mock_response
+
+        result = search_papers("query")
+
+        assert result[0]["text_preview"] == "stored preview"
 
+    @patch("app.vector_store.paper_search.embed_texts")
+    @patch("app.vector_store.paper_search.get_client")
+    def test_returns_empty_list_when_no_hits(self, mock_get_client, mock_embed):
         mock_embed.return_value = [[0.1]]
         mock_response = MagicMock()
         mock_response.points = []
@@ -3234,8 +3082,6 @@ class TestSearchPapers:
     @patch("app.vector_store.paper_search.embed_texts")
     @patch("app.vector_store.paper_search.get_client")
     def test_handles_none_text_gracefully(self, mock_get_client, mock_embed):
-        from app.vector_store.paper_search import search_papers
-
         mock_embed.return_value = [[0.1]]
         mock_hit = MagicMock()
         mock_hit.score = 0.5
@@ -3251,9 +3097,38 @@ class TestSearchPapers:
 
     @patch("app.vector_store.paper_search.embed_texts")
     @patch("app.vector_store.paper_search.get_client")
-    def test_passes_top_k_to_qdrant(self, mock_get_client, mock_embed):
-        from app.vector_store.paper_search import search_papers
+    def test_repeated_query_served_from_cache(self, mock_get_client, mock_embed):
+        mock_embed.return_value = [[0.3, 0.4]]
+        mock_hit = MagicMock()
+        mock_hit.score = 0.9
+        mock_hit.payload = {"pmid": "1", "title": "T", "journal": "J",
+                            "year": 2024, "section": "S", "text_preview": "P", "entities": {}}
+        mock_response = MagicMock()
+        mock_response.points = [mock_hit]
+        mock_get_client.return_value.query_points.return_value = mock_response
 
+        first = search_papers("repeat query")
+        second = search_papers("repeat query")
+
+        assert first == second
+        mock_get_client.return_value.query_points.assert_called_once()
+
+    @patch("app.vector_store.paper_search.embed_texts")
+    @patch("app.vector_store.paper_search.get_client")
+    def test_cache_miss_on_different_top_k(self, mock_get_client, mock_embed):
+        mock_embed.return_value = [[0.3, 0.4]]
+        mock_response = MagicMock()
+        mock_response.points = []
+        mock_get_client.return_value.query_points.return_value = mock_response
+
+        search_papers("repeat query", top_k=3)
+        search_papers("repeat query", top_k=5)
+
+        assert mock_get_client.return_value.query_points.call_count == 2
+
+    @patch("app.vector_store.paper_search.embed_texts")
+    @patch("app.vector_store.paper_search.get_client")
+    def test_passes_top_k_to_qdrant(self, mock_get_client, mock_embed):
         mock_embed.return_value = [[0.1]]
         mock_response = MagicMock()
         mock_response.points = []
@@ -3264,6 +3139,30 @@ class TestSearchPapers:
         call_kwargs = mock_get_client.return_value.query_points.call_args[1]
         assert call_kwargs.get("limit") == 7
 
+    @patch("app.vector_store.paper_search.embed_texts")
+    @patch("app.vector_store.paper_search.get_client")
+    def test_hnsw_ef_scales_with_top_k(self, mock_get_client, mock_embed):
+        """hnsw_ef should grow with top_k so recall holds for deep lists."""
+        mock_embed.return_value = [[0.1]]
+        mock_response = MagicMock()
+        mock_response.points = []
+        mock_get_client.return_value.query_points.return_value = mock_response
+
+        search_papers("query", top_k=32)
+
+        call_kwargs = mock_get_client.return_value.query_points.call_args[1]
+        assert call_kwargs["search_params"].hnsw_ef == 128
+
+    @patch("app.vector_store.paper_search.embed_texts")
+    @patch("app.vector_store.paper_search.get_client")
+    def test_short_query_skips_embedding(self, mock_get_client, mock_embed):
+        """Blank/too-short queries must not cost a model forward pass."""
+        assert search_papers("  ") == []
+        assert search_papers("ab") == []
+
+        mock_embed.assert_not_called()
+        mock_get_client.assert_not_called()
+
 
 # ===========================================================================
 # SECTION 19 — qdrant_store.py
@@ -3274,26 +3173,36 @@ class TestGetClient:
 
     @patch("app.vector_store.qdrant_store.QdrantClient")
     def test_returns_qdrant_client_on_success(self, mock_qdrant):
-        from app.vector_store.qdrant_store import get_client
-
+        close_client()
         mock_instance = MagicMock()
         mock_qdrant.return_value = mock_instance
 
         result = get_client()
 
         assert result is mock_instance
+        close_client()
+
+    @patch("app.vector_store.qdrant_store.QdrantClient")
+    def test_returns_cached_instance_on_second_call(self, mock_qdrant):
+        close_client()
+        mock_qdrant.return_value = MagicMock()
+
+        first = get_client()
+        second = get_client()
+
+        assert first is second
+        mock_qdrant.assert_called_once()
+        close_client()
 
     @patch("app.vector_store.qdrant_store.QdrantClient", side_effect=Exception("Connection refused"))
     def test_raises_runtime_error_on_failure(self, mock_qdrant):
-        from app.vector_store.qdrant_store import get_client
-
+        close_client()
         with pytest.raises(RuntimeError, match="Qdrant connection failed"):
             get_client()
 
     @patch("app.vector_store.qdrant_store.QdrantClient")
     def test_uses_settings_url_and_api_key(self, mock_qdrant):
-        from app.vector_store.qdrant_store import get_client
-
+        close_client()
         mock_qdrant.return_value = MagicMock()
 
         with patch("app.vector_store.qdrant_store.settings") as mock_settings:
@@ -3307,7 +3216,9 @@ class TestGetClient:
             url="http://localhost:6333",
             api_key="test-key",
             timeout=30,
+            prefer_grpc=True,
         )
+        close_client()
 
 
 class TestCreateCollectionIfNotExists:
@@ -3315,23 +3226,25 @@ class TestCreateCollectionIfNotExists:
 
     @patch("app.vector_store.qdrant_store.COLLECTION", "test_collection")
     def test_skips_creation_when_collection_exists(self):
-        from app.vector_store.qdrant_store import create_collection_if_not_exists
-
         mock_client = MagicMock()
-        existing_col = MagicMock()
-        existing_col.name = "test_collection"
-        mock_client.get_collections.return_value.collections = [existing_col]
+        mock_client.collection_exists.return_value = True
 
         create_collection_if_not_exists(mock_client)
 
         mock_client.create_collection.assert_not_called()
 
     @patch("app.vector_store.qdrant_store.COLLECTION", "new_collection")
-    def test_creates_collection_when_absent(self):
-        from app.vector_store.qdrant_store import create_collection_if_not_exists
+    def test_creates_collection_when_absent_over_grpc(self):
+        """
+        With prefer_grpc=True a missing collection surfaces as
+        grpc.RpcError from get_collection, not the REST
+        UnexpectedResponse — the probe must not depend on get_collection.
+        """
+        import grpc
 
         mock_client = MagicMock()
-        mock_client.get_collections.return_value.collections = []
+        mock_client.collection_exists.return_value = False
+        mock_client.get_collection.side_effect = grpc.RpcError()
 
         with patch("app.vector_store.qdrant_store.settings") as mock_settings:
             mock_settings.EMBEDDING_DIM = 384
@@ -3341,10 +3254,8 @@ class TestCreateCollectionIfNotExists:
         mock_client.create_collection.assert_called_once()
 
     def test_raises_on_unexpected_error(self):
-        from app.vector_store.qdrant_store import create_collection_if_not_exists
-
         mock_client = MagicMock()
-        mock_client.get_collections.side_effect = Exception("DB error")
+        mock_client.collection_exists.side_effect = Exception("DB error")
 
         with pytest.raises(Exception):
             create_collection_if_not_exists(mock_client)
@@ -3353,19 +3264,15 @@ class TestCreateCollectionIfNotExists:
 class TestCreateIndexes:
     """Tests for create_indexes()"""
 
-    def test_creates_all_five_indexes(self):
-        from app.vector_store.qdrant_store import create_indexes
-
+    def test_creates_all_six_indexes(self):
         mock_client = MagicMock()
 
         with patch("app.vector_store.qdrant_store._create_payload_index_safe") as mock_idx:
             create_indexes(mock_client)
 
-        assert mock_idx.call_count == 5
+        assert mock_idx.call_count == 6
 
     def test_includes_pmid_index(self):
-        from app.vector_store.qdrant_store import create_indexes
-
         mock_client = MagicMock()
         called_fields = []
 
@@ -3382,7 +3289,6 @@ class TestCreatePayloadIndexSafe:
     """Tests for _create_payload_index_safe()"""
 
     def test_creates_index_successfully(self):
-        from app.vector_store.qdrant_store import _create_payload_index_safe
         from qdrant_client.models import PayloadSchemaType
 
         mock_client = MagicMock()
@@ -3392,7 +3298,6 @@ class TestCreatePayloadIndexSafe:
 
     def test_does_not_raise_on_unexpected_response(self):
         """UnexpectedResponse (index exists) should be silently ignored."""
-        from app.vector_store.qdrant_store import _create_payload_index_safe
         from qdrant_client.models import PayloadSchemaType
         from qdrant_client.http.exceptions import UnexpectedResponse
 
@@ -3406,7 +3311,6 @@ class TestCreatePayloadIndexSafe:
         _create_payload_index_safe(mock_client, "pmid", PayloadSchemaType.KEYWORD)
 
     def test_raises_on_unexpected_exception(self):
-        from app.vector_store.qdrant_store import _create_payload_index_safe
         from qdrant_client.models import PayloadSchemaType
 
         mock_client = MagicMock()
@@ -3461,6 +3365,7 @@ def auth_headers(flask_app, client):
     return {"Authorization": f"Bearer {token}"}
 
 
+@pytest.mark.xdist_group("flask_app")
 class TestHealthEndpoint:
     def test_health_returns_ok(self, client):
         resp = client.get("/api/health")
@@ -3469,6 +3374,7 @@ class TestHealthEndpoint:
         assert data["status"] == "ok"
 
 
+@pytest.mark.xdist_group("flask_app")
 class TestRegisterEndpoint:
     @patch("app.routes.api.create_patient")
     def test_register_success(self, mock_create, client):
@@ -3493,6 +3399,7 @@ class TestRegisterEndpoint:
         assert "already exists" in resp.get_json()["error"]
 
 
+@pytest.mark.xdist_group("flask_app")
 class TestLoginEndpoint:
     @patch("app.routes.api.create_patient")
     def test_login_success_returns_token(self, mock_create, client):
@@ -3514,7 +3421,16 @@ class TestLoginEndpoint:
         assert resp.status_code == 401
 
 
+@pytest.mark.xdist_group("flask_app")
 class TestAskEndpoint:
+    @pytest.fixture(autouse=True)
+    def _isolate_answer_cache(self):
+        """Fresh answer cache + stubbed question embedding per test."""
+        answer_cache.clear()
+        with patch("app.routes.api.embed_texts", return_value=[[0.1, 0.2, 0.3]]):
+            yield
+        answer_cache.clear()
+
     @patch("app.routes.api.extract_claims", return_value=[])
     @patch("app.routes.api.call_ollama", return_value="Monitor your glucose.")
     @patch("app.routes.api.build_medical_prompt", return_value="prompt text")
@@ -3543,6 +3459,34 @@ class TestAskEndpoint:
         resp = client.post("/api/ask", json={"question": "test"})
         assert resp.status_code == 401
 
+    @patch("app.routes.api.extract_claims", return_value=[])
+    @patch("app.routes.api.call_ollama_stream", return_value=iter(["Monitor ", "your glucose."]))
+    @patch("app.routes.api.build_medical_prompt", return_value="prompt text")
+    @patch("app.routes.api.check_drug_interactions", return_value={"drug_drug_interactions": []})
+    @patch("app.routes.api.search_papers", return_value=[])
+    @patch("app.routes.api.get_wearable_summary", return_value={"metrics": []})
+    @patch("app.routes.api.get_patient_profile", return_value={
+        "patient_id": "testuser", "conditions": [], "medications": [], "lab_results": []
+    })
+    @patch("app.routes.api.analyze_health_intent", return_value=[])
+    def test_ask_stream_emits_context_before_tokens(
+        self, mock_intent, mock_profile, mock_wearables, mock_papers,
+        mock_drugs, mock_prompt, mock_stream, mock_claims,
+        client, auth_headers
+    ):
+        resp = client.post(
+            "/api/ask/stream",
+            json={"question": "Is my glucose okay?"},
+            headers=auth_headers,
+        )
+
+        assert resp.status_code == 200
+        assert resp.mimetype == "text/event-stream"
+        body = resp.get_data(as_text=True)
+        assert body.index("event: context") < body.index("event: token")
+        assert "Monitor " in body
+        assert "event: done" in body
+
     @patch("app.routes.api.analyze_health_intent", return_value=[])
     @patch("app.routes.api.get_patient_profile", return_value={
         "conditions": [], "medications": [], "lab_results": []
@@ -3609,7 +3553,30 @@ class TestAskEndpoint:
         assert data["context"]["has_drug_warnings"] is True
         assert data["context"]["drug_warnings_count"] == 1
 
+    @patch("app.routes.api.extract_claims", return_value=[])
+    @patch("app.routes.api.call_ollama", return_value="Monitor your glucose.")
+    @patch("app.routes.api.build_medical_prompt", return_value="prompt text")
+    @patch("app.routes.api.check_drug_interactions", return_value={"drug_drug_interactions": []})
+    @patch("app.routes.api.search_papers", return_value=[])
+    @patch("app.routes.api.get_wearable_summary", return_value={"metrics": []})
+    @patch("app.routes.api.get_patient_profile", return_value={
+        "patient_id": "testuser", "conditions": [], "medications": [], "lab_results": []
+    })
+    @patch("app.routes.api.analyze_health_intent", return_value=[])
+    def test_ask_repeated_question_served_from_cache(
+        self, mock_intent, mock_profile, mock_wearables, mock_papers,
+        mock_drugs, mock_prompt, mock_ollama, mock_claims,
+        client, auth_headers
+    ):
+        first = client.post("/api/ask", json={"question": "Is my glucose okay?"}, headers=auth_headers)
+        second = client.post("/api/ask", json={"question": "Is my glucose okay?"}, headers=auth_headers)
+
+        assert first.get_json()["answer"] == second.get_json()["answer"]
+        mock_ollama.assert_called_once()
+        mock_papers.assert_called_once()
+
 
+@pytest.mark.xdist_group("flask_app")
 class TestConfirmUpdateEndpoint:
     @patch("app.routes.api.apply_graph_update", return_value=(True, "Successfully added Condition: Fever"))
     def test_confirm_update_success(self, mock_update, client, auth_headers):